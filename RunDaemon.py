@@ -0,0 +1,21 @@
+from mainaux.SimDaemon import SimDaemon
+
+# Starts a daemon that keeps warm worker processes and runs the simulation jobs sent to it
+# (see mainaux/SimDaemon.py), so that sweep drivers and short exploratory runs do not pay
+# the startup cost of a new python process every time
+# From another python process:
+#   import mainaux.SimDaemon as SimDaemon
+#   master_tracking_dict, root_seed = SimDaemon.run_job(DAEMON_ADDRESS, {'num_of_timesteps': 300, 'list_of_key_names': ['proteins_nuc'], 'num_of_simulations': 4, 'param_overrides': {'PROMOTER_ON_RATE': 1}})
+# Stop the daemon with Ctrl-C
+
+# Path of the Unix socket the daemon listens on
+# Set to ('localhost', <port>) to listen on TCP instead
+DAEMON_ADDRESS = 'simdaemon.sock'
+
+# Number of warm worker processes; None uses one worker per core
+NUM_OF_WORKERS = None
+
+# DO NOT TOUCH ANYTHING BELOW THIS LINE UNLESS YOU'VE READ THE DOCS
+daemon = SimDaemon(DAEMON_ADDRESS, NUM_OF_WORKERS)
+print('listening on ' + str(daemon.address))
+daemon.serve_forever()
@@ -1,6 +1,7 @@
 import mainaux.PlotCompilation as PlotCompilation
 import mainaux.PlotHelpers as PlotHelpers
 import mainaux.SimHelpers as SimHelpers
+from mainaux.Telemetry import Telemetry
 from state.Proteins import Proteins
 import numpy as np
 
@@ -12,12 +13,65 @@ import numpy as np
 # will be plotted (+std. dev, range, all data, or None)
 NUM_OF_SIMULATIONS = 1
 
+# Keep adding simulations, ADAPTIVE_ROUND_SIZE at a time, until the 95% confidence interval of
+# the mean of every target is narrow enough (see SimHelpers.run_adaptive_ensemble);
+# NUM_OF_SIMULATIONS is then the most simulations that will be run
+# Each target is (key name, row index, timestep, half-width of the interval),
+#   e.g. ('proteins_cyt', Proteins.index['Rev'], 1000, 50)
+# None runs exactly NUM_OF_SIMULATIONS simulations
+ADAPTIVE_TARGETS = None
+ADAPTIVE_ROUND_SIZE = 8
+
+# Only keep simulations that meet every filter (see SimHelpers.run_filtered_ensemble)
+# Each filter is (key name, row index, timestep, value, operator) as in SimHelpers.generate_subset_dict,
+#   where timestep is a recorded minute (a multiple of SAMPLING_RATE)
+#   e.g. ('proteins_nuc', Proteins.index['Rev'], 70, 0, ">=")
+# Simulations stop as soon as they fail a filter and are replaced until NUM_OF_SIMULATIONS are kept
+# None keeps every simulation
+LIST_OF_FILTERS = None
+
+# Turn integration site effects on and give each of the 30 clones of
+# process/processaux/IntegrationSiteEffects.py its share of the simulations, instead of drawing
+# a clone at random for every simulation (see SimHelpers.run_clone_stratified_ensemble)
+# NUM_OF_SIMULATIONS must then be at least 60; estimates of the population mean and their
+# standard errors are printed for every key
+STRATIFY_BY_CLONE = False
+
 NUM_OF_TIMESTEPS = 2400
 
+# Number of worker processes the simulations are spread across
+# 1 runs every simulation in this process; None uses one worker per core
+NUM_OF_WORKERS = 1
+
+# Number of simulations advanced together as one batch of cells (see mainaux/BatchSimulation.py)
+# None runs each simulation on its own; batches cannot be used with SAVE_STATE
+BATCH_SIZE = None
+
+# Seed that the random numbers of every simulation are derived from
+# None picks a new seed (printed at the start of the run); set it to a printed
+# seed to reproduce that run, or any single simulation of it
+ROOT_SEED = None
+
 # Parameter that determines the increment of timestep you care about, starting from t = 0
 # Default is 1
 SAMPLING_RATE = 1
 
+# Print where the time of each simulation goes: wall time, calls and random draws of every
+# process and state, and ODE evaluations (see mainaux/Profiler.py)
+# Results are identical to those of the same ROOT_SEED without it
+# Cannot be used with BATCH_SIZE
+PROFILE = False
+
+# File that progress is written to as JSON lines, one per simulation every TELEMETRY_INTERVAL
+# seconds and one for the whole ensemble every time a simulation finishes (see mainaux/Telemetry.py)
+# None writes no file
+TELEMETRY_PATH = None
+TELEMETRY_INTERVAL = 10
+
+# Print the progress of each simulation at most every PRINT_INTERVAL seconds
+PRINT_PROGRESS = True
+PRINT_INTERVAL = 30
+
 # Determines what keys will be plotted
 LIST_OF_KEY_NAMES = ['multi_splice_transcript_nuc', 'multi_splice_transcript_cyt', 'total_proteins', 'proteins_nuc', 'proteins_cyt', 'proteins_virion', 'proteins_mem']
 
@@ -49,33 +103,55 @@ SAVE_STATE = False
 # Must hold true: each element must have a value smaller than NUM_OF_TIMESTEPS
 SAVE_STATE_TIMESTEP_LIST = [1500, 2300]
 
+# Label of a batch of saved states to resume (the <label> of samplestates/Batch<label>)
+# Every simulation continues from its latest saved state; None starts a new batch
+# Setting is only relevant if SAVE_STATE is True
+RESUME_BATCH_LABEL = None
+
 # DO NOT TOUCH ANYTHING BELOW THIS LINE UNLESS YOU'VE READ THE DOCS
-if SAVE_STATE:
+root_seed = SimHelpers.initialize_root_seed(ROOT_SEED)
+
+if SAVE_STATE and RESUME_BATCH_LABEL != None:
+    batch_label = RESUME_BATCH_LABEL
+elif SAVE_STATE:
     batch_label = SimHelpers.initialize_label("samplestates")
 else:
     batch_label = ""
 
+telemetry = Telemetry(TELEMETRY_PATH, TELEMETRY_INTERVAL, PRINT_PROGRESS, PRINT_INTERVAL, batch_label)
+
 # master_tracking_dict is a dictionary that maps key to
 # a list of matrices, where each key is a key in variable_tracking_dict
 # and the value is a list of matrices. Each matrix corresponds to a
 # particular simulation
 # COMMENT OUT THIS LINE IF YOU WANT TO RETAIN PREVIOUS master_tracking_dict
-if NUM_OF_SIMULATIONS == 1:
-    master_tracking_dict, list_of_plotting_keys, hist_dict = SimHelpers.initialize_runsim_dict(LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, save_state_mode=SAVE_STATE, timestep_list=SAVE_STATE_TIMESTEP_LIST, batch_label=batch_label, rtn_hist_dict=True)
+if ADAPTIVE_TARGETS != None:
+    master_tracking_dict, list_of_plotting_keys, list_of_half_widths = SimHelpers.run_adaptive_ensemble(LIST_OF_KEY_NAMES, ADAPTIVE_TARGETS, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, round_size=ADAPTIVE_ROUND_SIZE, num_of_workers=NUM_OF_WORKERS, batch_size=BATCH_SIZE, root_seed=root_seed, telemetry=telemetry)
+    NUM_OF_SIMULATIONS = len(master_tracking_dict[LIST_OF_KEY_NAMES[0]])
+elif LIST_OF_FILTERS != None:
+    master_tracking_dict, list_of_plotting_keys, num_of_simulations_run = SimHelpers.run_filtered_ensemble(LIST_OF_KEY_NAMES, LIST_OF_FILTERS, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, num_of_workers=NUM_OF_WORKERS, root_seed=root_seed, telemetry=telemetry)
+    NUM_OF_SIMULATIONS = len(master_tracking_dict[LIST_OF_KEY_NAMES[0]])
+elif STRATIFY_BY_CLONE:
+    master_tracking_dict, list_of_plotting_keys, population_dict = SimHelpers.run_clone_stratified_ensemble(LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, num_of_workers=NUM_OF_WORKERS, root_seed=root_seed)
+    for key in LIST_OF_KEY_NAMES:
+        mean, std_error, random_std_error = population_dict[key]
+        print(key + ': mean at the last timestep ' + str(mean[..., -1]) + ', standard error ' + str(std_error[..., -1]) + ' (' + str(random_std_error[..., -1]) + ' with clones drawn at random)')
+elif NUM_OF_SIMULATIONS == 1:
+    master_tracking_dict, list_of_plotting_keys, hist_dict = SimHelpers.initialize_runsim_dict(LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, save_state_mode=SAVE_STATE, timestep_list=SAVE_STATE_TIMESTEP_LIST, batch_label=batch_label, rtn_hist_dict=True, num_of_workers=NUM_OF_WORKERS, batch_size=BATCH_SIZE, root_seed=root_seed, profile=PROFILE, telemetry=telemetry)
 
     # add histogram plots here
     # see function prototype in PlotHelpers for more info on usage
     PlotHelpers.plot_histogram(hist_dict, ['num_of_successful_Env_t_of_diff_progeny', 'num_of_unsuccessful_Env_t_of_diff_progeny'], 'Frequency of virons', 'Number of Env Trimers', 'Frequency', ['r', 'k'], bins=np.linspace(0, 25, 25))
     PlotHelpers.plot_histogram(hist_dict, ['num_of_' + protein_name + '_of_diff_progeny' for protein_name in ['Gag', 'Vif', 'GagProPol', 'Vpr', 'Nef', 'successful_Env_t']], 'Frequency of different proteins in particular progeny', 'Number of Specific Protein', 'Frequency', ['r', 'k', 'b', 'g', 'c', 'y'], bins=np.linspace(0, 25, 25))    
 else:
-    master_tracking_dict, list_of_plotting_keys = SimHelpers.initialize_runsim_dict(LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, save_state_mode=SAVE_STATE, timestep_list=SAVE_STATE_TIMESTEP_LIST, batch_label=batch_label, rtn_hist_dict=False)
+    master_tracking_dict, list_of_plotting_keys = SimHelpers.initialize_runsim_dict(LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, save_state_mode=SAVE_STATE, timestep_list=SAVE_STATE_TIMESTEP_LIST, batch_label=batch_label, rtn_hist_dict=False, num_of_workers=NUM_OF_WORKERS, batch_size=BATCH_SIZE, root_seed=root_seed, profile=PROFILE, telemetry=telemetry)
 
 # for key in LIST_OF_KEY_NAMES:
 #     PlotCompilation.generate_plotting_key(master_tracking_dict, key)
 
 if EXPORT_RAW_DATA_NO_PLOT:
     output_data_label = SimHelpers.initialize_label("outputdata")
-    SimHelpers.create_output_data_info_file(output_data_label, GROUP_BY_ROW_NUM, NUM_OF_SIMULATIONS)
+    SimHelpers.create_output_data_info_file(output_data_label, GROUP_BY_ROW_NUM, NUM_OF_SIMULATIONS, root_seed=root_seed)
     for key_name in LIST_OF_KEY_NAMES:
         SimHelpers.write_key(master_tracking_dict, key_name, output_data_label, GROUP_BY_ROW_NUM)
 
@@ -1,4 +1,5 @@
 import mainaux.SimHelpers as SimHelpers
+from mainaux.Telemetry import Telemetry
 
 # Run RunSimulationVPV to plot multiple simulations with varying parameter value
 
@@ -8,6 +9,31 @@ NUM_OF_SIMULATIONS = 2
 # Number of timesteps to run for all plots
 NUM_OF_TIMESTEPS = 1000
 
+# Number of worker processes the simulations of each section are spread across
+# 1 runs every simulation in this process; None uses one worker per core
+NUM_OF_WORKERS = 1
+
+# Number of simulations advanced together as one batch of cells (see mainaux/BatchSimulation.py)
+# None runs each simulation on its own
+BATCH_SIZE = None
+
+# Seed that the random numbers of every simulation are derived from
+# None picks a new seed (printed at the start of the run); set it to a printed
+# seed to reproduce that run, or any single simulation of it
+ROOT_SEED = None
+
+# Run simulation i of every section with common random numbers, so that sections differ by the
+# param value rather than by run-to-run noise; the paired differences between the sections are
+# printed at the end (see SimHelpers.generate_increment_param_plots)
+# Cannot be used with BATCH_SIZE
+COMMON_RANDOM_NUMBERS = False
+
+# Run a single deterministic mean-field trajectory per section, which propagates expected amounts
+# instead of drawing random ones (see mainaux/MeanField.py), instead of NUM_OF_SIMULATIONS simulations;
+# it takes a fraction of the time of a simulation, but it is not the ensemble mean. The sections are spread across NUM_OF_WORKERS processes
+# Cannot be used with BATCH_SIZE or COMMON_RANDOM_NUMBERS
+MEAN_FIELD = False
+
 # Parameter that determines the increment of timestep you care about, starting from t = 0
 # Default is 1
 SAMPLING_RATE = 1
@@ -57,5 +83,14 @@ USE_DEFAULT_LOG_SETTING = False
 # Determines what keys will be plotted
 LIST_OF_KEY_NAMES = ['proteins_nuc', 'total single spliced mRNA cyt', 'total proteins_cyt']
 
-# Don't need to touch this line; just modify the variables above
-SimHelpers.generate_increment_param_plots(NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, PARAM_NAME, INIT_VAL, INCREMENT_VAL, INCREMENT_TYPE, NUM_OF_INCREMENTS, EXPORT_RAW_DATA_NO_PLOT, GROUP_BY_ROW_NUM, TYPE_OF_PLOT, USE_DEFAULT_LOG_SETTING, SAMPLING_RATE, LIST_OF_KEY_NAMES)
+# File that progress is written to as JSON lines (see mainaux/Telemetry.py); None writes no file
+TELEMETRY_PATH = None
+TELEMETRY_INTERVAL = 10
+
+# Print the progress of each simulation at most every PRINT_INTERVAL seconds
+PRINT_PROGRESS = True
+PRINT_INTERVAL = 30
+
+# Don't need to touch these lines; just modify the variables above
+telemetry = Telemetry(TELEMETRY_PATH, TELEMETRY_INTERVAL, PRINT_PROGRESS, PRINT_INTERVAL)
+SimHelpers.generate_increment_param_plots(NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, PARAM_NAME, INIT_VAL, INCREMENT_VAL, INCREMENT_TYPE, NUM_OF_INCREMENTS, EXPORT_RAW_DATA_NO_PLOT, GROUP_BY_ROW_NUM, TYPE_OF_PLOT, USE_DEFAULT_LOG_SETTING, SAMPLING_RATE, LIST_OF_KEY_NAMES, NUM_OF_WORKERS, BATCH_SIZE, ROOT_SEED, telemetry, COMMON_RANDOM_NUMBERS, MEAN_FIELD)
@@ -0,0 +1,39 @@
+import mainaux.SimHelpers as SimHelpers
+import mainaux.Splitting as Splitting
+import numpy as np
+
+# Estimates the probability of a rare event by multilevel splitting (see mainaux/Splitting.py)
+# The event is that PROGRESS_FUNCTION reaches the last of LIST_OF_LEVELS within NUM_OF_TIMESTEPS
+
+NUM_OF_TIMESTEPS = 600
+
+# Function of the simulation whose levels are crossed, e.g.
+#   Splitting.nuclear_Tat, Splitting.Tat_derived_transcription_rate, Splitting.num_of_viable_virions
+PROGRESS_FUNCTION = Splitting.nuclear_Tat
+
+# Increasing levels of PROGRESS_FUNCTION; a good choice has each level reached by
+# roughly 10-50% of the simulations that reached the previous one
+LIST_OF_LEVELS = [1, 10, 50, 200]
+
+# Simulations per stage, and number of independent repetitions of the whole procedure
+NUM_OF_TRAJECTORIES = 100
+NUM_OF_REPLICATIONS = 10
+
+# Params that differ from parameters.csv, e.g. {'PROMOTER_ON_RATE': 0.01}
+PARAM_OVERRIDES = None
+
+ROOT_SEED = None
+
+# DO NOT TOUCH ANYTHING BELOW THIS LINE UNLESS YOU'VE READ THE DOCS
+root_seed = SimHelpers.initialize_root_seed(ROOT_SEED)
+result = Splitting.run_splitting(PROGRESS_FUNCTION, LIST_OF_LEVELS, NUM_OF_TIMESTEPS, NUM_OF_TRAJECTORIES, NUM_OF_REPLICATIONS, PARAM_OVERRIDES, root_seed)
+
+probability = result['probability']
+std_error = np.sqrt(result['variance'])
+print('probability of the event: %.4g +- %.2g (standard error)' % (probability, std_error))
+print('probability of reaching each level given the previous one: ' + str(result['list_of_level_probabilities']))
+print('simulated timesteps: ' + str(result['num_of_simulated_timesteps']))
+if probability > 0 and std_error > 0:
+    # brute force needs (1 - p)/(p * relative error^2) simulations of NUM_OF_TIMESTEPS for the same relative error
+    num_of_brute_force_simulations = (1 - probability)/(probability*(std_error/probability)**2)
+    print('timesteps a brute-force ensemble needs for the same precision: %.3g' % (num_of_brute_force_simulations*NUM_OF_TIMESTEPS))
@@ -0,0 +1,63 @@
+import mainaux.SimHelpers as SimHelpers
+import mainaux.PlotCompilation as PlotCompilation
+from mainaux.WorkQueue import WorkQueue
+
+# Runs a parameter study on a work queue shared by any number of nodes (see mainaux/WorkQueue.py)
+# Start this file with ROLE = "coordinator" once, and with ROLE = "worker" on every node
+# (any number of times per node); QUEUE_PATH must be on storage all of them can reach
+# The coordinator queues the study, waits for the workers and plots (or exports) every section
+# like RunSimulationVPV.py does; a coordinator started again for the same STUDY_NAME picks up
+# the study where it is instead of queueing it again
+
+ROLE = "coordinator"
+
+QUEUE_PATH = 'workqueue/queue.sqlite'
+
+STUDY_NAME = 'THRESH_TAT_FEEDBACK study'
+
+NUM_OF_SIMULATIONS = 2
+
+NUM_OF_TIMESTEPS = 1000
+
+# Seed of the first section; section i is run with ROOT_SEED + i
+# None picks a new seed (printed at the start of the run)
+ROOT_SEED = None
+
+SAMPLING_RATE = 1
+
+PARAM_NAME = 'THRESH_TAT_FEEDBACK'
+
+# Value of PARAM_NAME in each section
+LIST_OF_PARAM_VALUES = [0.75, 0.8125]
+
+EXPORT_RAW_DATA_NO_PLOT = False
+
+GROUP_BY_ROW_NUM = True
+
+TYPE_OF_PLOT = "standard deviation"
+
+USE_DEFAULT_LOG_SETTING = False
+
+LIST_OF_KEY_NAMES = ['proteins_nuc', 'total single spliced mRNA cyt', 'total proteins_cyt']
+
+# DO NOT TOUCH ANYTHING BELOW THIS LINE UNLESS YOU'VE READ THE DOCS
+work_queue = WorkQueue(QUEUE_PATH)
+
+if ROLE == "worker":
+    num_of_jobs = work_queue.run_worker()
+    print('ran ' + str(num_of_jobs) + ' jobs')
+else:
+    work_queue.add_study(STUDY_NAME, LIST_OF_KEY_NAMES, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, PARAM_NAME, LIST_OF_PARAM_VALUES, SimHelpers.initialize_root_seed(ROOT_SEED), SAMPLING_RATE)
+    list_of_master_tracking_dicts = work_queue.wait_for_study(STUDY_NAME)
+    list_of_plotting_keys = PlotCompilation.generate_plotting_keys(LIST_OF_KEY_NAMES)[0]
+
+    if EXPORT_RAW_DATA_NO_PLOT:
+        output_data_label = SimHelpers.initialize_label("outputdata")
+        SimHelpers.create_output_data_info_file(output_data_label, GROUP_BY_ROW_NUM, NUM_OF_SIMULATIONS, PARAM_NAME, 'list', work_queue.study_spec(STUDY_NAME)['root_seed'])
+    num_increments = len(LIST_OF_PARAM_VALUES) - 1
+    for curr_increment, master_tracking_dict in enumerate(list_of_master_tracking_dicts):
+        if EXPORT_RAW_DATA_NO_PLOT:
+            for key_name in LIST_OF_KEY_NAMES:
+                SimHelpers.write_key(master_tracking_dict, key_name, output_data_label, GROUP_BY_ROW_NUM, PARAM_NAME, LIST_OF_PARAM_VALUES[curr_increment])
+        else:
+            SimHelpers.plot_tracking_dictionary(master_tracking_dict, NUM_OF_TIMESTEPS, list_of_plotting_keys, TYPE_OF_PLOT, inc_of_interest=curr_increment, num_of_const_param_sections=num_increments+1, is_last_const_param_section=curr_increment == num_increments, log_setting=USE_DEFAULT_LOG_SETTING, sampling_rate=SAMPLING_RATE)
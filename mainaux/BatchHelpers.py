@@ -0,0 +1,101 @@
+import numpy as np
+
+# Helpers for the batched processes in process/batchprocess
+# Every abundance array handled here has a leading ensemble dimension (one row per cell),
+# and every random draw goes through a Sampler so that the source of randomness
+# can be changed in a single place
+
+class Sampler(object):
+    # random_state: object providing the numpy.random interface
+    # (numpy.random.RandomState instance); defaults to the global numpy.random state
+    def __init__(self, random_state=None):
+        if random_state == None:
+            random_state = np.random
+        self.random_state = random_state
+
+    def rand(self, *size):
+        return self.random_state.rand(*size)
+
+    def randint(self, low, high=None, size=None):
+        return self.random_state.randint(low, high, size)
+
+    # Number of successes out of n trials, each succeeding with probability p
+    # n and p are broadcast against each other
+    def binomial(self, n, p):
+        return self.random_state.binomial(np.asarray(n).astype(int), np.clip(p, 0, 1))
+
+    def poisson(self, lam):
+        return self.random_state.poisson(np.maximum(lam, 0))
+
+    # Number of successes in nsample draws without replacement from good successes and bad failures
+    # numpy.random.hypergeometric needs good, bad and nsample to be at least 1, so the
+    # cases where the outcome is certain are filled in here
+    def hypergeometric(self, good, bad, nsample):
+        good = np.asarray(good).astype(int)
+        bad = np.asarray(bad).astype(int)
+        nsample = np.asarray(nsample).astype(int)
+        drawn = self.random_state.hypergeometric(np.maximum(good, 1), np.maximum(bad, 1), np.maximum(nsample, 1))
+        drawn = np.where(good == 0, 0, np.where(bad == 0, nsample, drawn))
+        return np.where(nsample == 0, 0, drawn)
+
+    def permutation(self, x):
+        return self.random_state.permutation(x)
+
+# Batched version of ProcessHelpers.roll_dice
+# num: array of counts, rate: probability (<= 1) or Poisson rate (> 1) applied to every count
+def roll_dice(sampler, num, rate):
+    num = np.asarray(num).astype(int)
+    if np.ndim(rate) == 0:
+        if rate > 1:
+            return np.minimum(sampler.poisson(num * rate), num)
+        return sampler.binomial(num, rate)
+    rate = np.asarray(rate)
+    return np.where(rate > 1, np.minimum(sampler.poisson(num * rate), num), sampler.binomial(num, np.minimum(rate, 1)))
+
+# Batched version of ProcessHelpers.move_buckets
+# Arrays are updated in place so that views of them stay valid
+def move_buckets(input_dict, key1, key2, amt):
+    input_dict[key1] -= amt
+    input_dict[key2] += amt
+
+# Batched version of ProcessHelpers.transfer_buckets
+def transfer_buckets(sampler, input_dict, key1, key2, rate):
+    amt_to_transfer = roll_dice(sampler, input_dict[key1], rate)
+    move_buckets(input_dict, key1, key2, amt_to_transfer)
+    return amt_to_transfer
+
+# Splits each count in counts among len(probs) categories
+# Returns an array of shape counts.shape + (len(probs),)
+# The split is drawn as a chain of conditional binomials, which has the same
+# distribution as one multinomial draw per count; anything left over after the
+# second to last category goes to the last one
+def multinomial_split(sampler, counts, probs):
+    counts = np.asarray(counts).astype(int)
+    rtn_array = np.zeros(counts.shape + (len(probs),), int)
+    remaining_counts = counts.copy()
+    remaining_prob = 1.
+    for k in range(len(probs) - 1):
+        if remaining_prob > 0:
+            rtn_array[..., k] = sampler.binomial(remaining_counts, float(probs[k])/remaining_prob)
+        remaining_counts = remaining_counts - rtn_array[..., k]
+        remaining_prob = remaining_prob - probs[k]
+    rtn_array[..., -1] = remaining_counts
+    return rtn_array
+
+# Splits nsample draws without replacement from a single cell's counts among the categories of counts
+# Returns an array of the same length as counts holding the amount drawn from each category
+def multivariate_hypergeometric(sampler, counts, nsample):
+    counts = np.asarray(counts).astype(int)
+    rtn_array = np.zeros((len(counts)), int)
+    remaining_sample = int(nsample)
+    remaining_total = counts.sum()
+    for k in range(len(counts) - 1):
+        remaining_total -= counts[k]
+        rtn_array[k] = sampler.hypergeometric(counts[k], remaining_total, remaining_sample)
+        remaining_sample -= rtn_array[k]
+    rtn_array[-1] = remaining_sample
+    return rtn_array
+
+# Converts a vector of cumulative probabilities (as stored by AlternativeSplicing) into probabilities
+def cumulative_to_probabilities(cum_probs):
+    return np.diff(np.concatenate(([0], cum_probs)))
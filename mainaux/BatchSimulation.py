@@ -0,0 +1,107 @@
+import numpy as np
+from mainaux.BatchState import BatchState
+from mainaux.BatchHelpers import Sampler
+from mainaux.ProcessHelpers import generate_root_seed
+
+from process.batchprocess.BatchTatFeedback import BatchTatFeedback
+from process.batchprocess.BatchTranscription import BatchTranscription
+from process.batchprocess.BatchAlternativeSplicing import BatchAlternativeSplicing
+from process.batchprocess.BatchRevBinding import BatchRevBinding
+from process.batchprocess.BatchMRNAExport import BatchMRNAExport
+from process.batchprocess.BatchTranslation import BatchTranslation
+from process.batchprocess.BatchProteinLocalization import BatchProteinLocalization
+from process.batchprocess.BatchDegradation import BatchDegradation
+from process.batchprocess.BatchPackaging import BatchPackaging
+from process.batchprocess.BatchEnvProcessing import BatchEnvProcessing
+from mainaux.InitParamValues import *
+
+# Runs len(list_of_records) independent cells together: every process advances
+# all of the cells by one timestep with array operations over the batch
+# (see mainaux/BatchState.py and process/batchprocess)
+# Cell i is recorded into list_of_records[i], in the same way Simulation records a single cell
+# Random numbers are drawn for all cells at once, from a single stream seeded by root_seed and
+# the sim indices of the records; rerunning the same records with the same root_seed
+# reproduces the batch (a cell run on its own through Simulation draws different numbers)
+class BatchSimulation(object):
+
+    def __init__(self, list_of_records, number_of_timesteps=360, modified_param=None, new_val_of_param=None, root_seed=None, telemetry=None):
+
+        self.number_of_timesteps = number_of_timesteps
+        self.current_timestep = 0
+        self.list_of_records = list_of_records
+        self.num_of_cells = len(list_of_records)
+        self.param_dict = generate_param_dict()
+
+        if modified_param != None:
+            self.param_dict[modified_param] = new_val_of_param
+
+        if root_seed == None:
+            root_seed = generate_root_seed()
+        self.root_seed = root_seed
+        for record in list_of_records:
+            record.root_seed = root_seed
+        self.random_state = np.random.RandomState([root_seed] + [record.sim_index for record in list_of_records])
+
+        # Telemetry the progress is reported to (see mainaux/Telemetry.py), None to report nothing
+        self.telemetry = telemetry
+
+        self.sampler = Sampler(self.random_state)
+        self.state = BatchState(self.num_of_cells, self.param_dict, self.random_state)
+
+        self.process_list = []
+        self.state_list = []
+        self.init_processes()
+        self.init_states()
+
+    def init_processes(self):
+        #Same processes, in the same order, as Simulation.init_processes
+        for process_class in [BatchTatFeedback, BatchTranscription, BatchAlternativeSplicing, BatchRevBinding, BatchMRNAExport, BatchTranslation, BatchProteinLocalization, BatchDegradation, BatchPackaging, BatchEnvProcessing]:
+            self.process_list.append(process_class(self.state, self.param_dict, self.sampler))
+
+    def init_states(self):
+        self.state_list.append('proteins')
+        self.state_list.append('mRNAs')
+        self.state_list.append('reaction_rates')
+        self.state_list.append('DNAs')
+        self.state_list.append('viral_progeny')
+        self.state_list.append('cell_cycle')
+        self.state_list.append('viral_progeny_container')
+
+    def record_cells(self, record_state, record_at_end):
+        self.state.refresh_cell_states()
+        for cell_index, record in enumerate(self.list_of_records):
+            cell_state = self.state.get_cell_state(cell_index)
+            for state_name in self.state_list:
+                curr_state = cell_state.get_state(state_name)
+                if record_state:
+                    curr_state.record_state(record, self.current_timestep, self.number_of_timesteps)
+                if record_at_end:
+                    curr_state.record_at_end(record)
+
+    # Fields of this batch in the lines of its telemetry, with one entry per cell
+    def telemetry_fields(self):
+        return {'sim_index': [int(record.sim_index) for record in self.list_of_records],
+                'progeny_count': [int(container.count_progeny()) for container in self.state.get_state('viral_progeny_container')]}
+
+    def run(self):
+        set_of_relevant_timesteps = np.arange(0, self.number_of_timesteps, self.list_of_records[0].sampling_rate)
+        if self.telemetry != None:
+            self.telemetry.start(self)
+        while self.current_timestep < self.number_of_timesteps:
+            for process in self.process_list:
+                process.evolve_state(self.current_timestep)
+
+            record_state = self.current_timestep in set_of_relevant_timesteps
+            record_at_end = self.current_timestep + 1 == self.number_of_timesteps
+            if record_state or record_at_end:
+                self.record_cells(record_state, record_at_end)
+
+            self.current_timestep +=1
+            if self.telemetry != None:
+                self.telemetry.update(self)
+
+        # run at the end
+        for record in self.list_of_records:
+            record.generate_data_for_dependent_keys()
+        if self.telemetry != None:
+            self.telemetry.finish(self)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import copy
+import numpy as np
+
+from mainaux.State import State
+from state.Proteins import Proteins
+from state.MRNAs import MRNAs
+from state.HostFactors import HostFactors
+from state.ReactionRates import ReactionRates
+from state.DNAs import DNAs
+from state.ViralParticles import ViralParticles
+from state.CellCycle import CellCycle
+from state.ViralProgeny import ViralProgenyContainer
+
+# The State of a batch of num_of_cells cells that are advanced together by the
+# batched processes in process/batchprocess
+# Every array in the state classes gains a leading ensemble dimension (row i belongs to cell i)
+# and every scalar becomes an array holding one value per cell.
+# Viral progeny are still objects, so there is one ViralProgenyContainer per cell;
+# get_state('viral_progeny_container') returns the list of them.
+# random_state is the random number generator used by the progeny containers
+class BatchState(State):
+    def __init__(self, num_of_cells, param_dict=None, random_state=None):
+        self.num_of_cells = num_of_cells
+        self.states_dict = {}
+        self.states_dict['proteins'] = Proteins(num_of_cells)
+        self.states_dict['mRNAs'] = MRNAs(param_dict, num_of_cells)
+        self.states_dict['host_factors'] = HostFactors(num_of_cells)
+        self.states_dict['reaction_rates'] = ReactionRates(num_of_cells)
+        self.states_dict['DNAs'] = DNAs(num_of_cells)
+        self.states_dict['viral_progeny'] = ViralParticles(param_dict)
+        self.states_dict['cell_cycle'] = CellCycle(param_dict, num_of_cells)
+
+        # Single cell views of this batch, used to create the progeny containers
+        # and to record each cell with the record_state methods of the state classes
+        self.cell_states = [CellState(self, cell_index) for cell_index in range(num_of_cells)]
+        list_of_containers = []
+        for cell_state in self.cell_states:
+            container = ViralProgenyContainer(cell_state, param_dict, random_state)
+            cell_state.set_state('viral_progeny_container', container)
+            list_of_containers.append(container)
+        self.states_dict['viral_progeny_container'] = list_of_containers
+
+    def get_cell_state(self, cell_index):
+        return self.cell_states[cell_index]
+
+    # Brings the per-cell values of every cell view up to date
+    # Must be called before reading the cell views (e.g. before recording)
+    def refresh_cell_states(self):
+        for cell_state in self.cell_states:
+            cell_state.refresh()
+
+# A single cell of a BatchState, laid out like a State
+# Arrays are views into the batch arrays, so they always hold the current values;
+# per-cell scalars are copied in by refresh()
+class CellState(State):
+    def __init__(self, batch_state, cell_index):
+        self.batch_state = batch_state
+        self.cell_index = cell_index
+        self.states_dict = {}
+        for state_name in batch_state.states_dict:
+            self.states_dict[state_name] = copy.copy(batch_state.states_dict[state_name])
+        self.refresh()
+
+    def refresh(self):
+        for state_name in self.states_dict:
+            if state_name == 'viral_progeny_container':
+                continue
+            batch_state_obj = self.batch_state.get_state(state_name)
+            cell_state_obj = self.states_dict[state_name]
+            for attr_name, value in vars(batch_state_obj).items():
+                setattr(cell_state_obj, attr_name, self.cell_value(value))
+
+    def cell_value(self, value):
+        if isinstance(value, np.ndarray):
+            return value[self.cell_index]
+        elif isinstance(value, dict):
+            rtn_dict = dict()
+            for key in value:
+                rtn_dict[key] = self.cell_value(value[key])
+            return rtn_dict
+        else:
+            return value
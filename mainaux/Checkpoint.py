@@ -0,0 +1,227 @@
+import numpy as np
+import os
+import csv
+import tempfile
+from mainaux.State import State
+from state.ViralProgeny import ViralProgeny
+
+# Checkpoints of a Simulation, saved as a single uncompressed .npz file of contiguous arrays
+# Array names are paths:
+#   'format_version', 'timestep', 'sim_index', 'root_seed', 'sampling_rate'
+#   'state/<state name>/<attribute>[/<dict key>]': every array, scalar and list of the state classes
+#   'container/<attribute>[/<dict key>]': counters of the ViralProgenyContainer
+#   'progeny/...': one row per ViralProgeny, in order of creation (see PROGENY_COLUMNS)
+#   'process/<process class>/<attribute>': attributes in the CHECKPOINT_ATTRIBUTES of a process
+#   'rng/...': state of the Mersenne Twister the simulation draws from
+#   'record/<key>': data recorded so far, so a resumed simulation keeps recording in place
+# Each batch directory holds an index.csv with a (sim index, timestep, file name) row per checkpoint
+
+# Permissions of checkpoint files, applied to the temporary files of write_checkpoint (mkstemp creates them readable by their owner only)
+CHECKPOINT_FILE_MODE = 0644
+
+# Bump whenever the layout above changes; load_checkpoint refuses other versions
+CHECKPOINT_FORMAT_VERSION = 1
+
+# State classes stored attribute by attribute
+# 'viral_progeny_container' is stored separately since it holds the progeny objects
+CHECKPOINT_STATE_NAMES = ['proteins', 'mRNAs', 'host_factors', 'reaction_rates', 'DNAs', 'viral_progeny', 'cell_cycle']
+
+CONTAINER_ATTRIBUTES = ['num_of_Gag', 'num_of_Vif', 'num_of_GagProPol', 'num_of_Vpr', 'num_of_Nef', 'num_of_Env_t', 'progeny_count',
+                        'progeny_state_count', 'prebudding_creation_time', 'prebudding_elapsed_time', 'helper_protein_dict']
+
+# Integer attributes of each ViralProgeny, one column each of 'progeny/table'
+PROGENY_COLUMNS = ['name', 'state', 'num_of_Gag', 'num_of_Vif', 'num_of_GagProPol', 'num_of_Vpr', 'num_of_Nef',
+                   'growing_timestep', 'prebud_timestep', 'final_Gag_count']
+
+def checkpoint_directory(batch_label):
+    return os.getcwd() + "/samplestates/Batch" + batch_label + "/"
+
+def checkpoint_path(batch_label, sim_index, timestep):
+    return checkpoint_directory(batch_label) + "Sim" + str(sim_index) + "/sample" + str(timestep) + ".npz"
+
+# Adds key: array entries to array_dict for value (array, scalar, list or dict of those)
+def flatten_value(array_dict, key, value):
+    if isinstance(value, dict):
+        for sub_key in value:
+            flatten_value(array_dict, key + "/" + str(sub_key), value[sub_key])
+    else:
+        array_dict[key] = np.asarray(value)
+
+# Returns the value stored under key, converted to the type of template_value
+def unflatten_value(data, key, template_value):
+    if isinstance(template_value, dict):
+        rtn_dict = dict()
+        for sub_key in template_value:
+            rtn_dict[sub_key] = unflatten_value(data, key + "/" + str(sub_key), template_value[sub_key])
+        return rtn_dict
+    if key not in data:
+        raise Exception("Checkpoint is missing " + key)
+    if isinstance(template_value, np.ndarray):
+        # some processes replace int arrays with float ones, so the saved dtype is kept as is
+        if template_value.shape == data[key].shape and template_value.dtype == data[key].dtype:
+            # copy in place so that anything holding the array keeps seeing the current values
+            template_value[...] = data[key]
+            return template_value
+        return data[key].copy()
+    elif isinstance(template_value, list):
+        return data[key].tolist()
+    else:
+        return data[key].item()
+
+def state_to_arrays(array_dict, state):
+    for state_name in CHECKPOINT_STATE_NAMES:
+        state_obj = state.get_state(state_name)
+        for attr_name, value in vars(state_obj).items():
+            flatten_value(array_dict, "state/" + state_name + "/" + attr_name, value)
+
+    container = state.get_state('viral_progeny_container')
+    for attr_name in CONTAINER_ATTRIBUTES:
+        flatten_value(array_dict, "container/" + attr_name, getattr(container, attr_name))
+
+    list_of_progeny = container.list_of_progeny_in_creation_order
+    progeny_table = np.zeros((len(list_of_progeny), len(PROGENY_COLUMNS)), int)
+    progeny_Env_t = np.zeros((len(list_of_progeny), 4), int)
+    progeny_growth_const = np.zeros((len(list_of_progeny)))
+    for i, progeny in enumerate(list_of_progeny):
+        progeny_table[i] = [getattr(progeny, column_name) for column_name in PROGENY_COLUMNS]
+        progeny_Env_t[i] = progeny.num_of_Env_t
+        if progeny.growth_const == None:
+            progeny_growth_const[i] = np.nan
+        else:
+            progeny_growth_const[i] = progeny.growth_const
+    array_dict['progeny/table'] = progeny_table
+    array_dict['progeny/Env_t'] = progeny_Env_t
+    array_dict['progeny/growth_const'] = progeny_growth_const
+    # progeny are shuffled every timestep, so their current order is part of the state
+    array_dict['progeny/order'] = np.array([progeny.name for progeny in container.list_of_progeny], int)
+
+# Overwrites state (a freshly created State) with the arrays of a checkpoint
+def arrays_to_state(data, state):
+    for state_name in CHECKPOINT_STATE_NAMES:
+        state_obj = state.get_state(state_name)
+        for attr_name, value in vars(state_obj).items():
+            setattr(state_obj, attr_name, unflatten_value(data, "state/" + state_name + "/" + attr_name, value))
+
+    container = state.get_state('viral_progeny_container')
+    for attr_name in CONTAINER_ATTRIBUTES:
+        setattr(container, attr_name, unflatten_value(data, "container/" + attr_name, getattr(container, attr_name)))
+    # the container works directly on the protein arrays of the state
+    container.proteins_cyt = container.proteins_state.proteins_cyt
+    container.proteins_mem = container.proteins_state.proteins_mem
+
+    list_of_progeny = []
+    for i, row in enumerate(data['progeny/table']):
+        # bypass __init__, which would count the progeny in the container a second time
+        progeny = ViralProgeny.__new__(ViralProgeny)
+        progeny.container = container
+        for column_name, value in zip(PROGENY_COLUMNS, row.tolist()):
+            setattr(progeny, column_name, value)
+        progeny.num_of_Env_t = data['progeny/Env_t'][i].copy()
+        if np.isnan(data['progeny/growth_const'][i]):
+            progeny.growth_const = None
+        else:
+            progeny.growth_const = float(data['progeny/growth_const'][i])
+        list_of_progeny.append(progeny)
+    container.list_of_progeny_in_creation_order = list_of_progeny
+    container.list_of_progeny = [list_of_progeny[name] for name in data['progeny/order']]
+
+def random_state_to_arrays(array_dict, random_state):
+    bit_generator_name, keys, pos, has_gauss, cached_gaussian = random_state.get_state()
+    array_dict['rng/keys'] = keys
+    array_dict['rng/pos'] = np.asarray(pos)
+    array_dict['rng/has_gauss'] = np.asarray(has_gauss)
+    array_dict['rng/cached_gaussian'] = np.asarray(cached_gaussian)
+
+def arrays_to_random_state(data, random_state):
+    random_state.set_state(('MT19937', data['rng/keys'], data['rng/pos'].item(), data['rng/has_gauss'].item(), data['rng/cached_gaussian'].item()))
+
+# Returns the arrays of a checkpoint of the simulation after its first timestep timesteps
+# The arrays are copies, so the simulation can continue while they are written
+def checkpoint_arrays(simulation, timestep):
+    array_dict = dict()
+    array_dict['format_version'] = np.asarray(CHECKPOINT_FORMAT_VERSION)
+    array_dict['timestep'] = np.asarray(timestep)
+    array_dict['sim_index'] = np.asarray(simulation.record.sim_index)
+    array_dict['root_seed'] = np.asarray(simulation.root_seed)
+    array_dict['sampling_rate'] = np.asarray(simulation.record.sampling_rate)
+    state_to_arrays(array_dict, simulation.state)
+    for process in simulation.process_list:
+        for attr_name in process.CHECKPOINT_ATTRIBUTES:
+            array_dict["process/" + type(process).__name__ + "/" + attr_name] = np.asarray(getattr(process, attr_name))
+    random_state_to_arrays(array_dict, simulation.random_state)
+    for key in simulation.record.variable_tracking_dict:
+        array_dict["record/" + key] = simulation.record.variable_tracking_dict[key]
+    return dict((key, np.array(value)) for key, value in array_dict.items())
+
+# Flushes fileHandler to disk and closes it
+def sync_and_close(fileHandler):
+    fileHandler.flush()
+    os.fsync(fileHandler.fileno())
+    fileHandler.close()
+
+# Writes the arrays of a checkpoint (see checkpoint_arrays) into path
+def write_checkpoint(path, array_dict):
+    directory = os.path.dirname(path)
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+    # write to a temporary file first so that a run killed mid-write never leaves a corrupt checkpoint
+    # the temporary file is unique, so that writers of the same path never write into each other's file
+    fileDescriptor, temp_path = tempfile.mkstemp(suffix=".tmp", prefix=os.path.basename(path) + ".", dir=directory)
+    try:
+        fileHandler = os.fdopen(fileDescriptor, 'wb')
+        os.fchmod(fileHandler.fileno(), CHECKPOINT_FILE_MODE)
+        np.savez(fileHandler, **array_dict)
+        sync_and_close(fileHandler)
+        os.rename(temp_path, path)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Saves the simulation after its first timestep timesteps into path
+def save_checkpoint(path, simulation, timestep):
+    write_checkpoint(path, checkpoint_arrays(simulation, timestep))
+
+# Returns the arrays of the checkpoint at path as a dict
+def load_checkpoint(path):
+    data = np.load(path)
+    try:
+        version = data['format_version'].item()
+        if version != CHECKPOINT_FORMAT_VERSION:
+            raise Exception("Checkpoint " + path + " has format version " + str(version) + ", expected " + str(CHECKPOINT_FORMAT_VERSION))
+        return dict((key, data[key]) for key in data.files)
+    finally:
+        data.close()
+
+# Returns the State stored in the checkpoint at path, drawing from a generator
+# that continues where the checkpointed simulation left off
+def load_state(path, param_dict=None):
+    data = load_checkpoint(path)
+    random_state = np.random.RandomState()
+    arrays_to_random_state(data, random_state)
+    state = State(param_dict, random_state)
+    arrays_to_state(data, state)
+    return state
+
+def add_to_index(batch_label, sim_index, timestep, path):
+    fileHandler = open(checkpoint_directory(batch_label) + "index.csv", 'ab')
+    csv.writer(fileHandler).writerow([sim_index, timestep, os.path.relpath(path, checkpoint_directory(batch_label))])
+    sync_and_close(fileHandler)
+
+# Returns a list of (sim_index, timestep, path) for every checkpoint of the batch
+def read_index(batch_label):
+    index_path = checkpoint_directory(batch_label) + "index.csv"
+    if not os.path.exists(index_path):
+        return []
+    fileHandler = open(index_path, 'rb')
+    rtn_list = [(int(row[0]), int(row[1]), os.path.join(checkpoint_directory(batch_label), row[2])) for row in csv.reader(fileHandler)]
+    fileHandler.close()
+    return rtn_list
+
+# Returns the path of the latest checkpoint of simulation sim_index in the batch,
+# or None if it has none
+def find_latest_checkpoint(batch_label, sim_index):
+    list_of_checkpoints = [(timestep, path) for index, timestep, path in read_index(batch_label) if index == sim_index and os.path.exists(path)]
+    if len(list_of_checkpoints) == 0:
+        return None
+    return max(list_of_checkpoints)[1]
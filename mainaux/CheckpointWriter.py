@@ -0,0 +1,42 @@
+import Queue
+import threading
+
+# Background writer of checkpoints (see Simulation.save_state_to_file)
+# The simulation snapshots its checkpoints in memory and hands them to a thread that
+# writes them to disk while the simulation continues
+# The queue holds at most max_queue_size snapshots; submit then waits for the writer
+# to catch up, which bounds the memory held by snapshots
+# A write that fails is reported, and the simulation carries on
+class CheckpointWriter(object):
+
+    def __init__(self, max_queue_size=2):
+        self.queue = Queue.Queue(max_queue_size)
+        # list of (description, error message) of the writes that failed
+        self.list_of_failed_writes = []
+        self.thread = threading.Thread(target=self.write_loop)
+        # a simulation that dies does not keep the program alive
+        self.thread.daemon = True
+        self.thread.start()
+
+    def write_loop(self):
+        while True:
+            job = self.queue.get()
+            if job == None:
+                break
+            description, function, args = job
+            try:
+                function(*args)
+            except Exception as e:
+                self.list_of_failed_writes.append((description, str(e)))
+                print("Could not write " + description + ": " + str(e))
+
+    # Calls function(*args) in the writer thread; description names the write in reports
+    def submit(self, description, function, *args):
+        self.queue.put((description, function, args))
+
+    # Waits until every submitted write is done and stops the thread
+    # Returns the list of (description, error message) of the writes that failed
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        return self.list_of_failed_writes
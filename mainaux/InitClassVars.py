@@ -1,3 +1,5 @@
+import numpy as np
+
 def initialize_protein_dict():
     rtn_dict = dict()
     rtn_dict['Vif'] = 0
@@ -9,4 +11,18 @@ def initialize_protein_dict():
     rtn_dict['Gag'] = 6
     rtn_dict['GagProPol'] = 7
     rtn_dict['Gag_dimers'] = 8
-    return rtn_dict     
\ No newline at end of file
+    return rtn_dict
+
+# Returns a zeroed int array of the given size for a single cell, or
+# an array with a leading ensemble dimension of num_of_cells rows
+# (used by the batched engine, see mainaux/BatchState.py)
+def initialize_ensemble_array(size, num_of_cells=None):
+    if num_of_cells == None:
+        return np.zeros((size), int)
+    return np.zeros((num_of_cells, size), int)
+
+# Returns value for a single cell, or an array holding value once per cell
+def initialize_ensemble_scalar(value, num_of_cells=None):
+    if num_of_cells == None:
+        return value
+    return np.ones((num_of_cells), type(value)) * value
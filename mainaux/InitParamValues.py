@@ -1,17 +1,29 @@
 import csv
+import copy
+import os
 import numpy as np
 
+# (absolute path, modification time) -> param_dict of the parameters.csv parsed last
+# Long-lived processes (see mainaux/SimDaemon.py) then only parse the file again if it changed
+cached_param_dict = dict()
+
 def generate_param_dict():
-    param_dict = dict()
-    with open('parameters.csv', 'rbU') as csvfile:
-        csvreader = csv.reader(csvfile, delimiter = ',')
-        for i, row in enumerate(csvreader):
-            if i != 0 and int(row[3]) == 1:
-                param_dict[row[0]] = modified_eval(row[1])
-    return param_dict
+    path = os.path.abspath('parameters.csv')
+    cache_key = (path, os.path.getmtime(path))
+    if cache_key not in cached_param_dict:
+        param_dict = dict()
+        with open('parameters.csv', 'rbU') as csvfile:
+            csvreader = csv.reader(csvfile, delimiter = ',')
+            for i, row in enumerate(csvreader):
+                if i != 0 and int(row[3]) == 1:
+                    param_dict[row[0]] = modified_eval(row[1])
+        cached_param_dict.clear()
+        cached_param_dict[cache_key] = param_dict
+    # every caller gets its own copy, since simulations modify params
+    return copy.deepcopy(cached_param_dict[cache_key])
 
 def modified_eval(string_input):
     if string_input[0] != "[":
         return eval(string_input)
     else:
-        return eval("np.array(" + string_input + ")")
\ No newline at end of file
+        return eval("np.array(" + string_input + ")")
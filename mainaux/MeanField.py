@@ -0,0 +1,94 @@
+import numpy as np
+
+# Deterministic mean-field mode of a Simulation (see the mean_field argument of Simulation)
+# The abundances of the state are floats holding expected amounts of molecules (see use_float_abundances),
+# and every process propagates the expectations instead of drawing random amounts:
+#   binomial thinning of n molecules with probability p takes n*p directly, without drawing anything
+#     (see StochasticKernels.binomial_thinning: Degradation, MRNAExport, AlternativeSplicing, Translation,
+#     Packaging, EnvProcessing)
+#   the other draws of the processes come from a MeanFieldRandomState, which returns the expectation of
+#   every draw as a float, e.g. poisson(lam) -> lam (Translation, ProteinLocalization, Packaging collisions),
+#   multinomial(n, pvals) -> n*pvals (splice-form selection, Gag binding to the SL sites),
+#   hypergeometric(ngood, nbad, nsample) -> nsample*ngood/(ngood + nbad) (Env trimers)
+#   the ODE solutions of TatFeedback and RevBinding are taken as they are, without rounding them to
+#     whole molecules and mass-balancing them with random draws; RevBinding solves the systems of all
+#     the mRNA types at once (see RevBinding.solve_mean_field)
+#   promoter_activity is the probability that the promoter is on (see Transcription)
+#   Gag-bound RNA dimers that would make a progeny are removed from the transcripts as they form, and a
+#     progeny is made each time they add up to a whole dimer; Env trimers are spread evenly over the
+#     progeny (see Packaging and EnvProcessing)
+# Nothing is drawn per molecule, and the expectations of a bin take as long to compute however many
+# molecules it holds
+# Progeny remain whole objects: the order they grow in and whether a nucleate moves to or falls off the
+# membrane are still drawn, from a RandomState with a fixed seed, so the trajectory is the same every time
+# it is run and does not depend on the root seed
+# The trajectory is not the ensemble mean: thresholds such as G2/M arrest act on expectations
+
+# True if random_state belongs to a mean-field simulation
+def is_mean_field(random_state):
+    return isinstance(random_state, MeanFieldRandomState)
+
+# Turns the abundances of state (a mainaux.State of a single cell) into floats, so that they can
+# hold expectations; the progeny container is pointed at the new arrays
+def use_float_abundances(state):
+    protein_state = state.get_state('proteins')
+    for attr_name in ['proteins_cyt', 'proteins_nuc', 'proteins_mem', 'proteins_virion']:
+        setattr(protein_state, attr_name, getattr(protein_state, attr_name)*1.0)
+    for key in protein_state.env_misc:
+        protein_state.env_misc[key] = protein_state.env_misc[key]*1.0
+    for state_name in ['mRNAs', 'host_factors']:
+        curr_state = state.get_state(state_name)
+        for attr_name, value in vars(curr_state).items():
+            setattr(curr_state, attr_name, value*1.0)
+    DNA_state = state.get_state('DNAs')
+    DNA_state.promoter_activity = DNA_state.promoter_activity*1.0
+
+    container = state.get_state('viral_progeny_container')
+    container.proteins_cyt = protein_state.proteins_cyt
+    container.proteins_mem = protein_state.proteins_mem
+    container.num_of_Env_t = container.num_of_Env_t*1.0
+    for protein_name in container.helper_protein_dict:
+        container.helper_protein_dict[protein_name] = container.helper_protein_dict[protein_name]*1.0
+
+# numpy.random.RandomState whose draws of amounts return their expectations (see above)
+# Draw methods not overridden here draw from the RandomState with a fixed seed
+class MeanFieldRandomState(np.random.RandomState):
+
+    def __init__(self, seed=0):
+        np.random.RandomState.__init__(self, seed)
+
+    def poisson(self, lam=1.0, size=None):
+        if size == None:
+            return lam*1.0
+        return np.ones(size)*lam
+
+    def binomial(self, n, p, size=None):
+        if size == None:
+            return np.multiply(n, p)*1.0
+        return np.ones(size)*np.multiply(n, p)
+
+    def hypergeometric(self, ngood, nbad, nsample, size=None):
+        expectation = np.multiply(nsample, ngood)/(np.add(ngood, nbad)*1.0)
+        if size == None:
+            return expectation
+        return np.ones(size)*expectation
+
+    def multinomial(self, n, pvals, size=None):
+        if size == None:
+            return n*np.asarray(pvals, float)
+        return np.ones(np.append(size, len(pvals)))*n*np.asarray(pvals, float)
+
+    def standard_normal(self, size=None):
+        if size == None:
+            return 0.
+        return np.zeros(size)
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        if size == None:
+            return loc
+        return np.ones(size)*loc
+
+    def exponential(self, scale=1.0, size=None):
+        if size == None:
+            return scale
+        return np.ones(size)*scale
@@ -2,9 +2,23 @@
 import numpy as np
 
 class Process(object):
+    # Names of attributes that change during a simulation and are saved
+    # with the state in checkpoints (see mainaux/Checkpoint.py)
+    CHECKPOINT_ATTRIBUTES = []
+
+    # Names of methods that are right-hand sides of ODEs solved with odeint
+    # (counted when profiling, see mainaux/Profiler.py)
+    ODE_METHODS = []
+
     def __init__(self):
         pass
         
+    # False only if evolve_state would leave the state as is without drawing any random
+    # numbers, so that Simulation can skip the call without changing the results
+    # Must be cheap compared to evolve_state; processes that always have work keep this default
+    def has_work(self):
+        return True
+
     def runProcess(process):
         #Run 1 timestep of a process
         pass
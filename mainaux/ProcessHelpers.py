@@ -1,26 +1,38 @@
 import operator
 import numpy as np
+from mainaux.StochasticKernels import binomial_thinning
 
-def roll_dice(num, rate):
+# random_state: numpy.random.RandomState the random numbers are drawn from
+# hybrid_threshold: see StochasticKernels.binomial_thinning
+def roll_dice(num, rate, random_state=np.random, hybrid_threshold=None):
     # if rate is > 1
     # switch to Poisson
     if rate > 1:
-        temp_num = np.random.poisson(num * rate)
+        temp_num = random_state.poisson(num * rate)
         rtn_amt = min(temp_num, num)
     else:
         # rate is <= 1
-        temp_rand = np.random.rand(num) # creates an array of rand elem of size 1 x num
-        rtn_amt = (temp_rand < rate).sum()
+        rtn_amt = binomial_thinning(num, rate, random_state, hybrid_threshold)
     return rtn_amt
 
+# Returns a new root seed drawn from the entropy source of the OS
+def generate_root_seed():
+    return np.random.RandomState().randint(0, 2**31 - 1)
+
+# Returns the random number generator of simulation sim_index in a run seeded with root_seed
+# The stream only depends on (root_seed, sim_index), so any simulation of a run
+# can be re-run on its own and draw the same random numbers
+def generate_random_state(root_seed, sim_index=0):
+    return np.random.RandomState([root_seed, sim_index])
+
 # moves amt from input_dict[key1] to input_dict[key2]
 # Assumes amt is a valid amount
 def move_buckets(input_dict, key1, key2, amt):
     input_dict[key1] -= amt
     input_dict[key2] += amt
 
-def transfer_buckets(input_dict, key1, key2, rate):
-    amt_to_transfer = roll_dice(input_dict[key1], rate)
+def transfer_buckets(input_dict, key1, key2, rate, random_state=np.random, hybrid_threshold=None):
+    amt_to_transfer = roll_dice(input_dict[key1], rate, random_state, hybrid_threshold)
     move_buckets(input_dict, key1, key2, amt_to_transfer)
     return amt_to_transfer
 
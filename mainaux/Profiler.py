@@ -0,0 +1,115 @@
+import numpy as np
+import time
+
+# Profiling of a Simulation (see the profile argument of Simulation)
+# For every process evolve_state and every state record_state, a Profiler accumulates
+#   wall time, number of calls, and number of random numbers drawn during the calls
+# and for every process that solves ODEs (see Process.ODE_METHODS), the number of
+# evaluations of the right-hand side, and the number of calls skipped because the process had no work
+# Profilers of the simulations of an ensemble are combined with merge_profilers
+
+# Methods of numpy.random.RandomState that draw random numbers
+DRAW_METHODS = ['rand', 'randn', 'random_sample', 'randint', 'poisson', 'binomial', 'multinomial', 'hypergeometric',
+                'normal', 'standard_normal', 'uniform', 'exponential', 'choice', 'permutation', 'shuffle']
+
+# Returns a method that draws like method_name of numpy.random.RandomState and counts the random numbers drawn
+def counting_draw_method(method_name):
+    method = getattr(np.random.RandomState, method_name)
+    def counting_method(self, *args, **kwargs):
+        # draw methods call each other (e.g. rand calls random_sample), so only the outermost call counts
+        self.depth += 1
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            self.depth -= 1
+        if self.depth == 0:
+            if result is None: # shuffle works in place
+                self.num_of_draws += len(args[0])
+            else:
+                self.num_of_draws += np.size(result)
+        return result
+    return counting_method
+
+# numpy.random.RandomState that counts the random numbers drawn from it
+# Draws exactly the same numbers as a RandomState in the same state
+class CountingRandomState(np.random.RandomState):
+
+    def __init__(self, seed=None):
+        np.random.RandomState.__init__(self, seed)
+        self.num_of_draws = 0
+        self.depth = 0
+
+for method_name in DRAW_METHODS:
+    setattr(CountingRandomState, method_name, counting_draw_method(method_name))
+
+class Profiler(object):
+
+    # random_state: CountingRandomState the profiled simulation draws from
+    def __init__(self, random_state=None):
+        self.random_state = random_state
+        # key -> [calls, seconds, draws, ODE evals, skipped calls]
+        self.stats_dict = dict()
+        self.num_of_runs = 1
+
+    def add(self, key, calls=0, seconds=0, draws=0, ODE_evals=0, skipped_calls=0):
+        if key not in self.stats_dict:
+            self.stats_dict[key] = [0, 0, 0, 0, 0]
+        row = self.stats_dict[key]
+        row[0] += calls
+        row[1] += seconds
+        row[2] += draws
+        row[3] += ODE_evals
+        row[4] += skipped_calls
+
+    # Calls function(*args), accounting its time and random draws to key
+    def call(self, key, function, *args):
+        num_of_draws = self.random_state.num_of_draws
+        start_time = time.time()
+        result = function(*args)
+        self.add(key, 1, time.time() - start_time, self.random_state.num_of_draws - num_of_draws)
+        return result
+
+    # Makes process count the evaluations of its ODE right-hand sides, accounted to key
+    def count_ODE_evaluations(self, key, process):
+        for method_name in process.ODE_METHODS:
+            # shadows the method on this process object only
+            setattr(process, method_name, self.counting_method(key, getattr(process, method_name)))
+
+    # Returns a function that counts an ODE evaluation for key and calls method
+    # (a function of its own, so that each wrapper keeps the method it was made for)
+    def counting_method(self, key, method):
+        def counted_method(*args, **kwargs):
+            self.add(key, ODE_evals=1)
+            return method(*args, **kwargs)
+        return counted_method
+
+    # Returns the table of the accumulated statistics as a string, with one row per key
+    # in order of decreasing time
+    def table(self):
+        total_seconds = sum(row[1] for row in self.stats_dict.values())
+        lines = []
+        if self.num_of_runs > 1:
+            lines.append('Merged profile of ' + str(self.num_of_runs) + ' simulations')
+        lines.append('%-40s %10s %10s %8s %7s %12s %12s %10s' % ('', 'calls', 'seconds', 'ms/call', '%time', 'draws', 'ODE evals', 'skipped'))
+        for key in sorted(self.stats_dict, key=lambda key: -self.stats_dict[key][1]):
+            calls, seconds, draws, ODE_evals, skipped_calls = self.stats_dict[key]
+            ms_per_call = 0
+            if calls > 0:
+                ms_per_call = 1000*seconds/calls
+            percent_of_time = 0
+            if total_seconds > 0:
+                percent_of_time = 100*seconds/total_seconds
+            lines.append('%-40s %10d %10.3f %8.3f %7.1f %12d %12d %10d' % (key, calls, seconds, ms_per_call, percent_of_time, draws, ODE_evals, skipped_calls))
+        lines.append('%-40s %10s %10.3f' % ('total', '', total_seconds))
+        return '\n'.join(lines)
+
+# Returns a Profiler holding the sums of the statistics of list_of_profilers
+# (e.g. those of the simulations of an ensemble)
+def merge_profilers(list_of_profilers):
+    merged_profiler = Profiler()
+    merged_profiler.num_of_runs = 0
+    for profiler in list_of_profilers:
+        for key in profiler.stats_dict:
+            merged_profiler.add(key, *profiler.stats_dict[key])
+        merged_profiler.num_of_runs += profiler.num_of_runs
+    return merged_profiler
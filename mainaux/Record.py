@@ -13,7 +13,10 @@ class Record(object):
         self.scatter_plots_list = []
         self.sim_index = 0
         self.batch_label = ""
+        self.root_seed = None
         self.sampling_rate = sampling_rate
+        # type the data is recorded as; float in mean-field simulations (see mainaux/MeanField.py)
+        self.dtype = int
         self.hist_dict = {}
         self.list_of_dependent_keys = list_of_dependent_keys
         self.set_of_req_key_names = set_of_req_record_key_names
@@ -28,16 +31,21 @@ class Record(object):
         if key not in self.set_of_req_key_names:
             return
 
-        if time == 0:
+        if time == 0 or key not in self.variable_tracking_dict: # a resumed simulation may start recording a key late
             #assumes all data is saved as an array of ints
             #change code to allow richer diversity of data
-            self.variable_tracking_dict[key] = np.zeros((np.size(value), len(np.arange(0, max_timesteps, self.sampling_rate))), int)
+            self.variable_tracking_dict[key] = np.zeros((np.size(value), len(np.arange(0, max_timesteps, self.sampling_rate))), self.dtype)
             #vars(self)['saved_' + key] = np.zeros((np.size(value), max_timesteps), int) 
         
         #vars(self)['saved_' + key][:,time] = value
         self.variable_tracking_dict[key][:,time/self.sampling_rate] = value
         #self.variable_tracking_list.insert(time, (time, key, value))
 
+    # Records the values recorded at from_time again at time, for every key
+    def copy_tracking(self, from_time, time):
+        for key in self.variable_tracking_dict:
+            self.variable_tracking_dict[key][:,time/self.sampling_rate] = self.variable_tracking_dict[key][:,from_time/self.sampling_rate]
+
     def generate_data_for_dependent_keys(self):
         for key in self.list_of_dependent_keys:
             self.variable_tracking_dict[key.name] = key.generate_key_data(self.variable_tracking_dict)
@@ -0,0 +1,182 @@
+import json
+import os
+import socket
+import SocketServer
+import multiprocessing
+import time
+import numpy as np
+from mainaux.Record import Record
+from mainaux.Simulation import Simulation
+from mainaux.InitParamValues import generate_param_dict
+from mainaux.ProcessHelpers import generate_root_seed
+import mainaux.PlotCompilation as PlotCompilation
+
+# Long-lived daemon that runs simulation jobs on warm worker processes
+# The workers import every module and parse parameters.csv once, so short jobs do not pay
+# the startup cost of a new python process (see RunDaemon.py)
+# The daemon listens on a Unix socket (address is a path) or on TCP (address is (host, port))
+# A client sends a job as one JSON line:
+#   {"num_of_timesteps": 300, "list_of_key_names": ["proteins_nuc"], "num_of_simulations": 2,
+#    "sampling_rate": 1, "param_overrides": {"PROMOTER_ON_RATE": 1}, "root_seed": 5,
+#    "sim_indices": [0, 1]}
+#   every field but num_of_timesteps and list_of_key_names is optional; sim_indices
+#   overrides num_of_simulations, and a missing root seed is drawn by the daemon
+# and the daemon streams back one JSON line per simulation as soon as it finishes:
+#   {"type": "simulation", "sim_index": 0, "tracking": {key: nested lists}}
+# followed by {"type": "done", "root_seed": 5, "elapsed": seconds}, or by
+# {"type": "error", "message": ...} if the job failed
+# Simulation i of a job draws from the same random stream as simulation i of
+# SimHelpers.initialize_runsim_dict with the same root seed, so the results are identical
+
+# Default number of seconds a client waits for the next line of the daemon
+CLIENT_TIMEOUT = 3600
+
+# Runs one simulation of a job and returns (sim_index, variable_tracking_dict)
+# Defined at module level so that it can be handed to a multiprocessing.Pool
+def run_job_simulation(args):
+    list_of_key_names, sim_index, num_of_timesteps, sampling_rate, param_overrides, root_seed = args
+    list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(list_of_key_names)
+    record1 = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=sampling_rate)
+    record1.sim_index = sim_index
+    sim1 = Simulation(record1, num_of_timesteps, root_seed=root_seed, param_overrides=param_overrides)
+    sim1.run()
+    return sim_index, record1.variable_tracking_dict
+
+# Run in every worker when it starts, so that its first job finds parameters.csv parsed
+def warm_up_worker():
+    generate_param_dict()
+
+# Returns the list of args of run_job_simulation for each simulation of job_dict
+def job_to_args(job_dict):
+    if 'num_of_timesteps' not in job_dict or 'list_of_key_names' not in job_dict:
+        raise Exception("A job needs num_of_timesteps and list_of_key_names")
+    list_of_sim_indices = job_dict.get('sim_indices')
+    if list_of_sim_indices == None:
+        list_of_sim_indices = range(job_dict.get('num_of_simulations', 1))
+    param_overrides = dict()
+    for param_name, value in job_dict.get('param_overrides', dict()).items():
+        # params given as lists in parameters.csv are arrays
+        if isinstance(value, list):
+            value = np.array(value)
+        param_overrides[str(param_name)] = value
+    list_of_key_names = [str(key_name) for key_name in job_dict['list_of_key_names']]
+    return [(list_of_key_names, int(sim_index), int(job_dict['num_of_timesteps']), int(job_dict.get('sampling_rate', 1)),
+             param_overrides, int(job_dict['root_seed'])) for sim_index in list_of_sim_indices]
+
+def tracking_to_json(variable_tracking_dict):
+    rtn_dict = dict()
+    for key in variable_tracking_dict:
+        value = variable_tracking_dict[key]
+        if isinstance(value, np.ndarray):
+            value = value.tolist()
+        rtn_dict[key] = value
+    return rtn_dict
+
+class JobHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        start_time = time.time()
+        try:
+            job_dict = json.loads(self.rfile.readline())
+            if job_dict.get('root_seed') == None:
+                job_dict['root_seed'] = generate_root_seed()
+            list_of_args = job_to_args(job_dict)
+            for sim_index, variable_tracking_dict in self.server.pool.imap_unordered(run_job_simulation, list_of_args, 1):
+                self.write_line({'type': 'simulation', 'sim_index': sim_index, 'tracking': tracking_to_json(variable_tracking_dict)})
+        except socket.error:
+            return # the client went away
+        except Exception as e:
+            self.write_line({'type': 'error', 'message': str(e)})
+            return
+        self.write_line({'type': 'done', 'root_seed': job_dict['root_seed'], 'elapsed': time.time() - start_time})
+
+    def write_line(self, line_dict):
+        self.wfile.write(json.dumps(line_dict) + "\n")
+        self.wfile.flush()
+
+# Every connection is handled in its own thread, and the jobs of all of them share the pool
+class ThreadingUnixServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+class ThreadingTCPServer(SocketServer.ThreadingMixIn, SocketServer.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SimDaemon(object):
+
+    # address: path of a Unix socket, or (host, port) to listen on TCP (use a host of
+    #   'localhost' so that only local clients can connect)
+    # num_of_workers: number of warm worker processes, None for one per core
+    def __init__(self, address, num_of_workers=None):
+        if num_of_workers == None:
+            num_of_workers = multiprocessing.cpu_count()
+        # workers are forked before the server starts any threads
+        self.pool = multiprocessing.Pool(num_of_workers, warm_up_worker)
+        if isinstance(address, tuple):
+            self.server = ThreadingTCPServer(address, JobHandler)
+        else:
+            if os.path.exists(address):
+                os.remove(address)
+            self.server = ThreadingUnixServer(address, JobHandler)
+        self.server.pool = self.pool
+        self.address = self.server.server_address
+
+    # Handles jobs until shutdown is called (from another thread) or the process is interrupted
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.remove(self.address)
+        self.pool.terminate()
+        self.pool.join()
+
+# Sends job_dict to the daemon at address and yields (sim_index, variable_tracking_dict)
+# for every simulation as soon as it finishes; the last value is the done line of the job
+def submit_job(address, job_dict, timeout=CLIENT_TIMEOUT):
+    if isinstance(address, tuple):
+        connection = socket.create_connection(address, timeout)
+    else:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(timeout)
+        connection.connect(address)
+    try:
+        connection.sendall(json.dumps(job_dict) + "\n")
+        fileHandler = connection.makefile('rb')
+        for line in fileHandler:
+            line_dict = json.loads(line)
+            if line_dict['type'] == 'error':
+                raise Exception("Job failed in the daemon: " + line_dict['message'])
+            elif line_dict['type'] == 'done':
+                yield line_dict
+                return
+            variable_tracking_dict = dict()
+            for key, value in line_dict['tracking'].items():
+                variable_tracking_dict[str(key)] = np.array(value)
+            yield line_dict['sim_index'], variable_tracking_dict
+        raise Exception("The daemon closed the connection before the job was done")
+    finally:
+        connection.close()
+
+# Runs job_dict on the daemon at address and returns (master_tracking_dict, root_seed),
+# with master_tracking_dict laid out like that of SimHelpers.initialize_runsim_dict
+def run_job(address, job_dict, timeout=CLIENT_TIMEOUT):
+    list_of_results = []
+    for result in submit_job(address, job_dict, timeout):
+        if isinstance(result, dict):
+            root_seed = result['root_seed']
+        else:
+            list_of_results.append(result)
+    list_of_results.sort(key=lambda result: result[0])
+    master_tracking_dict = dict()
+    for sim_index, variable_tracking_dict in list_of_results:
+        for key in variable_tracking_dict:
+            master_tracking_dict.setdefault(key, []).append(variable_tracking_dict[key])
+    return master_tracking_dict, root_seed
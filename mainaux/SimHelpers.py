@@ -1,23 +1,20 @@
 import numpy as np
-import operator
 from mainaux.Record import Record
 from mainaux.Simulation import Simulation
+from mainaux.BatchSimulation import BatchSimulation
 import mainaux.PlotCompilation as PlotCompilation
 import mainaux.PlotHelpers as PlotHelpers
+import mainaux.Checkpoint as Checkpoint
+import mainaux.Profiler as Profiler
 import matplotlib.pyplot as plt
 import os
 import csv
 import datetime
-
-# Dictionary of supported operators
-_ops =  {
-            "<" : operator.lt,
-            "<=": operator.le,
-            "==": operator.eq,
-            "!=": operator.ne,
-            ">=": operator.ge,
-            ">" : operator.gt
-        }
+import multiprocessing
+import scipy.stats
+from mainaux.ProcessHelpers import generate_root_seed, ops
+from mainaux.SimDaemon import run_job_simulation
+from process.processaux.IntegrationSiteEffects import IntegrationSiteEffects
 
 # Returns a dictionary where the key is a key in variable_tracking_dict
 # and the value is a list of matrices, where each matrix corresponds to
@@ -26,6 +23,9 @@ _ops =  {
 # A matrix for a particular simulation is to be added to the list of matrices
 # for a particular key of the output dictionary if:
 # operator(matrix[row_index, timestep], value) == True
+# timestep is a minute of the simulation; with a sampling_rate larger than 1 it must be a
+# recorded one (a multiple of sampling_rate), held in column timestep/sampling_rate
+# The operators are those of ProcessHelpers.ops
 
 # Omit the operator argument to have generate_subset_dict act as the identity function
 # Also added timestep=None, so can filter out matrices depending on whether or not
@@ -33,7 +33,7 @@ _ops =  {
 # e.g. key='proteins_nuc', row_index=Proteins.index['Rev'], timestep=None, value=0, operator="<"
 # means that we are only interested in simulations where the amount of Rev in the nucleus < 0
 # for all timesteps
-def generate_subset_dict(input_dict, key=None, row_index=None, timestep=None, value=None, operator=None):
+def generate_subset_dict(input_dict, key=None, row_index=None, timestep=None, value=None, operator=None, sampling_rate=1):
     subset_dict = dict()
 
     if operator == None:
@@ -44,11 +44,11 @@ def generate_subset_dict(input_dict, key=None, row_index=None, timestep=None, va
     list_of_indices = []
     if timestep != None:
         for sim_index in range(len(input_dict[key])):
-            if _ops[operator](input_dict[key][sim_index][row_index, timestep], value) == True:
+            if ops[operator](input_dict[key][sim_index][row_index, timestep/sampling_rate], value) == True:
                 list_of_indices.append(sim_index)
     else: # timestep == None, checks all 360 timesteps of a particular row with index row_index
         for sim_index in range(len(input_dict[key])):
-            if len(input_dict[key][sim_index][row_index][_ops[operator](input_dict[key][sim_index][row_index], value)]) > 0:
+            if len(input_dict[key][sim_index][row_index][ops[operator](input_dict[key][sim_index][row_index], value)]) > 0:
                 list_of_indices.append(sim_index)
 
     # Add relevant matrices to each key in subset_dict
@@ -73,19 +73,50 @@ def generate_subset_dict(input_dict, key=None, row_index=None, timestep=None, va
 #   options: "standard deviation", "range", "all data", None
 #   Note average is always plotted for >1 sim. per const param section
 # list_of_key_names: determines what keys will be plotted
-def generate_increment_param_plots(num_of_sim, num_of_timesteps, param_name, init_val, increment_val, increment_type, num_increments, export_raw_data_no_plot, group_by_row_num, type_of_plot, log_setting_opt, sampling_rate, list_of_key_names):
+# num_of_workers: number of processes the simulations of each section are spread across (see initialize_runsim_dict)
+# batch_size: number of simulations of each section advanced together (see initialize_runsim_dict)
+# root_seed: seed the random numbers of every section are derived from (see initialize_root_seed)
+#   section curr_increment is run with root_seed + curr_increment, so sections stay independent
+# telemetry: Telemetry the progress of every section is reported to (see initialize_runsim_dict)
+# common_random_numbers: run simulation i of every section with the same root seed and per-process
+#   streams (see Simulation), so that the sections differ by the param value rather than by noise;
+#   the statistics of the paired differences between the sections are printed at the end
+#   (see paired_difference_report). Not supported when batch_size is not None
+# mean_field: run a single deterministic mean-field trajectory, which propagates expected amounts as
+#   floats, per section instead of num_of_sim simulations (see mainaux/MeanField.py); it takes a fraction
+#   of the time of a simulation, but it is not the ensemble mean, since thresholds such as G2/M
+#   arrest act on expectations. The sections are spread across num_of_workers processes (see
+#   run_mean_field_sweep). Not supported when batch_size is not None or with common_random_numbers
+def generate_increment_param_plots(num_of_sim, num_of_timesteps, param_name, init_val, increment_val, increment_type, num_increments, export_raw_data_no_plot, group_by_row_num, type_of_plot, log_setting_opt, sampling_rate, list_of_key_names, num_of_workers=1, batch_size=None, root_seed=None, telemetry=None, common_random_numbers=False, mean_field=False):
+    root_seed = initialize_root_seed(root_seed)
+    list_of_master_tracking_dicts = []
+    list_of_vals_of_param = []
+
+    if mean_field:
+        if batch_size != None:
+            raise Exception("Mean-field simulations are not supported when simulations are run in batches (batch_size must be None)")
+        if common_random_numbers:
+            raise Exception("Mean-field simulations do not depend on the root seed, so they cannot be run with common random numbers")
+        num_of_sim = 1
+        list_of_mean_field_dicts, list_of_plotting_keys = run_mean_field_sweep(list_of_key_names, num_of_timesteps, sampling_rate, param_name, [increment_param_value(init_val, increment_val, increment_type, curr_increment) for curr_increment in range(num_increments+1)], num_of_workers)
 
     if export_raw_data_no_plot:
         output_data_label = initialize_label("outputdata")
-        create_output_data_info_file(output_data_label, group_by_row_num, num_of_sim, param_name, increment_type)
+        create_output_data_info_file(output_data_label, group_by_row_num, num_of_sim, param_name, increment_type, root_seed)
 
     # each iteration of this for loop corresponds to a parameter cross section in VPV
     for curr_increment in range(num_increments+1):
-        if increment_type == 'exponential':
-            val_of_param = init_val * (increment_val)^curr_increment
-        else: # increment_type == 'linear'
-            val_of_param = init_val + increment_val*curr_increment
-        master_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_sim, num_of_timesteps, sampling_rate, param_name, val_of_param)
+        val_of_param = increment_param_value(init_val, increment_val, increment_type, curr_increment)
+        if mean_field:
+            master_tracking_dict = list_of_mean_field_dicts[curr_increment]
+        elif common_random_numbers:
+            master_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_sim, num_of_timesteps, sampling_rate, param_name, val_of_param, num_of_workers=num_of_workers, batch_size=batch_size, root_seed=root_seed, telemetry=telemetry, per_process_streams=True)
+            list_of_master_tracking_dicts.append(master_tracking_dict)
+            list_of_vals_of_param.append(val_of_param)
+            if curr_increment == num_increments:
+                paired_difference_report(list_of_master_tracking_dicts, list_of_key_names, list_of_vals_of_param)
+        else:
+            master_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_sim, num_of_timesteps, sampling_rate, param_name, val_of_param, num_of_workers=num_of_workers, batch_size=batch_size, root_seed=root_seed + curr_increment, telemetry=telemetry)
         
 #         #save master_tracking_dict here such that it can be opened in excel!
 #         f = open("outputfiles/" + datetime.datetime.now().strftime("%m_%d_%H_%M") + "total_" + "_" + str(curr_increment) + ".csv", "w")
@@ -117,6 +148,69 @@ def generate_increment_param_plots(num_of_sim, num_of_timesteps, param_name, ini
             else:
                 plot_tracking_dictionary(master_tracking_dict, num_of_timesteps, list_of_plotting_keys, type_of_plot, inc_of_interest=curr_increment, num_of_const_param_sections=num_increments+1, is_last_const_param_section=True, log_setting=log_setting_opt, sampling_rate = sampling_rate)
 
+# Returns the value of the param in section curr_increment of generate_increment_param_plots
+def increment_param_value(init_val, increment_val, increment_type, curr_increment):
+    if increment_type == 'exponential':
+        return init_val * (increment_val)^curr_increment
+    else: # increment_type == 'linear'
+        return init_val + increment_val*curr_increment
+
+# Runs one deterministic mean-field simulation (see mainaux/MeanField.py) for every value in
+# list_of_vals_of_param of param_name, spread across num_of_workers processes
+# Returns the list of the master_tracking_dicts of the values (each holding a single simulation),
+# and list_of_plotting_keys
+def run_mean_field_sweep(list_of_key_names, NUM_OF_TIMESTEPS, SAMPLING_RATE, param_name, list_of_vals_of_param, num_of_workers=1):
+    list_of_plotting_keys = PlotCompilation.generate_plotting_keys(list_of_key_names)[0]
+    list_of_args = [(run_single_simulation, dict(list_of_key_names=list_of_key_names, sim_index=section, NUM_OF_TIMESTEPS=NUM_OF_TIMESTEPS, SAMPLING_RATE=SAMPLING_RATE,
+                                                 modified_param=param_name, new_val_of_param=val_of_param, root_seed=0, mean_field=True))
+                    for section, val_of_param in enumerate(list_of_vals_of_param)]
+
+    if num_of_workers == None:
+        num_of_workers = multiprocessing.cpu_count()
+    num_of_workers = min(num_of_workers, len(list_of_args))
+    if num_of_workers <= 1:
+        list_of_results = [call_with_kwargs(args) for args in list_of_args]
+    else:
+        pool = multiprocessing.Pool(num_of_workers)
+        try:
+            list_of_results = pool.map(call_with_kwargs, list_of_args, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    list_of_master_tracking_dicts = []
+    for section, variable_tracking_dict, hist_dict, profiler in list_of_results:
+        list_of_master_tracking_dicts.append(dict((key, [variable_tracking_dict[key]]) for key in variable_tracking_dict))
+    return list_of_master_tracking_dicts, list_of_plotting_keys
+
+# Prints, for every key and every section after the first, the difference to the first section of
+# the data at the last recorded timestep (summed over the rows of the key):
+#   its mean, its standard error from the paired differences of simulation i of both sections,
+#   the standard error of independent sections with as many simulations, and the ratio of
+#   their squares, i.e. how many times more simulations independent sections would need
+# Returns the list of (key, val_of_param, mean difference, paired std error, independent std error)
+def paired_difference_report(list_of_master_tracking_dicts, list_of_key_names, list_of_vals_of_param):
+    rtn_list = []
+    print('%-40s %12s %14s %12s %12s %10s' % ('paired differences to ' + str(list_of_vals_of_param[0]), 'param value', 'mean diff', 'paired SE', 'indep. SE', 'run factor'))
+    for key in list_of_key_names:
+        if key not in list_of_master_tracking_dicts[0]:
+            continue
+        base_values = np.array([np.sum(np.atleast_2d(sim_data)[:,-1]) for sim_data in list_of_master_tracking_dicts[0][key]], float)
+        num_of_sim = len(base_values)
+        for master_tracking_dict, val_of_param in zip(list_of_master_tracking_dicts[1:], list_of_vals_of_param[1:]):
+            values = np.array([np.sum(np.atleast_2d(sim_data)[:,-1]) for sim_data in master_tracking_dict[key]], float)
+            if num_of_sim < 2:
+                paired_std_error = independent_std_error = np.nan
+            else:
+                paired_std_error = np.std(values - base_values, ddof=1)/np.sqrt(num_of_sim)
+                independent_std_error = np.sqrt((np.var(values, ddof=1) + np.var(base_values, ddof=1))/num_of_sim)
+            run_factor = np.nan
+            if paired_std_error > 0:
+                run_factor = (independent_std_error/paired_std_error)**2
+            print('%-40s %12s %14.4g %12.4g %12.4g %10.2f' % (key, val_of_param, np.mean(values - base_values), paired_std_error, independent_std_error, run_factor))
+            rtn_list.append((key, val_of_param, np.mean(values - base_values), paired_std_error, independent_std_error))
+    return rtn_list
+
 def plot_tracking_dictionary(input_dict, NUM_OF_TIMESTEPS, list_of_plotting_keys, side_operation=None, inc_of_interest=0, num_of_const_param_sections=1, is_last_const_param_section=True, log_setting=True, sampling_rate=1, export_raw_data_no_plot=False):
     combined_dict = dict() # This is the dictionary that we end up plotting
 
@@ -184,29 +278,345 @@ def plot_tracking_dictionary(input_dict, NUM_OF_TIMESTEPS, list_of_plotting_keys
             plt.show()
     return record1
 
-def initialize_runsim_dict(list_of_key_names, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param=None, new_val_of_param=None, save_state_mode=False, timestep_list=None, batch_label="", rtn_hist_dict=False):
+# Returns function(**kwargs) for (function, kwargs) = function_and_kwargs
+# A multiprocessing.Pool hands a single argument to the function it runs, so the workers below
+# are handed to it through this function, with their arguments by name
+def call_with_kwargs(function_and_kwargs):
+    function, kwargs = function_and_kwargs
+    return function(**kwargs)
+
+# Runs a single simulation and returns (sim_index, variable_tracking_dict, hist_dict, profiler)
+# The arguments are those of initialize_runsim_dict, for simulation sim_index
+# profiler is the Profiler of the simulation if it was profiled, None otherwise
+# variable_tracking_dict is None if the simulation did not meet list_of_filters (see Simulation.passes_filters)
+# Defined at module level so that it can be handed to a multiprocessing.Pool (see call_with_kwargs);
+# the plotting keys hold closures that cannot be pickled, so each call
+# regenerates them from list_of_key_names
+def run_single_simulation(list_of_key_names, sim_index, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param=None, new_val_of_param=None, save_state_mode=False, timestep_list=None, batch_label="", root_seed=None, checkpoint_path=None, profile=False, telemetry=None, list_of_filters=None, per_process_streams=False, mean_field=False):
     list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(list_of_key_names)
 
-    master_tracking_dict = dict()
-    for sim_index in range(NUM_OF_SIMULATIONS):
+    record1 = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=SAMPLING_RATE)
+    record1.sim_index = sim_index
+    record1.batch_label = batch_label
+    sim1 = Simulation(record1, NUM_OF_TIMESTEPS, modified_param, new_val_of_param, save_state=save_state_mode, save_state_timestep_list=timestep_list, root_seed=root_seed, profile=profile, telemetry=telemetry, list_of_filters=list_of_filters, per_process_streams=per_process_streams, mean_field=mean_field)
+    if checkpoint_path != None:
+        sim1.fork_from_checkpoint(checkpoint_path)
+    elif save_state_mode:
+        # continue from the latest checkpoint if this batch was already (partly) run
+        latest_checkpoint_path = Checkpoint.find_latest_checkpoint(batch_label, sim_index)
+        if latest_checkpoint_path != None:
+            sim1.resume_from_checkpoint(latest_checkpoint_path)
+    sim1.run()
+    if profile:
+        print('profile of simulation ' + str(sim_index) + ':\n' + sim1.profiler.table())
+    if not sim1.accepted:
+        return sim_index, None, None, sim1.profiler
+    return sim_index, record1.variable_tracking_dict, record1.hist_dict, sim1.profiler
+
+# Runs a group of simulations together in one BatchSimulation and returns a list
+# holding (sim_index, variable_tracking_dict, hist_dict, None) for each of them
+def run_batch_simulation(list_of_key_names, list_of_sim_indices, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param=None, new_val_of_param=None, batch_label="", root_seed=None, telemetry=None):
+    list_of_records = []
+    for sim_index in list_of_sim_indices:
+        list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(list_of_key_names)
         record1 = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=SAMPLING_RATE)
         record1.sim_index = sim_index
         record1.batch_label = batch_label
-        sim1 = Simulation(record1, NUM_OF_TIMESTEPS, modified_param, new_val_of_param, save_state=save_state_mode, save_state_timestep_list=timestep_list)
-        sim1.run()
-        if sim_index == 0:
-            initial_tracking_dict = record1.variable_tracking_dict
-            for key in initial_tracking_dict:
-                master_tracking_dict[key] = [initial_tracking_dict[key]]
-            hist_dict = record1.hist_dict
+        list_of_records.append(record1)
+    batch_sim = BatchSimulation(list_of_records, NUM_OF_TIMESTEPS, modified_param, new_val_of_param, root_seed, telemetry)
+    batch_sim.run()
+    return [(record1.sim_index, record1.variable_tracking_dict, record1.hist_dict, None) for record1 in list_of_records]
+
+# Returns root_seed, or a new root seed if root_seed is None
+# The seed is printed so that any run can be reproduced by passing it back in
+def initialize_root_seed(root_seed=None):
+    if root_seed == None:
+        root_seed = generate_root_seed()
+    print('root seed of this run: ' + str(root_seed))
+    return root_seed
+
+# num_of_workers: number of processes the simulations are spread across
+#   1 runs every simulation in the current process (no pool is created)
+#   None uses one worker per core
+# batch_size: number of simulations advanced together by one BatchSimulation
+#   None runs every simulation on its own with Simulation
+#   Saving states is only supported when batch_size is None
+# root_seed: simulation i draws its random numbers from a stream seeded by (root_seed, i),
+#   so its results do not depend on num_of_workers and it can be re-run on its own
+#   (a batch of simulations is reproduced by rerunning the same batch)
+# checkpoint_path: if given, every simulation is a branch of the simulation saved there
+#   (see Simulation.fork_from_checkpoint) and only runs the timesteps after it
+#   Not supported when batch_size is not None
+# profile: profile every simulation (see mainaux/Profiler.py); the table of each simulation
+#   and the merged table of all of them are printed
+#   Not supported when batch_size is not None
+# telemetry: Telemetry every simulation reports its progress to, and that gets a line for the
+#   whole ensemble every time simulations finish (see mainaux/Telemetry.py); None reports nothing
+# first_sim_index: sim index of the first simulation, so that more simulations can be added
+#   to an ensemble later (see run_adaptive_ensemble)
+# list_of_filters: list of (key, row_index, timestep, value, operator) every simulation must meet
+#   (see Simulation.passes_filters); simulations stop as soon as they fail one, and are left out
+#   of the result (see run_filtered_ensemble). Not supported when batch_size is not None
+# per_process_streams: every process of a simulation draws from a stream of its own (see Simulation)
+#   Not supported when batch_size is not None
+# mean_field: run every simulation as a deterministic mean-field trajectory (see mainaux/MeanField.py);
+#   every simulation then has the same result, so NUM_OF_SIMULATIONS is usually 1
+#   Not supported when batch_size is not None
+# Results are merged in order of sim_index regardless of which worker finished first,
+# so master_tracking_dict[key][i] always belongs to simulation first_sim_index + i
+# (without list_of_filters)
+def initialize_runsim_dict(list_of_key_names, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param=None, new_val_of_param=None, save_state_mode=False, timestep_list=None, batch_label="", rtn_hist_dict=False, num_of_workers=1, batch_size=None, root_seed=None, checkpoint_path=None, profile=False, telemetry=None, first_sim_index=0, list_of_filters=None, per_process_streams=False, mean_field=False):
+    if root_seed == None:
+        root_seed = generate_root_seed()
+    list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(list_of_key_names)
+
+    if batch_size == None:
+        list_of_args = [(run_single_simulation, dict(list_of_key_names=list_of_key_names, sim_index=sim_index, NUM_OF_TIMESTEPS=NUM_OF_TIMESTEPS, SAMPLING_RATE=SAMPLING_RATE,
+                                                     modified_param=modified_param, new_val_of_param=new_val_of_param, save_state_mode=save_state_mode, timestep_list=timestep_list,
+                                                     batch_label=batch_label, root_seed=root_seed, checkpoint_path=checkpoint_path, profile=profile,
+                                                     telemetry=telemetry, list_of_filters=list_of_filters, per_process_streams=per_process_streams, mean_field=mean_field))
+                        for sim_index in range(first_sim_index, first_sim_index + NUM_OF_SIMULATIONS)]
+    else:
+        if checkpoint_path != None:
+            raise Exception("Forking from a checkpoint is not supported when simulations are run in batches (batch_size must be None)")
+        if save_state_mode:
+            raise Exception("Saving states is not supported when simulations are run in batches (batch_size must be None)")
+        if profile:
+            raise Exception("Profiling is not supported when simulations are run in batches (batch_size must be None)")
+        if list_of_filters != None:
+            raise Exception("Filters are not supported when simulations are run in batches (batch_size must be None)")
+        if per_process_streams:
+            raise Exception("Per-process streams are not supported when simulations are run in batches (batch_size must be None)")
+        if mean_field:
+            raise Exception("Mean-field simulations are not supported when simulations are run in batches (batch_size must be None)")
+        list_of_args = [(run_batch_simulation, dict(list_of_key_names=list_of_key_names, list_of_sim_indices=range(first_index, min(first_index + batch_size, first_sim_index + NUM_OF_SIMULATIONS)),
+                                                    NUM_OF_TIMESTEPS=NUM_OF_TIMESTEPS, SAMPLING_RATE=SAMPLING_RATE, modified_param=modified_param, new_val_of_param=new_val_of_param,
+                                                    batch_label=batch_label, root_seed=root_seed, telemetry=telemetry))
+                        for first_index in range(first_sim_index, first_sim_index + NUM_OF_SIMULATIONS, batch_size)]
+
+    if num_of_workers == None:
+        num_of_workers = multiprocessing.cpu_count()
+    num_of_workers = min(num_of_workers, len(list_of_args))
+
+    if telemetry != None:
+        telemetry.start_ensemble(NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS)
+
+    pool = None
+    if num_of_workers <= 1:
+        iterator_of_results = (call_with_kwargs(args) for args in list_of_args)
+    else:
+        pool = multiprocessing.Pool(num_of_workers)
+        # chunksize of 1 since a single simulation already takes far longer than the IPC
+        # results are collected as they finish, so the progress of the ensemble can be reported
+        iterator_of_results = pool.imap_unordered(call_with_kwargs, list_of_args, 1)
+    list_of_results = []
+    try:
+        for result in iterator_of_results:
+            if batch_size == None:
+                list_of_results.append(result)
+            else:
+                list_of_results += result
+            if telemetry != None:
+                telemetry.update_ensemble(len(list_of_results))
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+    list_of_results.sort(key=lambda result: result[0])
+
+    if profile:
+        print(Profiler.merge_profilers([result[3] for result in list_of_results]).table())
+
+    master_tracking_dict = dict()
+    hist_dict = None
+    for sim_index, variable_tracking_dict, sim_hist_dict, profiler in list_of_results:
+        if variable_tracking_dict == None: # did not meet list_of_filters
+            continue
+        if hist_dict == None:
+            for key in variable_tracking_dict:
+                master_tracking_dict[key] = [variable_tracking_dict[key]]
+            hist_dict = sim_hist_dict
         else:
             for key in master_tracking_dict:
-                master_tracking_dict[key].append(record1.variable_tracking_dict[key])
+                master_tracking_dict[key].append(variable_tracking_dict[key])
     if rtn_hist_dict:
         return master_tracking_dict, list_of_plotting_keys, hist_dict
     else:
         return master_tracking_dict, list_of_plotting_keys
 
+# Runs num_of_branches simulations that all start from the simulation saved in the
+# checkpoint at checkpoint_path (see mainaux/Checkpoint.py), each with its own random stream
+# Only the timesteps after the checkpoint are simulated; the recorded data before it is
+# shared by all branches, so the result is laid out like that of initialize_runsim_dict
+# NUM_OF_TIMESTEPS, SAMPLING_RATE and the modified param must match the saved simulation
+def fork_ensemble(checkpoint_path, list_of_key_names, num_of_branches, NUM_OF_TIMESTEPS, SAMPLING_RATE=1, modified_param=None, new_val_of_param=None, rtn_hist_dict=False, num_of_workers=1, root_seed=None):
+    return initialize_runsim_dict(list_of_key_names, num_of_branches, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param, new_val_of_param, rtn_hist_dict=rtn_hist_dict, num_of_workers=num_of_workers, root_seed=root_seed, checkpoint_path=checkpoint_path)
+
+# Returns the half-width of the confidence interval of the mean of the values of a target
+# (key, row_index, timestep, half_width) over the simulations of master_tracking_dict
+# row_index is ignored for keys with a single row
+def confidence_half_width(master_tracking_dict, target, SAMPLING_RATE=1, confidence=0.95):
+    key, row_index, timestep, half_width = target
+    if timestep % SAMPLING_RATE != 0:
+        raise Exception("Timestep " + str(timestep) + " of target " + str(key) + " is not sampled (SAMPLING_RATE is " + str(SAMPLING_RATE) + ")")
+    if len(master_tracking_dict[key]) < 2:
+        return np.inf
+    values = []
+    for sim_data in master_tracking_dict[key]:
+        sim_data = np.atleast_2d(sim_data)
+        if len(sim_data) == 1:
+            values.append(sim_data[0, timestep/SAMPLING_RATE])
+        else:
+            values.append(sim_data[row_index, timestep/SAMPLING_RATE])
+    std_error = np.std(values, ddof=1)/np.sqrt(len(values))
+    return scipy.stats.t.ppf(0.5 + confidence/2., len(values) - 1)*std_error
+
+# Runs simulations in rounds of round_size until the confidence interval of the mean of every
+# target is narrow enough, or max_simulations simulations have been run
+# list_of_targets: list of (key, row_index, timestep, half_width); the target is met once the
+#   confidence interval of the mean of master_tracking_dict[key][i][row_index, timestep/SAMPLING_RATE]
+#   over the simulations i is at most half_width to either side
+# Every round is one initialize_runsim_dict call (so its simulations are spread across num_of_workers),
+# and adds the simulations with the next sim indices, so the ensemble is the same as a fixed one of
+# the same size and root seed
+# Returns master_tracking_dict, list_of_plotting_keys and the list of the half-widths reached
+def run_adaptive_ensemble(list_of_key_names, list_of_targets, max_simulations, NUM_OF_TIMESTEPS, SAMPLING_RATE=1, modified_param=None, new_val_of_param=None, round_size=8, confidence=0.95, num_of_workers=1, batch_size=None, root_seed=None, telemetry=None):
+    if root_seed == None:
+        root_seed = generate_root_seed()
+    master_tracking_dict = dict()
+    num_of_simulations = 0
+    while True:
+        num_of_new_simulations = min(round_size, max_simulations - num_of_simulations)
+        round_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_new_simulations, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param, new_val_of_param, num_of_workers=num_of_workers, batch_size=batch_size, root_seed=root_seed, telemetry=telemetry, first_sim_index=num_of_simulations)
+        for key in round_tracking_dict:
+            master_tracking_dict.setdefault(key, []).extend(round_tracking_dict[key])
+        num_of_simulations += num_of_new_simulations
+
+        list_of_half_widths = [confidence_half_width(master_tracking_dict, target, SAMPLING_RATE, confidence) for target in list_of_targets]
+        targets_met = all(half_width <= target[3] for half_width, target in zip(list_of_half_widths, list_of_targets))
+        if targets_met or num_of_simulations >= max_simulations:
+            break
+
+    if targets_met:
+        print(str(num_of_simulations) + ' simulations were needed to meet every target')
+    else:
+        print('targets not met after the maximum of ' + str(max_simulations) + ' simulations')
+    for half_width, target in zip(list_of_half_widths, list_of_targets):
+        print('  %s row %s timestep %s: half-width %.4g (target %.4g)' % (target[0], target[1], target[2], half_width, target[3]))
+    return master_tracking_dict, list_of_plotting_keys, list_of_half_widths
+
+# Runs simulations until NUM_OF_SIMULATIONS of them meet every filter of list_of_filters
+# (see Simulation.passes_filters), or max_num_of_simulations have been run
+# Simulations are stopped as soon as they fail a filter, and replaced by new ones in rounds
+# (each one initialize_runsim_dict call, so its simulations are spread across num_of_workers);
+# each round runs as many simulations as the acceptance rate so far suggests are still needed
+# The result is that of generate_subset_dict on a large enough ensemble of the same root seed,
+# cut to the first NUM_OF_SIMULATIONS accepted simulations
+# Returns master_tracking_dict, list_of_plotting_keys and the number of simulations run
+def run_filtered_ensemble(list_of_key_names, list_of_filters, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE=1, modified_param=None, new_val_of_param=None, max_num_of_simulations=None, num_of_workers=1, root_seed=None, telemetry=None):
+    if root_seed == None:
+        root_seed = generate_root_seed()
+    if max_num_of_simulations == None:
+        max_num_of_simulations = 100*NUM_OF_SIMULATIONS
+    master_tracking_dict = dict()
+    num_of_accepted_simulations = 0
+    num_of_simulations = 0
+    while num_of_accepted_simulations < NUM_OF_SIMULATIONS and num_of_simulations < max_num_of_simulations:
+        num_of_needed_simulations = NUM_OF_SIMULATIONS - num_of_accepted_simulations
+        if num_of_simulations > 0 and num_of_accepted_simulations == 0:
+            num_of_needed_simulations = 2*num_of_simulations
+        elif num_of_simulations > 0:
+            num_of_needed_simulations = int(np.ceil(num_of_needed_simulations*num_of_simulations/float(num_of_accepted_simulations)))
+        num_of_new_simulations = min(num_of_needed_simulations, max_num_of_simulations - num_of_simulations)
+        round_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_new_simulations, NUM_OF_TIMESTEPS, SAMPLING_RATE, modified_param, new_val_of_param, num_of_workers=num_of_workers, root_seed=root_seed, telemetry=telemetry, first_sim_index=num_of_simulations, list_of_filters=list_of_filters)
+        for key in round_tracking_dict:
+            master_tracking_dict.setdefault(key, []).extend(round_tracking_dict[key])
+        # every requested key is tracked, recorded or dependent (see Record.generate_data_for_dependent_keys)
+        if len(round_tracking_dict) > 0:
+            num_of_accepted_simulations += len(round_tracking_dict[list_of_key_names[0]])
+        num_of_simulations += num_of_new_simulations
+
+    print(str(num_of_accepted_simulations) + ' of ' + str(num_of_simulations) + ' simulations met the filters')
+    if num_of_accepted_simulations < NUM_OF_SIMULATIONS:
+        print('stopped after the maximum of ' + str(max_num_of_simulations) + ' simulations')
+    # the last round may have accepted more simulations than needed
+    for key in master_tracking_dict:
+        master_tracking_dict[key] = master_tracking_dict[key][:NUM_OF_SIMULATIONS]
+    return master_tracking_dict, list_of_plotting_keys, num_of_simulations
+
+# Returns the number of simulations of each stratum when num_of_simulations are allocated in
+# proportion to list_of_weights (largest remainders get the simulations left over by rounding down)
+def proportional_allocation(num_of_simulations, list_of_weights):
+    weights = np.asarray(list_of_weights, float)/np.sum(list_of_weights)
+    allocation = np.floor(num_of_simulations*weights).astype(int)
+    remainders = num_of_simulations*weights - allocation
+    for stratum in np.argsort(-remainders, kind='mergesort')[:num_of_simulations - np.sum(allocation)]:
+        allocation[stratum] += 1
+    return allocation.tolist()
+
+# Runs an ensemble with integration site effects on (see process/processaux/IntegrationSiteEffects.py),
+# stratified by clone: instead of every simulation drawing a clone at random, each clone runs its
+# share CLONE_WEIGHTS of the NUM_OF_SIMULATIONS simulations (at least 2 each, so that the variance
+# within every clone can be estimated), which removes the variance between clones from the estimates
+# Simulations of all clones are spread across one pool of num_of_workers processes
+# Returns master_tracking_dict (simulations in order of clone), list_of_plotting_keys, and
+# population_dict, which maps every key to (estimate of the population mean, its standard error,
+#   standard error of as many simulations with clones drawn at random)
+# The standard errors are per element of the recorded data of the key
+def run_clone_stratified_ensemble(list_of_key_names, NUM_OF_SIMULATIONS, NUM_OF_TIMESTEPS, SAMPLING_RATE=1, param_overrides=None, num_of_workers=1, root_seed=None):
+    if root_seed == None:
+        root_seed = generate_root_seed()
+    clone_weights = IntegrationSiteEffects().CLONE_WEIGHTS
+    num_of_clones = len(clone_weights)
+    if NUM_OF_SIMULATIONS < 2*num_of_clones:
+        raise Exception("A clone-stratified ensemble needs at least " + str(2*num_of_clones) + " simulations")
+    allocation = proportional_allocation(NUM_OF_SIMULATIONS - 2*num_of_clones, clone_weights)
+
+    list_of_args = []
+    list_of_clones = []
+    for clone in range(num_of_clones):
+        clone_param_overrides = dict()
+        if param_overrides != None:
+            clone_param_overrides.update(param_overrides)
+        clone_param_overrides['INTEGRATION_SITE_EFFECTS'] = 1
+        clone_param_overrides['INTEGRATION_SITE_CLONE'] = clone
+        for i in range(2 + allocation[clone]):
+            list_of_args.append((list_of_key_names, len(list_of_args), NUM_OF_TIMESTEPS, SAMPLING_RATE, clone_param_overrides, root_seed))
+            list_of_clones.append(clone)
+
+    if num_of_workers == None:
+        num_of_workers = multiprocessing.cpu_count()
+    if num_of_workers <= 1:
+        list_of_results = [run_job_simulation(args) for args in list_of_args]
+    else:
+        pool = multiprocessing.Pool(num_of_workers)
+        try:
+            list_of_results = pool.map(run_job_simulation, list_of_args, 1)
+        finally:
+            pool.close()
+            pool.join()
+
+    master_tracking_dict = dict()
+    for sim_index, variable_tracking_dict in list_of_results:
+        for key in variable_tracking_dict:
+            master_tracking_dict.setdefault(key, []).append(variable_tracking_dict[key])
+    list_of_plotting_keys = PlotCompilation.generate_plotting_keys(list_of_key_names)[0]
+
+    population_dict = dict()
+    list_of_clones = np.array(list_of_clones)
+    for key in master_tracking_dict:
+        data = np.array(master_tracking_dict[key], float)
+        mean = np.zeros(data.shape[1:])
+        variance = np.zeros(data.shape[1:])
+        for clone in range(num_of_clones):
+            clone_data = data[list_of_clones == clone]
+            mean += clone_weights[clone]*np.mean(clone_data, axis=0)
+            variance += clone_weights[clone]**2*np.var(clone_data, axis=0, ddof=1)/len(clone_data)
+        # with clones drawn at random, the variance between clones adds to that within them
+        population_variance = np.sum([clone_weights[clone]*(np.var(data[list_of_clones == clone], axis=0, ddof=1) + (np.mean(data[list_of_clones == clone], axis=0) - mean)**2) for clone in range(num_of_clones)], axis=0)
+        population_dict[key] = (mean, np.sqrt(variance), np.sqrt(population_variance/len(data)))
+    return master_tracking_dict, list_of_plotting_keys, population_dict
+
 def initialize_label(save_type):
     label = datetime.datetime.now().strftime("%m.%d.%y_%H.%M.%S")
 
@@ -258,7 +668,7 @@ def write_key(input_dict, key_name, output_data_label, group_by_row_num, param_n
                     writer.writerows(sim_data.tolist())
                 writer.writerow("")
 
-def create_output_data_info_file(output_data_label, group_by_row_num, num_of_sim, param_name=None, increment_type=None):
+def create_output_data_info_file(output_data_label, group_by_row_num, num_of_sim, param_name=None, increment_type=None, root_seed=None):
     new_filename = "batch_info.txt"
     path = os.getcwd() + "/outputdata/Batch" + output_data_label + "/"
     fullpath = os.path.join(path, new_filename)
@@ -270,4 +680,6 @@ def create_output_data_info_file(output_data_label, group_by_row_num, num_of_sim
     if param_name != None:
         fileHandler.write("Parameter Name: " + param_name + "\n")
         fileHandler.write("Increment Type: " + increment_type + "\n")
+    if root_seed != None:
+        fileHandler.write("Root seed: " + str(root_seed) + "\n")
     fileHandler.close()
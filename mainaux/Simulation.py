@@ -1,5 +1,4 @@
 import numpy as np
-import cPickle
 import os
 from mainaux.State import State
 from mainaux.Process import Process
@@ -15,10 +14,15 @@ from process.Degradation import Degradation
 from process.Packaging import Packaging
 from process.EnvProcessing import EnvProcessing
 from mainaux.InitParamValues import *
+from mainaux.ProcessHelpers import generate_root_seed, generate_random_state, ops
+import mainaux.Checkpoint as Checkpoint
+from mainaux.Profiler import Profiler, CountingRandomState
+from mainaux.CheckpointWriter import CheckpointWriter
+from mainaux.MeanField import MeanFieldRandomState, use_float_abundances
 
 class Simulation(object):
     
-    def __init__(self, record, number_of_timesteps=360, modified_param=None, new_val_of_param=None, save_state=False, save_state_timestep_list=None):
+    def __init__(self, record, number_of_timesteps=360, modified_param=None, new_val_of_param=None, save_state=False, save_state_timestep_list=None, root_seed=None, fast_forward_quiescence=True, profile=False, telemetry=None, activity_gating=True, async_checkpoints=True, param_overrides=None, list_of_filters=None, per_process_streams=False, mean_field=False):
         
         self.number_of_timesteps = number_of_timesteps
         self.current_timestep = 0
@@ -27,12 +31,40 @@ class Simulation(object):
 
         if modified_param != None:
             self.param_dict[modified_param] = new_val_of_param
+        # dict of param name -> value, for changing several params at once
+        if param_overrides != None:
+            for param_name in param_overrides:
+                if param_name not in self.param_dict:
+                    raise Exception("Unknown param: " + str(param_name))
+                self.param_dict[param_name] = param_overrides[param_name]
 
         self.save_state = save_state
         if save_state_timestep_list == None:
             self.save_state_timestep_list = [self.number_of_timesteps - 1]
         else:
             self.save_state_timestep_list = save_state_timestep_list
+        # Write the checkpoints in a background thread while the simulation continues (see mainaux/CheckpointWriter.py)
+        self.async_checkpoints = async_checkpoints
+        self.checkpoint_writer = None
+        # list of (path, error message) of the checkpoints that could not be written
+        self.list_of_failed_checkpoints = []
+
+        # Filters the simulation must meet to be accepted (see passes_filters); the run stops
+        # as soon as one of them is not met, and accepted is then False
+        self.list_of_filters = list_of_filters
+        self.accepted = True
+
+        # Skip through timesteps before the promoter first turns on in one go (see fast_forward)
+        self.fast_forward_quiescence = fast_forward_quiescence
+
+        # Telemetry the progress is reported to (see mainaux/Telemetry.py), None to report nothing
+        self.telemetry = telemetry
+
+        # Skip the evolve_state of processes that have no work (see Process.has_work)
+        # The results are identical to those without skipping
+        self.activity_gating = activity_gating
+        # process name -> number of evolve_state calls skipped
+        self.num_of_skipped_calls = dict()
         
         #initialize
 #        self.x = 0
@@ -46,34 +78,80 @@ class Simulation(object):
         #self.saved_variables = 'transcriptsSynthesized' ??????????????????
         #self.plots_to_be_made = []
         
-        self.state = State(self.param_dict)
+        # Every random number of this simulation is drawn from self.random_state, which only
+        # depends on the root seed of the run and the sim index of the record
+        if root_seed == None:
+            root_seed = generate_root_seed()
+        self.root_seed = root_seed
+        self.record.root_seed = root_seed
+        self.random_state = generate_random_state(root_seed, self.record.sim_index)
+        # With per_process_streams, every process draws from a stream of its own instead, so that
+        # a process drawing more or fewer numbers (e.g. after a param change) leaves the numbers the
+        # others draw as they are; simulation i of every section of a sweep then sees common random
+        # numbers (see SimHelpers.generate_increment_param_plots)
+        # The streams of the processes are not saved in checkpoints, nor counted by the profiler
+        self.per_process_streams = per_process_streams
+        if per_process_streams and (save_state or profile):
+            raise Exception("Per-process streams cannot be used with save_state or profile")
+
+        # With profile, the time, calls and random draws of every process and state are
+        # accumulated in self.profiler (see mainaux/Profiler.py); otherwise self.profiler is None
+        self.profiler = None
+        if profile:
+            counting_random_state = CountingRandomState()
+            counting_random_state.set_state(self.random_state.get_state())
+            self.random_state = counting_random_state
+            self.profiler = Profiler(self.random_state)
+
+        # With mean_field, the state holds expected amounts as floats and the processes propagate them
+        # instead of drawing random amounts (see mainaux/MeanField.py), so the run is one deterministic
+        # trajectory that does not depend on the root seed; the record then holds floats
+        self.mean_field = mean_field
+        if mean_field:
+            if save_state or profile or per_process_streams:
+                raise Exception("Mean-field simulations cannot be used with save_state, profile or per-process streams")
+            self.random_state = MeanFieldRandomState()
+
+        self.state = State(self.param_dict, self.random_state)
+        if mean_field:
+            use_float_abundances(self.state)
+            self.record.dtype = float
         
         self.process_list = []
         self.state_list= []
         self.init_processes()
         self.init_states()
+        if profile:
+            for process in self.process_list:
+                self.profiler.count_ODE_evaluations(type(process).__name__, process)
+
+    # Random number generator of the process_index-th process (see per_process_streams)
+    def process_random_state(self, process_index):
+        if not self.per_process_streams:
+            return self.random_state
+        return np.random.RandomState([self.root_seed, self.record.sim_index, process_index + 1])
 
     def init_processes(self):
         #This instantiates an object for each process class with the current object of the states
-        self.Tat_feedback_process = TatFeedback(self.state, self.param_dict)
+        self.Tat_feedback_process = TatFeedback(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Tat_feedback_process)
-        self.Transcription_process = Transcription(self.state, self.param_dict)
+        self.Transcription_process = Transcription(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Transcription_process) 
-        self.Alternative_splicing_process = AlternativeSplicing(self.state, self.param_dict)
+        self.Alternative_splicing_process = AlternativeSplicing(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Alternative_splicing_process)
-        self.Rev_binding_process = RevBinding(self.state, self.param_dict)
+        self.Rev_binding_process = RevBinding(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Rev_binding_process)
-        self.mRNA_export_process = MRNAExport(self.state, self.param_dict)
+        self.mRNA_export_process = MRNAExport(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.mRNA_export_process)
-        self.Translation_process = Translation(self.state, self.param_dict)
+        self.Translation_process = Translation(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Translation_process)
-        self.Protein_localization_process = ProteinLocalization(self.state, self.param_dict)
+        self.Protein_localization_process = ProteinLocalization(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Protein_localization_process)
-        self.Degradation_process = Degradation(self.state, self.param_dict)
+        self.Degradation_process = Degradation(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Degradation_process)
-        self.Packaging_process = Packaging(self.state, self.param_dict)
+        self.Packaging_process = Packaging(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Packaging_process)
-        self.Env_processing_process = EnvProcessing(self.state, self.param_dict)
+        self.Env_processing_process = EnvProcessing(self.state, self.param_dict, self.process_random_state(len(self.process_list)))
         self.process_list.append(self.Env_processing_process)
     
     # TODO: add modified params support to states (in a clean way)
@@ -88,24 +166,87 @@ class Simulation(object):
         #self.state_list.append('host_factors')
 
     def save_state_to_file(self, timestep):
-        new_filename = "sample" + str(timestep)
-        path = os.getcwd() + "/samplestates/Batch" + self.record.batch_label + "/Sim" + str(self.record.sim_index) + "/"
-        fullpath = os.path.join(path, new_filename)
-
-        main_state_notes = fullpath + "notes.txt"
-
-        if not os.path.exists(path):
-            os.makedirs(path)
+        fullpath = Checkpoint.checkpoint_path(self.record.batch_label, self.record.sim_index, timestep)
+        array_dict = Checkpoint.checkpoint_arrays(self, timestep)
+        if self.checkpoint_writer == None:
+            self.write_checkpoint_files(fullpath, array_dict, timestep)
+        else:
+            self.checkpoint_writer.submit(fullpath, self.write_checkpoint_files, fullpath, array_dict, timestep)
 
-        fileHandler2 = open(fullpath, 'wb')
-        cPickle.dump(self.state, fileHandler2)
-        fileHandler2.close()
+    # Writes the checkpoint, its index row and its notes (in the writer thread with async_checkpoints)
+    def write_checkpoint_files(self, fullpath, array_dict, timestep):
+        Checkpoint.write_checkpoint(fullpath, array_dict)
+        Checkpoint.add_to_index(self.record.batch_label, self.record.sim_index, timestep, fullpath)
 
+        main_state_notes = fullpath[:-len(".npz")] + "notes.txt"
         fileHandler3 = open(main_state_notes, 'wb')
         fileHandler3.write("Starting time of batch: " + str(self.record.batch_label) + "\n")
         fileHandler3.write("Simulation Num: " + str(self.record.sim_index) + "\n")
+        fileHandler3.write("Root seed: " + str(self.root_seed) + "\n")
         fileHandler3.write("Timestep: " + str(timestep) + "\n")
-        fileHandler3.close()
+        Checkpoint.sync_and_close(fileHandler3)
+
+    # Starts the background checkpoint writer, if checkpoints are saved asynchronously
+    def start_checkpoint_writer(self):
+        if self.save_state and self.async_checkpoints:
+            self.checkpoint_writer = CheckpointWriter()
+
+    # Waits until every checkpoint is on disk
+    def finish_checkpoint_writer(self):
+        if self.checkpoint_writer != None:
+            self.list_of_failed_checkpoints.extend(self.checkpoint_writer.close())
+            self.checkpoint_writer = None
+
+    # Continues the simulation saved in the checkpoint at path (see save_state_to_file)
+    # The simulation must have been created with the same parameters as the saved one;
+    # run() then only runs the remaining timesteps, and the record holds the data of the whole run
+    def resume_from_checkpoint(self, path):
+        self.restore_from_arrays(Checkpoint.load_checkpoint(path))
+
+    # Continues the simulation saved in the checkpoint arrays data (see Checkpoint.checkpoint_arrays),
+    # which need not have been written to a file
+    def restore_from_arrays(self, data):
+        if self.per_process_streams:
+            raise Exception("Simulations with per-process streams cannot be restored from checkpoints")
+        if data['sampling_rate'].item() != self.record.sampling_rate:
+            raise Exception("Checkpoint was recorded with sampling rate " + str(data['sampling_rate'].item()))
+
+        Checkpoint.arrays_to_state(data, self.state)
+        for process in self.process_list:
+            for attr_name in process.CHECKPOINT_ATTRIBUTES:
+                setattr(process, attr_name, data["process/" + type(process).__name__ + "/" + attr_name].item())
+        Checkpoint.arrays_to_random_state(data, self.random_state)
+
+        self.current_timestep = data['timestep'].item()
+        self.root_seed = data['root_seed'].item()
+        self.record.root_seed = self.root_seed
+        self.record.sim_index = data['sim_index'].item()
+
+        num_of_samples = len(np.arange(0, self.number_of_timesteps, self.record.sampling_rate))
+        for key in self.record.set_of_req_key_names:
+            if "record/" + key not in data: # not recorded by the saved run; stays 0 before the checkpoint
+                continue
+            saved_data = data["record/" + key]
+            self.record.variable_tracking_dict[key] = np.zeros((np.size(saved_data, 0), num_of_samples), int)
+            num_of_saved_samples = min(num_of_samples, np.size(saved_data, 1))
+            self.record.variable_tracking_dict[key][:,:num_of_saved_samples] = saved_data[:,:num_of_saved_samples]
+
+    # Starts this simulation from the checkpoint at path as one branch of an ensemble:
+    # the saved state is restored as in resume_from_checkpoint, but the simulation keeps
+    # its own root seed, sim index and random stream, so branches diverge after the checkpoint
+    def fork_from_checkpoint(self, path):
+        self.fork_from_arrays(Checkpoint.load_checkpoint(path))
+
+    # Starts this simulation as a branch of the simulation saved in the checkpoint arrays data
+    # (see fork_from_checkpoint); used to clone simulations in memory (see mainaux/Splitting.py)
+    def fork_from_arrays(self, data):
+        root_seed = self.root_seed
+        sim_index = self.record.sim_index
+        self.restore_from_arrays(data)
+        self.root_seed = root_seed
+        self.record.root_seed = root_seed
+        self.record.sim_index = sim_index
+        self.random_state.set_state(generate_random_state(root_seed, sim_index).get_state())
 
 #    def record_for_plots(self, step, current_timestep):
 #        for i in range(np.size(self.saved_variables)):
@@ -113,31 +254,142 @@ class Simulation(object):
 #            self.p1.record(current_timestep, eval(self.storgage_vectors[i]), eval(self.saved_variables[i]))
 #            print eval(self.storgage_vectors[i])
 
+    # True if the cell holds no viral molecules and the promoter is off, as before the promoter
+    # first turns on; processes then leave the state as is, apart from the promoter possibly
+    # turning on (Transcription) and pTEFb being replenished (TatFeedback)
+    def is_quiescent(self):
+        if self.state.get_state('DNAs').promoter_activity != 0 or self.Transcription_process.PROMOTER_ALWAYS_ON:
+            return False
+        host_factor_state = self.state.get_state('host_factors')
+        if host_factor_state.Tat_pTEFb_deacetyl != 0 or host_factor_state.Tat_pTEFb_acetyl != 0:
+            return False
+        if self.state.get_state('reaction_rates').Tat_derived_transcription_rate != 0 or self.state.get_state('cell_cycle').cell_cycle_arrest != 0:
+            return False
+        if len(self.state.get_state('viral_progeny_container').list_of_progeny) > 0:
+            return False
+        protein_state = self.state.get_state('proteins')
+        for abundances in [protein_state.proteins_cyt, protein_state.proteins_nuc, protein_state.proteins_mem, protein_state.proteins_virion] + protein_state.env_misc.values():
+            if np.any(abundances):
+                return False
+        for attr_name, abundances in vars(self.state.get_state('mRNAs')).items():
+            if attr_name != 'transcripts_synthesized' and np.any(abundances):
+                return False
+        return True
+
+    # Skips ahead to the timestep the promoter turns on in, if the cell is quiescent
+    # The waiting time is drawn from the same random numbers Transcription would draw
+    # timestep by timestep, and the skipped timesteps are recorded with the (unchanged)
+    # state, so the results are identical to running every timestep
+    # The first and last timesteps and the timesteps to save the state at are never skipped
+    # Returns the number of skipped timesteps
+    def fast_forward(self, set_of_relevant_timesteps):
+        if self.current_timestep == 0 or not self.is_quiescent():
+            return 0
+        max_timesteps = self.number_of_timesteps - 1 - self.current_timestep
+        if self.save_state:
+            for timestep in self.save_state_timestep_list:
+                if timestep > self.current_timestep:
+                    max_timesteps = min(max_timesteps, timestep - self.current_timestep)
+        num_of_skipped_timesteps = self.Transcription_process.draw_promoter_off_timesteps(max_timesteps)
+        if num_of_skipped_timesteps == 0:
+            return 0
+
+        self.Tat_feedback_process.replenish_pTEFb(self.current_timestep, num_of_skipped_timesteps)
+        skipped_relevant_timesteps = set_of_relevant_timesteps[(set_of_relevant_timesteps >= self.current_timestep) & (set_of_relevant_timesteps < self.current_timestep + num_of_skipped_timesteps)]
+        if len(skipped_relevant_timesteps) > 0:
+            self.record_states(skipped_relevant_timesteps[0], set_of_relevant_timesteps)
+            for timestep in skipped_relevant_timesteps[1:]:
+                self.record.copy_tracking(skipped_relevant_timesteps[0], timestep)
+
+        self.current_timestep += num_of_skipped_timesteps
+        return num_of_skipped_timesteps
+
+    # Runs every process for one timestep
+    def evolve_processes(self, timestep):
+        for process in self.process_list:
+            if self.activity_gating and not process.has_work():
+                process_name = type(process).__name__
+                self.num_of_skipped_calls[process_name] = self.num_of_skipped_calls.get(process_name, 0) + 1
+                if self.profiler != None:
+                    self.profiler.add(process_name, calls=1, skipped_calls=1)
+            elif self.profiler == None:
+                process.evolve_state(timestep)
+            else:
+                self.profiler.call(type(process).__name__, process.evolve_state, timestep)
+
+    # Records every state if timestep is sampled, and records the end of the simulation
+    # if timestep is its last timestep
+    def record_states(self, timestep, set_of_relevant_timesteps):
+        for state_name in self.state_list:
+            curr_state = self.state.get_state(state_name)
+
+            if timestep in set_of_relevant_timesteps:
+                if self.profiler == None:
+                    curr_state.record_state(self.record, timestep, self.number_of_timesteps)
+                else:
+                    self.profiler.call(state_name + ' (record_state)', curr_state.record_state, self.record, timestep, self.number_of_timesteps)
+
+            if timestep + 1 == self.number_of_timesteps:
+                curr_state.record_at_end(self.record)
+
+    # Returns False if a filter of list_of_filters is not met by the data recorded so far
+    # A filter (key, row_index, timestep, value, operator) is met if
+    # operator(data of key[row_index] at timestep, value) is True, as in SimHelpers.generate_subset_dict
+    # with the sampling rate of the record (timestep is a minute, so it must be a recorded one)
+    # With a timestep of None it is met if that holds at any timestep, so, like filters of
+    # keys that are generated at the end (dependent keys), it is only decided at_end
+    def passes_filters(self, at_end=False):
+        for key, row_index, timestep, value, operator in self.list_of_filters:
+            if not at_end and (timestep == None or timestep >= self.current_timestep or key not in self.record.variable_tracking_dict):
+                continue
+            row = self.record.variable_tracking_dict[key][row_index]
+            if timestep == None:
+                if not ops[operator](row, value).any():
+                    return False
+            elif not ops[operator](row[timestep/self.record.sampling_rate], value):
+                return False
+        return True
+
+    # Fields of this simulation in the lines of its telemetry
+    def telemetry_fields(self):
+        return {'sim_index': int(self.record.sim_index), 'progeny_count': int(self.state.get_state('viral_progeny_container').count_progeny())}
+
     def run(self):
         set_of_relevant_timesteps = np.arange(0, self.number_of_timesteps, self.record.sampling_rate)
-        while self.current_timestep < self.number_of_timesteps:
-            #Todo: ADD line to randomize order of process list
-
-            for process in self.process_list:
-                process.evolve_state(self.current_timestep)
-            for state_name in self.state_list:
-                curr_state = self.state.get_state(state_name)
+        if self.telemetry != None:
+            self.telemetry.start(self)
+        self.start_checkpoint_writer()
+        # the checkpoints queued before an exception are still written and synced to disk
+        try:
+            while self.current_timestep < self.number_of_timesteps:
+                num_of_skipped_timesteps = 0
+                if self.fast_forward_quiescence:
+                    num_of_skipped_timesteps = self.fast_forward(set_of_relevant_timesteps)
 
-                if self.current_timestep in set_of_relevant_timesteps:
-                    curr_state.record_state(self.record, self.current_timestep, self.number_of_timesteps)
+                if num_of_skipped_timesteps == 0:
+                    #Todo: ADD line to randomize order of process list
 
-                if self.current_timestep + 1 == self.number_of_timesteps:
-                    curr_state.record_at_end(self.record)
+                    self.evolve_processes(self.current_timestep)
+                    self.record_states(self.current_timestep, set_of_relevant_timesteps)
+                    self.current_timestep +=1
+                if self.telemetry != None:
+                    self.telemetry.update(self)
 
-            self.current_timestep +=1
-            print('in simulation, the time is', self.current_timestep)
+                if self.save_state:
+                    if self.current_timestep in self.save_state_timestep_list:
+                        self.save_state_to_file(self.current_timestep)
 
-            if self.save_state:
-                if self.current_timestep in self.save_state_timestep_list:
-                    self.save_state_to_file(self.current_timestep)
+                if self.list_of_filters != None and not self.passes_filters():
+                    break
+        finally:
+            self.finish_checkpoint_writer()
 
         # run at the end
         self.record.generate_data_for_dependent_keys()
+        if self.list_of_filters != None:
+            self.accepted = self.passes_filters(at_end=True)
+        if self.telemetry != None:
+            self.telemetry.finish(self)
 
 #            self.x = self.x + 2
 #            self.t = t
@@ -0,0 +1,117 @@
+import numpy as np
+from mainaux.Record import Record
+from mainaux.Simulation import Simulation
+from mainaux.ProcessHelpers import generate_root_seed
+import mainaux.Checkpoint as Checkpoint
+from state.Proteins import Proteins
+
+# Estimation of the probability of rare events by fixed-effort multilevel splitting
+# The event is that a progress function of the simulation reaches the last of an increasing
+# list of levels before num_of_timesteps, e.g. nuclear Tat reaching a high count early, or the
+# first viable virion; brute-force ensembles need about 1/probability simulations to see it once
+# Splitting runs num_of_trajectories simulations from the start until they reach the first level
+# (or num_of_timesteps), then num_of_trajectories simulations from clones of the simulations that
+# reached it until they reach the second level, and so on
+# The fraction of simulations of stage k that reach level k + 1 estimates the probability of
+# reaching it given level k was reached, and the product of the fractions of all stages is an
+# unbiased estimate of the probability of the event
+# Simulations are cloned in memory through the arrays of their checkpoints (see
+# Checkpoint.checkpoint_arrays and Simulation.fork_from_arrays), and every trajectory draws from
+# its own random stream, so a run is reproduced by its root seed
+# The whole procedure is repeated num_of_replications times; the mean of the estimates of the
+# replications is the estimate, and their sample variance over num_of_replications its variance
+# Levels are only checked after whole timesteps, and the progress function should only depend on
+# the viral state of the cell (timesteps skipped by Simulation.fast_forward do not change it)
+
+# Progress functions
+def nuclear_Tat(simulation):
+    return simulation.state.get_state('proteins').proteins_nuc[Proteins.index['Tat']]
+
+def Tat_derived_transcription_rate(simulation):
+    return simulation.state.get_state('reaction_rates').Tat_derived_transcription_rate
+
+def num_of_viable_virions(simulation):
+    return simulation.state.get_state('viral_progeny_container').count_num_of_all_protein_with_filter(10., 1.5, ">=")
+
+# Runs simulation until progress_function(simulation) >= level or the end of the simulation
+# Returns True if the level was reached
+def run_until_level(simulation, progress_function, level):
+    no_relevant_timesteps = np.array([], int)
+    while simulation.current_timestep < simulation.number_of_timesteps:
+        if simulation.fast_forward_quiescence and simulation.fast_forward(no_relevant_timesteps) > 0:
+            continue
+        simulation.evolve_processes(simulation.current_timestep)
+        simulation.current_timestep += 1
+        if progress_function(simulation) >= level:
+            return True
+    return False
+
+# Runs one replication of fixed-effort splitting and returns the list of the fractions of
+# the simulations of each stage that reached the next level, and the number of simulated timesteps
+# Trajectories draw from the streams (root_seed, first_sim_index), (root_seed, first_sim_index + 1), ...
+def run_replication(progress_function, list_of_levels, num_of_timesteps, num_of_trajectories, root_seed, first_sim_index, selection_random_state, param_overrides=None):
+    sim_index = first_sim_index
+    num_of_simulated_timesteps = 0
+    list_of_entrance_states = [None] # None starts from the initial state
+    list_of_fractions = []
+    for level in list_of_levels:
+        list_of_reached_states = []
+        # every entrance state is used about equally often; the remainder is drawn at random
+        list_of_starts = list_of_entrance_states*(num_of_trajectories/len(list_of_entrance_states))
+        list_of_starts += [list_of_entrance_states[i] for i in selection_random_state.choice(len(list_of_entrance_states), num_of_trajectories - len(list_of_starts), replace=False)]
+        for entrance_state in list_of_starts:
+            record = Record([], set())
+            record.sim_index = sim_index
+            sim_index += 1
+            simulation = Simulation(record, num_of_timesteps, root_seed=root_seed, param_overrides=param_overrides)
+            if entrance_state != None:
+                simulation.fork_from_arrays(entrance_state)
+            start_timestep = simulation.current_timestep
+            if run_until_level(simulation, progress_function, level):
+                list_of_reached_states.append(Checkpoint.checkpoint_arrays(simulation, simulation.current_timestep))
+            num_of_simulated_timesteps += simulation.current_timestep - start_timestep
+        list_of_fractions.append(len(list_of_reached_states)/float(num_of_trajectories))
+        if len(list_of_reached_states) == 0:
+            # no trajectory got further, so the estimate of this replication is 0
+            list_of_fractions += [0.]*(len(list_of_levels) - len(list_of_fractions))
+            break
+        list_of_entrance_states = list_of_reached_states
+    return list_of_fractions, num_of_simulated_timesteps
+
+# Estimates the probability that progress_function(simulation) reaches list_of_levels[-1]
+# before num_of_timesteps (see the top of this file)
+# list_of_levels: increasing levels; the last one defines the event
+# num_of_trajectories: simulations run in each stage of a replication
+# param_overrides: params that differ from parameters.csv (see Simulation)
+# Returns a dict of
+#   'probability': estimate of the probability of the event
+#   'variance': variance of the estimate
+#   'list_of_estimates': estimate of each replication
+#   'list_of_level_probabilities': estimates of the probability of reaching each level given the previous one
+#   'num_of_simulated_timesteps': timesteps simulated by all trajectories
+def run_splitting(progress_function, list_of_levels, num_of_timesteps, num_of_trajectories=100, num_of_replications=10, param_overrides=None, root_seed=None):
+    if list(list_of_levels) != sorted(list_of_levels):
+        raise Exception("Levels must be increasing")
+    if num_of_replications < 2:
+        raise Exception("The variance of the estimate needs at least 2 replications")
+    if root_seed == None:
+        root_seed = generate_root_seed()
+
+    list_of_estimates = []
+    list_of_list_of_fractions = []
+    num_of_simulated_timesteps = 0
+    for replication in range(num_of_replications):
+        # a seed of three numbers gives a stream apart from the (root_seed, sim_index) streams of trajectories
+        selection_random_state = np.random.RandomState([root_seed, replication, 0])
+        first_sim_index = replication*num_of_trajectories*len(list_of_levels)
+        list_of_fractions, num_of_replication_timesteps = run_replication(progress_function, list_of_levels, num_of_timesteps, num_of_trajectories, root_seed, first_sim_index, selection_random_state, param_overrides)
+        list_of_estimates.append(np.prod(list_of_fractions))
+        list_of_list_of_fractions.append(list_of_fractions)
+        num_of_simulated_timesteps += num_of_replication_timesteps
+
+    return {'probability': np.mean(list_of_estimates),
+            'variance': np.var(list_of_estimates, ddof=1)/num_of_replications,
+            'list_of_estimates': list_of_estimates,
+            'list_of_level_probabilities': np.mean(list_of_list_of_fractions, axis=0).tolist(),
+            'num_of_simulated_timesteps': num_of_simulated_timesteps,
+            'root_seed': root_seed}
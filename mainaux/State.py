@@ -11,7 +11,7 @@ from state.CellCycle import CellCycle
 from state.ViralProgeny import ViralProgenyContainer
 
 class State(object,):
-    def __init__(self, param_dict=None):
+    def __init__(self, param_dict=None, random_state=None):
         #initialize all the states that you need
         self.states_dict = {}
         protein_state = Proteins()
@@ -28,7 +28,7 @@ class State(object,):
         self.states_dict['viral_progeny'] = Viral_particles_state
         Cell_cycle_state = CellCycle()
         self.states_dict['cell_cycle'] = Cell_cycle_state
-        Viral_progeny_container_state = ViralProgenyContainer(self)
+        Viral_progeny_container_state = ViralProgenyContainer(self, param_dict, random_state)
         self.states_dict['viral_progeny_container'] = Viral_progeny_container_state
 
         
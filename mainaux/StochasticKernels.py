@@ -0,0 +1,112 @@
+import numpy as np
+from mainaux.MeanField import is_mean_field
+
+# Stochastic kernels shared by the processes
+# Deciding how many of n molecules react, each independently with probability p, used to take one
+# random number per molecule (np.random.rand(n) < p), so the cost grew with the copy numbers.
+# The number that react is binomially distributed, so it is drawn here with one binomial number per
+# bin instead: the distribution is exactly the same, and the cost no longer depends on n
+
+# Returns how many of counts react, each molecule independently with probability probs
+# counts: a count or an array of counts (e.g. an abundance array), probs: a probability or an array
+#   of per-bin probabilities broadcast against counts; probabilities outside [0, 1] are clipped
+# Returns a count for a count, and an integer array of the shape of counts otherwise
+# hybrid_threshold: counts above it are drawn from the normal (Langevin) approximation of the binomial
+#   distribution instead, rounded and kept within [0, count]; None draws every count exactly
+#   The processes pass the HYBRID_THRESHOLD param (see parameters.csv)
+# random_state: numpy.random.RandomState the random numbers are drawn from
+# Nothing is drawn for empty bins, so a process without molecules draws no random numbers
+# (see Process.has_work)
+# In a mean-field simulation (see mainaux/MeanField.py) counts hold expectations, and the expectation
+# counts*probs of the amounts that react is returned as floats without drawing anything
+def binomial_thinning(counts, probs, random_state=np.random, hybrid_threshold=None):
+    if is_mean_field(random_state):
+        return counts*np.clip(probs, 0, 1)
+    counts = np.asarray(counts).astype(int)
+    probs = np.clip(probs, 0, 1)*np.ones(counts.shape)
+    reacted = np.zeros(counts.shape, int)
+    occupied = counts > 0
+    if hybrid_threshold != None:
+        approximated = occupied & (counts > hybrid_threshold)
+        occupied = occupied & ~approximated
+        if np.any(approximated):
+            mean = counts[approximated]*probs[approximated]
+            std = np.sqrt(mean*(1 - probs[approximated]))
+            reacted[approximated] = np.clip(np.around(mean + std*random_state.standard_normal(mean.shape)), 0, counts[approximated])
+    if np.any(occupied):
+        reacted[occupied] = random_state.binomial(counts[occupied], probs[occupied])
+    if reacted.ndim == 0:
+        return int(reacted)
+    return reacted
+
+# Thins abundances in place (see binomial_thinning) and returns (the amounts that reacted,
+# the total of the factors they released)
+# factors_per_bin: number of factors (e.g. Rev) bound to each molecule of a bin (an array, or a number for every bin)
+def thin_abundances(abundances, probs, random_state=np.random, hybrid_threshold=None, factors_per_bin=0):
+    reacted = binomial_thinning(abundances, probs, random_state, hybrid_threshold)
+    abundances -= reacted
+    return reacted, np.sum(reacted*factors_per_bin)
+
+# Moves the molecules of abundances_from[indices] that react (see binomial_thinning) to
+# abundances_to[indices], in place; returns the amounts moved
+def transfer_abundances(abundances_from, abundances_to, indices, probs, random_state=np.random, hybrid_threshold=None):
+    moved = binomial_thinning(abundances_from[indices], probs, random_state, hybrid_threshold)
+    abundances_from[indices] -= moved
+    abundances_to[indices] += moved
+    return moved
+
+# Returns how many of nsample molecules drawn without replacement from ngood good and nbad bad
+# molecules are good; numpy.random.hypergeometric needs ngood, nbad and nsample to be at least 1,
+# so the cases where the outcome is certain are filled in here
+def hypergeometric(ngood, nbad, nsample, random_state=np.random):
+    if nsample == 0 or ngood == 0:
+        return 0
+    if nbad == 0:
+        drawn = nsample
+    else:
+        drawn = random_state.hypergeometric(ngood, nbad, nsample)
+    # expectations of a mean-field simulation (see mainaux/MeanField.py) are not whole numbers
+    if is_mean_field(random_state):
+        return drawn
+    return int(drawn)
+
+# Splits nsample molecules drawn without replacement among the categories of counts (an array of counts)
+# Returns an integer array of the shape of counts holding the amount drawn from each category; the
+# categories are drawn one at a time with hypergeometric draws, so the cost does not depend on nsample
+def multivariate_hypergeometric(counts, nsample, random_state=np.random):
+    counts = np.asarray(counts).astype(int)
+    drawn = np.zeros(counts.shape, int)
+    remaining_sample = int(nsample)
+    remaining_total = counts.sum()
+    for k in range(len(counts)):
+        remaining_total -= counts[k]
+        drawn[k] = hypergeometric(counts[k], remaining_total, remaining_sample, random_state)
+        remaining_sample -= drawn[k]
+    return drawn
+
+# Forms num_of_trimers trimers from 3*num_of_trimers molecules drawn without replacement from num_good
+# good and num_bad bad molecules, and returns how many of the trimers have 0, 1, 2 and 3 good molecules
+# Drawing the molecules one at a time arranges the drawn molecules uniformly at random over the first,
+# second and third positions of the trimers. The same arrangement is drawn here with a fixed number of
+# hypergeometric draws, so the cost does not depend on num_of_trimers:
+#   the number of good molecules drawn, and how many of them are at each of the 3 positions,
+#   how many trimers have a good molecule at both of the first 2 positions,
+#   and how the good molecules at the third position are spread over trimers with 2, 1 and 0 of them
+# In a mean-field simulation the amounts are expectations, and so is the composition returned
+def trimer_compositions(num_good, num_bad, num_of_trimers, random_state=np.random):
+    n = num_of_trimers
+    if not is_mean_field(random_state):
+        n = int(n)
+    good_drawn = hypergeometric(num_good, num_bad, 3*n, random_state)
+    good_first = hypergeometric(good_drawn, 3*n - good_drawn, n, random_state)
+    good_second = hypergeometric(good_drawn - good_first, 2*n - good_drawn + good_first, n, random_state)
+    good_third = good_drawn - good_first - good_second
+    #trimers by number of good molecules at the first 2 positions
+    two_good = hypergeometric(good_first, n - good_first, good_second, random_state)
+    one_good = good_first + good_second - 2*two_good
+    no_good = n - good_first - good_second + two_good
+    #trimers getting a good molecule at the third position, by number of good molecules at the first 2 positions
+    third_to_two = hypergeometric(two_good, one_good + no_good, good_third, random_state)
+    third_to_one = hypergeometric(one_good, no_good, good_third - third_to_two, random_state)
+    third_to_none = good_third - third_to_two - third_to_one
+    return np.array([no_good - third_to_none, one_good - third_to_one + third_to_none, two_good - third_to_two + third_to_one, third_to_two])
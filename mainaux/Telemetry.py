@@ -0,0 +1,117 @@
+import json
+import os
+import time
+
+# Progress telemetry of simulations and ensembles
+# Progress is written as JSON lines (one JSON object per line) to a file, and optionally
+# printed to the console; both are rate-limited so that long runs are not slowed down
+# Line of a simulation (written by Simulation and BatchSimulation):
+#   {"type": "simulation", "batch_label", "sim_index", "timestep", "num_of_timesteps",
+#    "elapsed", "steps_per_sec", "eta", "progeny_count", "time"}
+#   (a BatchSimulation writes the lists of sim indices and progeny counts of its cells)
+# Line of an ensemble (written by SimHelpers.initialize_runsim_dict every time simulations finish):
+#   {"type": "ensemble", "batch_label", "num_of_simulations", "num_finished", "elapsed",
+#    "sims_per_sec", "steps_per_sec", "eta", "time"}
+# elapsed and eta are in seconds, time is the unix time of the line
+# Every line is appended with a single write, so the workers of a multiprocessing.Pool can
+# share the file and it holds one progress stream for the whole ensemble
+class Telemetry(object):
+
+    # path: file the JSON lines are appended to, None to not write any
+    # interval: minimum number of seconds between two lines of a simulation
+    # print_progress: also print progress to the console
+    # print_interval: minimum number of seconds between two progress prints of a simulation
+    def __init__(self, path=None, interval=10, print_progress=False, print_interval=30, batch_label=""):
+        self.path = path
+        self.interval = interval
+        self.print_progress = print_progress
+        self.print_interval = print_interval
+        self.batch_label = batch_label
+
+    def write_line(self, line_dict):
+        if self.path == None:
+            return
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+        try:
+            os.write(fd, json.dumps(line_dict, sort_keys=True) + "\n")
+        finally:
+            os.close(fd)
+
+    # Called by a simulation before its first timestep
+    def start(self, simulation):
+        self.start_time = time.time()
+        self.start_timestep = simulation.current_timestep
+        self.last_write_time = self.start_time
+        self.last_print_time = self.start_time
+
+    # Called by a simulation after every timestep; writes a line if interval seconds passed since the last one
+    def update(self, simulation):
+        now = time.time()
+        if now - self.last_write_time >= self.interval:
+            self.last_write_time = now
+            self.write_line(self.simulation_line(simulation, now))
+        if self.print_progress and now - self.last_print_time >= self.print_interval:
+            self.last_print_time = now
+            self.print_simulation_line(self.simulation_line(simulation, now))
+
+    # Called by a simulation after its last timestep
+    def finish(self, simulation):
+        line_dict = self.simulation_line(simulation, time.time())
+        self.write_line(line_dict)
+        if self.print_progress:
+            self.print_simulation_line(line_dict)
+
+    def simulation_line(self, simulation, now):
+        elapsed = now - self.start_time
+        num_of_steps = simulation.current_timestep - self.start_timestep
+        steps_per_sec = None
+        eta = None
+        if elapsed > 0 and num_of_steps > 0:
+            steps_per_sec = num_of_steps/elapsed
+            eta = (simulation.number_of_timesteps - simulation.current_timestep)/steps_per_sec
+        line_dict = {'type': 'simulation', 'batch_label': self.batch_label, 'timestep': simulation.current_timestep,
+                     'num_of_timesteps': simulation.number_of_timesteps, 'elapsed': elapsed, 'steps_per_sec': steps_per_sec,
+                     'eta': eta, 'time': now}
+        line_dict.update(simulation.telemetry_fields())
+        return line_dict
+
+    def print_simulation_line(self, line_dict):
+        if line_dict['steps_per_sec'] == None:
+            print('simulation ' + str(line_dict['sim_index']) + ': timestep ' + str(line_dict['timestep']) + '/' + str(line_dict['num_of_timesteps']))
+        else:
+            print('simulation %s: timestep %d/%d, %.1f steps/s, ETA %.0fs, progeny %s' % (line_dict['sim_index'], line_dict['timestep'], line_dict['num_of_timesteps'],
+                                                                                         line_dict['steps_per_sec'], line_dict['eta'], line_dict['progeny_count']))
+
+    # Called before the simulations of an ensemble are run
+    def start_ensemble(self, num_of_simulations, num_of_timesteps):
+        self.ensemble_start_time = time.time()
+        self.num_of_simulations = num_of_simulations
+        self.ensemble_num_of_timesteps = num_of_timesteps
+
+    # Called every time simulations of the ensemble finish, with the number finished so far
+    # Always writes a line, since it is called at most once per simulation
+    def update_ensemble(self, num_finished):
+        now = time.time()
+        elapsed = now - self.ensemble_start_time
+        sims_per_sec = None
+        steps_per_sec = None
+        eta = None
+        if elapsed > 0 and num_finished > 0:
+            sims_per_sec = num_finished/elapsed
+            steps_per_sec = num_finished*self.ensemble_num_of_timesteps/elapsed
+            eta = (self.num_of_simulations - num_finished)/sims_per_sec
+        self.write_line({'type': 'ensemble', 'batch_label': self.batch_label, 'num_of_simulations': self.num_of_simulations,
+                         'num_finished': num_finished, 'elapsed': elapsed, 'sims_per_sec': sims_per_sec,
+                         'steps_per_sec': steps_per_sec, 'eta': eta, 'time': now})
+        if self.print_progress:
+            if eta == None:
+                print('ensemble: ' + str(num_finished) + '/' + str(self.num_of_simulations) + ' simulations finished')
+            else:
+                print('ensemble: %d/%d simulations finished, %.1f steps/s, ETA %.0fs' % (num_finished, self.num_of_simulations, steps_per_sec, eta))
+
+# Returns the list of dicts of the JSON lines in the telemetry file at path
+def read_telemetry(path):
+    fileHandler = open(path, 'rb')
+    list_of_lines = [json.loads(line) for line in fileHandler if line.strip() != ""]
+    fileHandler.close()
+    return list_of_lines
@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 from mainaux.State import State
+from mainaux.Record import Record
 from state.Proteins import Proteins
 import numpy as np
+import mainaux.Checkpoint as Checkpoint
 import cPickle
 import os
 
+# Loads a checkpoint saved by Simulation.save_state_to_file, or
+# a pickled State saved before checkpoints were introduced
 def load_state(batch_num, sim_num, timestep):
+    checkpoint_path = Checkpoint.checkpoint_path(str(batch_num), sim_num, timestep)
+    if os.path.exists(checkpoint_path):
+        return Checkpoint.load_state(checkpoint_path)
     path = os.getcwd() + "/samplestates/Batch" + str(batch_num) + "/Sim" + str(sim_num) + "/"
     new_filename = "sample" + str(timestep)
     fullpath = os.path.join(path, new_filename)
@@ -14,6 +21,15 @@ def load_state(batch_num, sim_num, timestep):
     fileHandler.close()
     return rtn_state
 
+# Holds every key name, so that a Record given it tracks every state variable
+class AllKeyNames(object):
+    def __contains__(self, key_name):
+        return True
+
+# Returns a Record that tracks every state variable
+def full_record(sampling_rate=1):
+    return Record([], AllKeyNames(), sampling_rate=sampling_rate)
+
 def count_total_Rev(state):
     # Setup stuff
     full_splice_matrix = np.array([0,1,2,3,4,5,6,7,8])        
@@ -434,6 +450,19 @@ def s10_state():
     state = load_state("T3", 0, 1200)
     return state
 
+# Returns a BatchState of num_of_cells cells that each hold the values of a S1 state
+def batch_s1_state(num_of_cells):
+    from mainaux.BatchState import BatchState
+    state = BatchState(num_of_cells)
+    single_state = s1_state()
+    for state_name in ['mRNAs', 'proteins', 'host_factors']:
+        batch_state_obj = state.get_state(state_name)
+        for attr_name, value in vars(single_state.get_state(state_name)).items():
+            if isinstance(value, np.ndarray) or isinstance(value, (int, float)):
+                getattr(batch_state_obj, attr_name)[:] = value
+    state.refresh_cell_states()
+    return state
+
 def site_locator():
     one_index_dict = {}
     zero_index_dict = {}
@@ -0,0 +1,223 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import numpy as np
+import mainaux.Checkpoint as Checkpoint
+from mainaux.SimDaemon import run_job_simulation, job_to_args
+
+# Durable queue of the simulations of parameter studies, shared by workers on any node
+# The queue is a SQLite database, and results are stored as .npz files in a directory next
+# to it, so both must be on storage every node can reach (see RunWorkQueue.py)
+# A study is a list of parameter values (sections, as in SimHelpers.generate_increment_param_plots)
+# with num_of_simulations simulations each; every simulation is one job
+# A worker claims a job by taking a lease on it, which it renews while the simulation runs
+# The lease of a worker that dies runs out, and the job is queued again for another worker
+# Simulation i of section s draws from the stream of (root_seed + s, i), as in
+# generate_increment_param_plots, so a job gives the same result whichever worker runs it,
+# however often it is run
+# A job that raises, or whose lease runs out, is queued again, and marked as failed after
+# MAX_ATTEMPTS attempts
+
+# Number of seconds a lease lasts unless it is renewed
+LEASE_SECONDS = 300
+
+MAX_ATTEMPTS = 3
+
+class WorkQueue(object):
+
+    # path: SQLite file of the queue, created if it does not exist
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = os.path.abspath(path)
+        self.result_directory = os.path.splitext(self.path)[0] + "_results/"
+        self.lease_seconds = lease_seconds
+        if not os.path.exists(os.path.dirname(self.path)):
+            os.makedirs(os.path.dirname(self.path))
+        connection = self.connect()
+        try:
+            connection.execute("CREATE TABLE IF NOT EXISTS studies (name TEXT PRIMARY KEY, spec TEXT)")
+            connection.execute("CREATE TABLE IF NOT EXISTS jobs (job_id INTEGER PRIMARY KEY, study TEXT, section INTEGER, sim_index INTEGER, "
+                               "status TEXT, worker TEXT, lease_expires REAL, attempts INTEGER, error TEXT, result_path TEXT)")
+        finally:
+            connection.close()
+
+    # Every call opens its own connection, so that a queue can be used from several threads
+    # isolation_level None leaves transactions to explicit BEGIN statements
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    # Queues a study; does nothing if a study of that name is already queued
+    # list_of_param_values: value of param_name in each section
+    def add_study(self, study_name, list_of_key_names, num_of_simulations, num_of_timesteps, param_name, list_of_param_values, root_seed, sampling_rate=1):
+        spec = {'list_of_key_names': list_of_key_names, 'num_of_simulations': num_of_simulations, 'num_of_timesteps': num_of_timesteps,
+                'param_name': param_name, 'list_of_param_values': list_of_param_values, 'root_seed': root_seed,
+                'sampling_rate': sampling_rate}
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            if connection.execute("SELECT 1 FROM studies WHERE name = ?", (study_name,)).fetchone() != None:
+                connection.execute("ROLLBACK")
+                return
+            connection.execute("INSERT INTO studies VALUES (?, ?)", (study_name, json.dumps(spec)))
+            for section in range(len(list_of_param_values)):
+                for sim_index in range(num_of_simulations):
+                    connection.execute("INSERT INTO jobs (study, section, sim_index, status, attempts) VALUES (?, ?, ?, 'queued', 0)", (study_name, section, sim_index))
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+    def study_spec(self, study_name):
+        connection = self.connect()
+        try:
+            row = connection.execute("SELECT spec FROM studies WHERE name = ?", (study_name,)).fetchone()
+        finally:
+            connection.close()
+        if row == None:
+            raise Exception("No study named " + study_name + " in " + self.path)
+        return json.loads(row[0])
+
+    # Leases the next queued job to worker_name and returns it as a dict, or returns None if
+    # no job is queued; jobs whose lease ran out are queued again first, or marked as failed
+    # after MAX_ATTEMPTS attempts
+    def claim(self, worker_name):
+        now = time.time()
+        connection = self.connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, worker = NULL, "
+                               "error = CASE WHEN attempts >= ? THEN 'lease ran out' ELSE error END WHERE status = 'leased' AND lease_expires < ?",
+                               (MAX_ATTEMPTS, MAX_ATTEMPTS, now))
+            row = connection.execute("SELECT job_id, study, section, sim_index, attempts FROM jobs WHERE status = 'queued' ORDER BY job_id LIMIT 1").fetchone()
+            if row == None:
+                connection.execute("COMMIT")
+                return None
+            job_id, study_name, section, sim_index, attempts = row
+            connection.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = ? WHERE job_id = ?",
+                               (worker_name, now + self.lease_seconds, attempts + 1, job_id))
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        return {'job_id': job_id, 'study': study_name, 'section': section, 'sim_index': sim_index, 'attempts': attempts + 1}
+
+    # Extends the lease of worker_name on job_id; returns False if the worker lost the lease
+    def renew(self, job_id, worker_name):
+        connection = self.connect()
+        try:
+            cursor = connection.execute("UPDATE jobs SET lease_expires = ? WHERE job_id = ? AND status = 'leased' AND worker = ?",
+                                        (time.time() + self.lease_seconds, job_id, worker_name))
+            return cursor.rowcount == 1
+        finally:
+            connection.close()
+
+    # Stores the variable_tracking_dict of job_id and marks the job as done
+    # A worker whose lease ran out still completes its job, since every run of a job gives the same result
+    def complete(self, job_id, variable_tracking_dict):
+        result_path = self.result_directory + "job" + str(job_id) + ".npz"
+        Checkpoint.write_checkpoint(result_path, dict((key, np.asarray(value)) for key, value in variable_tracking_dict.items()))
+        connection = self.connect()
+        try:
+            connection.execute("UPDATE jobs SET status = 'done', result_path = ?, error = NULL WHERE job_id = ?", (result_path, job_id))
+        finally:
+            connection.close()
+
+    # Queues job_id again after it raised error, or marks it as failed after MAX_ATTEMPTS attempts
+    def release(self, job_id, error):
+        connection = self.connect()
+        try:
+            connection.execute("UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, worker = NULL, error = ? "
+                               "WHERE job_id = ? AND status = 'leased'", (MAX_ATTEMPTS, error, job_id))
+        finally:
+            connection.close()
+
+    # Returns a dict of status -> number of jobs of the study
+    def study_status(self, study_name):
+        connection = self.connect()
+        try:
+            return dict(connection.execute("SELECT status, COUNT(*) FROM jobs WHERE study = ? GROUP BY status", (study_name,)).fetchall())
+        finally:
+            connection.close()
+
+    # Returns True once every job of the study is done; raises if any job failed
+    def is_study_done(self, study_name):
+        status_dict = self.study_status(study_name)
+        if status_dict.get('failed', 0) > 0:
+            raise Exception(str(status_dict['failed']) + " jobs of study " + study_name + " failed")
+        return len(status_dict) > 0 and status_dict.keys() == ['done']
+
+    # Runs the simulation of job (see claim) and returns its variable_tracking_dict
+    def run_job(self, job):
+        spec = self.study_spec(job['study'])
+        job_dict = {'num_of_timesteps': spec['num_of_timesteps'], 'list_of_key_names': spec['list_of_key_names'], 'sim_indices': [job['sim_index']],
+                    'sampling_rate': spec['sampling_rate'], 'param_overrides': {spec['param_name']: spec['list_of_param_values'][job['section']]},
+                    'root_seed': spec['root_seed'] + job['section']}
+        sim_index, variable_tracking_dict = run_job_simulation(job_to_args(job_dict)[0])
+        return variable_tracking_dict
+
+    # Claims and runs jobs until every job of the queue is done or failed, and returns the number
+    # of jobs this worker completed; while jobs of other workers are leased it waits poll_interval
+    # seconds at a time, in case their leases run out
+    def run_worker(self, worker_name=None, poll_interval=5):
+        if worker_name == None:
+            worker_name = socket.gethostname() + ":" + str(os.getpid())
+        num_of_jobs = 0
+        while True:
+            job = self.claim(worker_name)
+            if job == None:
+                connection = self.connect()
+                try:
+                    num_of_leased_jobs = connection.execute("SELECT COUNT(*) FROM jobs WHERE status = 'leased'").fetchone()[0]
+                finally:
+                    connection.close()
+                if num_of_leased_jobs == 0:
+                    return num_of_jobs
+                time.sleep(poll_interval)
+                continue
+
+            # renew the lease in the background while the simulation runs
+            stop_event = threading.Event()
+            def renew_lease():
+                while not stop_event.wait(self.lease_seconds/3.0):
+                    self.renew(job['job_id'], worker_name)
+            renew_thread = threading.Thread(target=renew_lease)
+            renew_thread.daemon = True
+            renew_thread.start()
+            try:
+                variable_tracking_dict = self.run_job(job)
+            except Exception as e:
+                print("Job " + str(job['job_id']) + " failed on " + worker_name + ": " + str(e))
+                self.release(job['job_id'], str(e))
+                continue
+            finally:
+                stop_event.set()
+                renew_thread.join()
+            self.complete(job['job_id'], variable_tracking_dict)
+            num_of_jobs += 1
+
+    # Returns the list of master_tracking_dicts of the sections of a finished study, laid out
+    # like those of SimHelpers.initialize_runsim_dict (master_tracking_dict[key][i] belongs to simulation i)
+    def assemble_study(self, study_name):
+        if not self.is_study_done(study_name):
+            raise Exception("Study " + study_name + " is not done: " + str(self.study_status(study_name)))
+        spec = self.study_spec(study_name)
+        list_of_master_tracking_dicts = [dict() for param_value in spec['list_of_param_values']]
+        connection = self.connect()
+        try:
+            list_of_rows = connection.execute("SELECT section, sim_index, result_path FROM jobs WHERE study = ? ORDER BY section, sim_index", (study_name,)).fetchall()
+        finally:
+            connection.close()
+        for section, sim_index, result_path in list_of_rows:
+            data = np.load(result_path)
+            try:
+                for array_name in data.files:
+                    list_of_master_tracking_dicts[section].setdefault(array_name, []).append(data[array_name])
+            finally:
+                data.close()
+        return list_of_master_tracking_dicts
+
+    # Waits until every job of the study is done and returns assemble_study(study_name)
+    def wait_for_study(self, study_name, poll_interval=5):
+        while not self.is_study_done(study_name):
+            time.sleep(poll_interval)
+        return self.assemble_study(study_name)
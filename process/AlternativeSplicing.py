@@ -31,6 +31,7 @@ from mainaux.State import State
 from mainaux.Process import Process
 from process.RevBinding import RevBinding
 from mainaux.InitParamValues import *
+from mainaux.StochasticKernels import binomial_thinning
 
 #References:
 #1. Kim, H., Yin, J. (2005) In silico mutagenesis of RNA Splicing in HIV-1. Biotechnology and bioengineering 91: 877-893.
@@ -38,8 +39,11 @@ from mainaux.InitParamValues import *
 
 #This is a Process Class
 class AlternativeSplicing(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
@@ -71,6 +75,7 @@ class AlternativeSplicing(Process):
         #print self.PROB_VIF_THIRD_SPLICE
         
         self.MAX_REV_PER_TRANSCRIPT = param_dict['MAX_REV_PER_TRANSCRIPT']        
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
         
         #OLD CODE--REMOVE??
         #freqSpliceSingleToMulti = 4.5/60.0 #probability of a D4-->A7 splice
@@ -79,7 +84,7 @@ class AlternativeSplicing(Process):
                 
     def splice(self, unspliced_abundances, spliced_abundances, splice_probability, cum_prob_splice_forms, splice_form_indexes, indexing_factor, rev_bound_indexes, splice_delay_factor, released_factor=None):
         
-        #unspliced_abundances = vector holding starting abundances of different forms of transcripts TO BE spliced
+        #unspliced_abundances = vector holding starting abundances of different forms of transcripts TO BE spliced (updated in place, so it may be a view)
         #spliced_abundances = vector holding starting abundances of different forms of transcripts that HAVE BEEN spliced
         #splice_probability = probability of a splice event
         #cum_prob_splice_forms = a vector of the cumulative probilities of the given splice forms a trasncript can take, given that a splice event occurs
@@ -88,36 +93,35 @@ class AlternativeSplicing(Process):
         #rev_bound_indexes = vector of indexes of the startingAbundences vector representing Rev-bound constructs (form = np.array), set to -1 if none
         #splice_delay_factor = factor by which to reduce the probability of a splice event if Rev protein is bound to the transcript
         #released_factor = abundance of protein that is released from transcript upon splicing (Rev)
-        if np.sum(unspliced_abundances)>=1: #if there are any transcripts to be spliced
-            for j in np.where(unspliced_abundances>0)[0]: #for each non-zero bin (j is the index of each bin)
-                temp_rand = np.random.rand(unspliced_abundances[j]) #generate a rand num for each transcript
-                #apply a delay factor to Rev bound species...that is Rev inhibits splicing. 
-                if np.size(rev_bound_indexes)>0 and j in rev_bound_indexes: 
-                    d=splice_delay_factor
-                else:
-                    d=0
-                # temp_value represents the amt of a certain mRNA to be spliced for sure
-                temp_value = ((temp_rand<(splice_probability*(1-d))).sum())
-                #count how many are less than the splice probability, and do accounting
-                unspliced_abundances[j]=unspliced_abundances[j]-temp_value
+        if np.sum(unspliced_abundances)>0: #if there are any transcripts to be spliced (expectations of a mean-field simulation may be below 1)
+            #apply a delay factor to Rev bound species...that is Rev inhibits splicing. 
+            delay_factors = np.zeros(np.size(unspliced_abundances))
+            rev_bound_indexes = np.asarray(rev_bound_indexes, int)
+            delay_factors[rev_bound_indexes[rev_bound_indexes>=0]] = splice_delay_factor
+            # amt_spliced[j] represents the amt of the mRNA in bin j to be spliced for sure (one binomial draw per bin)
+            amt_spliced = binomial_thinning(unspliced_abundances, splice_probability*(1-delay_factors), self.random_state, self.HYBRID_THRESHOLD)
+            unspliced_abundances -= amt_spliced
                 
-                #if you need to allocate the splicing amoung different forms
-                if np.size(cum_prob_splice_forms)>1:
-                    #for each new splice event, determine which acceptor site was selected
-                    temp_rand2 = np.random.rand(temp_value) 
-                    for i in range(temp_value):
-                        for k in range(np.size(cum_prob_splice_forms)):
-                            if temp_rand2[i] < cum_prob_splice_forms[k]: # if probability of particular mRNA instance is less than threshold probability to take on another form
-                                spliced_abundances[(j*indexing_factor)+splice_form_indexes[k]]+=1 #then do accounting
-                                break
-                #if you don't need to allocate the splicing amoung different forms
-                else:
-                    spliced_abundances = spliced_abundances + temp_value
-                    if released_factor != None:
-                        released_factor = released_factor+(temp_value*j)
-                        #print('released rev', j)
+            #if you need to allocate the splicing amoung different forms
+            if np.size(cum_prob_splice_forms)>1:
+                #determine how many of the splice events of each bin selected each acceptor site (one multinomial draw per bin)
+                prob_splice_forms = np.diff(np.concatenate(([0], cum_prob_splice_forms)))
+                for j in np.nonzero(amt_spliced)[0]:
+                    spliced_abundances[(j*indexing_factor)+splice_form_indexes] += self.random_state.multinomial(amt_spliced[j], prob_splice_forms)
+            #if you don't need to allocate the splicing amoung different forms
+            else:
+                spliced_abundances = spliced_abundances + np.sum(amt_spliced)
+                if released_factor != None:
+                    released_factor = released_factor+np.dot(amt_spliced, np.arange(np.size(amt_spliced))) #bin j releases j Rev per transcript
         return [unspliced_abundances, spliced_abundances, released_factor]
 
+    # Only transcripts in the nucleus that can still be spliced are spliced
+    def has_work(self):
+        mRNA_state = self.state.get_state('mRNAs')
+        if np.any(mRNA_state.full_len_transcripts_nuc) or np.any(mRNA_state.single_splice_transcript_nuc):
+            return True
+        return mRNA_state.multi_splice_transcript_nuc[0] != 0 or mRNA_state.multi_splice_transcript_nuc[6] != 0
+
     def evolve_state(self, timestep):    
         #get variables
         protein_state = self.state.get_state('proteins')
@@ -141,31 +145,16 @@ class AlternativeSplicing(Process):
         #Step4: Splice 2#
         #################
         #Will any existing transcripts be spliced (second splice event)?  
-        #(1) vif single spliced --> vif multi splice 
-        #vif is indexed at arange(0,57,7)
-        #This splice event releases bound Rev molecules 
-        #resulting form: #D1-A1, D4-A7 #vif                 
-        [unspliced_abundances, multi_splice_transcript_nuc[0], released_factors] = self.splice(single_splice_transcript_nuc[np.arange(0,63,7)], multi_splice_transcript_nuc[0], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])               
-        single_splice_transcript_nuc[np.arange(0,63,7)] = unspliced_abundances #assign the new vif values
-        proteins_nuc[4] = released_factors
-        #(2) vpr single spliced --> vpr multi splice 
-        #vpr is indexed at arange(1,58,7)
-        #This splice event releases bound Rev molecules 
-        #resulting form: #D1-A2, D4-A7 #vpr               
-        [unspliced_abundances, multi_splice_transcript_nuc[6], released_factors] = self.splice(single_splice_transcript_nuc[np.arange(1,63,7)], multi_splice_transcript_nuc[6], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])               
-        single_splice_transcript_nuc[np.arange(1,63,7)] = unspliced_abundances #assign the new vif values
-        proteins_nuc[4] = released_factors
+        #single_splice_by_Rev[r, f] is single_splice_transcript_nuc[7*r + f], the count of form f with r Rev bound
+        #(a view, so splicing a column updates single_splice_transcript_nuc in place)
+        #These splice events release bound Rev molecules
+        #(1) vif single spliced --> vif multi splice, resulting form: #D1-A1, D4-A7 #vif
+        #(2) vpr single spliced --> vpr multi splice, resulting form: #D1-A2, D4-A7 #vpr
         #(3) tat single spliced --> tat double spliced at the frequecy of the 2nd splice event 
-        [unspliced_abundances, multi_splice_transcript_nuc[12], released_factors] = self.splice(single_splice_transcript_nuc[np.arange(2,63,7)], multi_splice_transcript_nuc[12], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])               
-        single_splice_transcript_nuc[np.arange(2,63,7)] = unspliced_abundances #assign the new tat values
-        proteins_nuc[4] = released_factors
         #(4) env single spliced --> rev,nef double spliced at the frequecy of the 2nd splice event
-        [unspliced_abundances, multi_splice_transcript_nuc[13], released_factors] = self.splice(single_splice_transcript_nuc[np.arange(3,63,7)], multi_splice_transcript_nuc[13], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])               
-        single_splice_transcript_nuc[np.arange(3,63,7)] = unspliced_abundances #assign the new rev values
-        proteins_nuc[4] = released_factors        
-        [unspliced_abundances, multi_splice_transcript_nuc[16], released_factors] = self.splice(single_splice_transcript_nuc[np.arange(6,63,7)], multi_splice_transcript_nuc[16], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])               
-        single_splice_transcript_nuc[np.arange(6,63,7)] = unspliced_abundances #assign the new nef values
-        proteins_nuc[4] = released_factors        
+        single_splice_by_Rev = single_splice_transcript_nuc.reshape((self.MAX_REV_PER_TRANSCRIPT+1, 7))
+        for [single_splice_form, multi_splice_form] in [[0, 0], [1, 6], [2, 12], [3, 13], [6, 16]]:
+            [unspliced_abundances, multi_splice_transcript_nuc[multi_splice_form], proteins_nuc[4]] = self.splice(single_splice_by_Rev[:,single_splice_form], multi_splice_transcript_nuc[multi_splice_form], self.PROB_SPLICE_SINGLE_TO_MULTI, 1, 0, 7, np.arange(1,self.MAX_REV_PER_TRANSCRIPT+1), self.SPLICE_DELAY_FACTOR, proteins_nuc[4])
         
         #################
         #Step5: Splice 3#
@@ -176,8 +165,7 @@ class AlternativeSplicing(Process):
         #   #D1-A1, D2-A3, D4-A7 tat
         #   #D1-A1, D2-A4abc, D4-A7 rev (lumping abc for now)
         #   #D1-A1, D2-A5, D4-A7 nef
-        [unspliced_abundances, multi_splice_transcript_nuc, released_factors] = self.splice(np.array([multi_splice_transcript_nuc[0]]), multi_splice_transcript_nuc, self.PROB_VIF_THIRD_SPLICE, self.CUMULATIVE_F3_TO_F5, np.array([1,2,5]), 0, [], self.SPLICE_DELAY_FACTOR)
-        multi_splice_transcript_nuc[0] = unspliced_abundances[0]
+        [unspliced_abundances, multi_splice_transcript_nuc, released_factors] = self.splice(multi_splice_transcript_nuc[0:1], multi_splice_transcript_nuc, self.PROB_VIF_THIRD_SPLICE, self.CUMULATIVE_F3_TO_F5, np.array([1,2,5]), 0, [], self.SPLICE_DELAY_FACTOR)
 
         #(2b) vpr multi splice  --> tat, rev, nef double spliced 
         #splice_form_indexes = [7, 8, 11] = [A3 tat, A4abc rev, A5 nef]
@@ -185,8 +173,7 @@ class AlternativeSplicing(Process):
         #   #D1-A2, D3-A3, D4-A7 tat
         #   #D1-A2, D3-A4abc, D4-A7 rev (lumping abc for now)
         #   #D1-A2, D3-A5, D4-A7 nef
-        [unspliced_abundances, multi_splice_transcript_nuc, released_factors] = self.splice(np.array([multi_splice_transcript_nuc[6]]), multi_splice_transcript_nuc, self.PROB_VIF_THIRD_SPLICE, self.CUMULATIVE_F3_TO_F5, np.array([7,8,11]), 0, [], self.SPLICE_DELAY_FACTOR)
-        multi_splice_transcript_nuc[6] = unspliced_abundances[0]
+        [unspliced_abundances, multi_splice_transcript_nuc, released_factors] = self.splice(multi_splice_transcript_nuc[6:7], multi_splice_transcript_nuc, self.PROB_VIF_THIRD_SPLICE, self.CUMULATIVE_F3_TO_F5, np.array([7,8,11]), 0, [], self.SPLICE_DELAY_FACTOR)
          
        
                     
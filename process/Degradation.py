@@ -42,11 +42,15 @@ from mainaux.State import State
 from mainaux.Process import Process
 from state.Proteins import Proteins
 from mainaux.InitParamValues import *
+from mainaux.StochasticKernels import thin_abundances
 
 #This is a Process Class
 class Degradation(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
@@ -56,6 +60,7 @@ class Degradation(Process):
         self.PROB_PROTEIN_DEG_NUC = param_dict['PROB_PROTEIN_DEG_NUC'] #1/min #Kim, Yin 2005
         self.PROB_PROTEIN_DEG_CYT = param_dict['PROB_PROTEIN_DEG_CYT'] #1/min #Kim, Yin 2005
         self.PROB_PROTEIN_DEG_MEM = param_dict['PROB_PROTEIN_DEG_MEM']
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
         # Currently, assuming no protein degradation occurs for proteins_virion
 
     def degrade(self, deg_rate, abundances, released_factors=None, num_constructs = None):
@@ -71,19 +76,27 @@ class Degradation(Process):
         #This function assumes that your degradation rate is less than 1
         #Assumes no more than 1 type of released factor
         # np.seed(i)
-        if np.sum(abundances)>=1: #if at least one X exists
-            for i in range(np.size(abundances)): #for each form of X: X[i]
-
-                temp_rand = np.random.rand(abundances[i]) #generate a rand array for each item that can potentially be degraded
-                #count how many are less than the degradation probability and decrement
-                decrement_amount = (temp_rand < deg_rate).sum()
-                abundances[i]=abundances[i]- decrement_amount
-                
-                # increase released_factors amount accordingly
-                if released_factors != None: #if additional factors are bound to X[i], release and account for them
-                    released_factors = released_factors+decrement_amount*(np.divide(i,num_constructs))
+        if np.sum(abundances)>0: #if any X exists (expectations of a mean-field simulation may be below 1)
+            #count how many of the items of each form X[i] that can potentially be degraded are degraded, and decrement
+            if released_factors != None: #if additional factors are bound to X[i], release and account for them
+                factors_per_bin = np.arange(np.size(abundances))//num_constructs #X[i] holds i//num_constructs factors
+                [decrement_amounts, amt_released] = thin_abundances(abundances, deg_rate, self.random_state, self.HYBRID_THRESHOLD, factors_per_bin)
+                released_factors = released_factors+amt_released
+            else:
+                thin_abundances(abundances, deg_rate, self.random_state, self.HYBRID_THRESHOLD)
         return [abundances, released_factors]
         
+    # Proteins in the virions are not degraded
+    def has_work(self):
+        protein_state = self.state.get_state('proteins')
+        mRNA_state = self.state.get_state('mRNAs')
+        for abundances in [protein_state.proteins_nuc, protein_state.proteins_cyt, protein_state.proteins_mem,
+                           mRNA_state.full_len_transcripts_nuc, mRNA_state.full_len_transcripts_cyt, mRNA_state.single_splice_transcript_nuc,
+                           mRNA_state.single_splice_transcript_cyt, mRNA_state.multi_splice_transcript_nuc, mRNA_state.multi_splice_transcript_cyt]:
+            if np.any(abundances):
+                return True
+        return False
+
     def evolve_state(self, timestep):
 
         #get variables
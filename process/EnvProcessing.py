@@ -4,15 +4,22 @@ import numpy as np
 from state.Proteins import Proteins
 from mainaux.InitParamValues import *
 from mainaux.ProcessHelpers import * # this is where roll_dice, transfer_buckets is defined
+from mainaux.StochasticKernels import trimer_compositions
+from mainaux.MeanField import is_mean_field
 from state.ViralProgeny import *
 
 class EnvProcessing(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict()
 
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
+
         #Vars made up in this module
         self.Oligosaccharyltransferase = 1000
         self.GlucosidaseI = 1000
@@ -37,6 +44,16 @@ class EnvProcessing(Process):
         #rate_viron_incorporation = 42 #1/min #~42 Env trimer binding events per min. In other words of the many virons, in a given minute 42 will get an env. 
         self.rate_viron_incorporation = 84 #fit to get average of 12 trimers per viron
 
+    # Only Env that has been translated is processed
+    def has_work(self):
+        protein_state = self.state.get_state('proteins')
+        if protein_state.proteins_cyt[Proteins.index['Env']] != 0:
+            return True
+        for value in protein_state.env_misc.values():
+            if np.any(value):
+                return True
+        return False
+
     def evolve_state(self, timestep, final_step=10, single_step=None):
         # Assume it is
         protein_state = self.state.get_state('proteins')
@@ -52,12 +69,12 @@ class EnvProcessing(Process):
         #Step 1. Env proteins from the cytoplasm are brought into the ER
         #assumes rate_of_ER_localization <= 1
         if (single_step == None and final_step >= 1) or (single_step == 1):
-            transfer_buckets(env_misc, 'Env : cytoplasm', 'Env : ER', self.rate_of_ER_localization)
+            transfer_buckets(env_misc, 'Env : cytoplasm', 'Env : ER', self.rate_of_ER_localization, self.random_state, self.HYBRID_THRESHOLD)
 
         #Step 2. Env proteins in the ER are glycosylated by oligosaccharyltransferase
         if (single_step == None and final_step >= 2) or (single_step == 2):
             rate_of_step = self.Oligosaccharyltransferase*self.rate_oligosaccharyltransferase
-            transfer_buckets(env_misc, 'Env : ER', 'Env : ER : G1', rate_of_step)
+            transfer_buckets(env_misc, 'Env : ER', 'Env : ER : G1', rate_of_step, self.random_state, self.HYBRID_THRESHOLD)
 
         #Step 3. Env proteins in the ER are glycosylated by glucosidase I and II
         #assumes rate is very high
@@ -67,18 +84,18 @@ class EnvProcessing(Process):
                 env_misc['Env : ER : G1'] = 0
             else:
                 rate_of_step = self.GlucosidaseI*self.rate_glucosidaseI
-                transfer_buckets(env_misc, 'Env : ER : G1', 'Env : ER : G2', rate_of_step)
+                transfer_buckets(env_misc, 'Env : ER : G1', 'Env : ER : G2', rate_of_step, self.random_state, self.HYBRID_THRESHOLD)
 
             if self.GlucosidaseII * self.rate_glucosidaseII >= env_misc['Env : ER : G2']:
                 env_misc['Env : ER : G3'] = env_misc['Env : ER : G3'] + env_misc['Env : ER : G2']
                 env_misc['Env : ER : G2'] = 0
             else:
                 rate_of_step = self.GlucosidaseII*self.rate_glucosidaseII
-                transfer_buckets(env_misc, 'Env : ER : G2', 'Env : ER : G3', rate_of_step)
+                transfer_buckets(env_misc, 'Env : ER : G2', 'Env : ER : G3', rate_of_step, self.random_state, self.HYBRID_THRESHOLD)
 
         #Step 4. Folding by Calnexin chaperone
         if (single_step == None and final_step >= 4) or (single_step == 4):
-            transfer_buckets(env_misc, 'Env : ER : G3', 'Env : ER : G3 : folded', self.rate_Env_folding)
+            transfer_buckets(env_misc, 'Env : ER : G3', 'Env : ER : G3 : folded', self.rate_Env_folding, self.random_state, self.HYBRID_THRESHOLD)
 
             #Step 4.5. Second glucosidase II reaction
             if self.GlucosidaseII * self.rate_glucosidaseII >= env_misc['Env : ER : G3 : folded']:
@@ -86,18 +103,18 @@ class EnvProcessing(Process):
                 env_misc['Env : ER : G3 : folded'] = 0
             else:        
                 rate_of_step = self.GlucosidaseII*self.rate_glucosidaseII
-                transfer_buckets(env_misc, 'Env : ER : G3 : folded', 'Env : ER : G4 : folded', rate_of_step)
+                transfer_buckets(env_misc, 'Env : ER : G3 : folded', 'Env : ER : G4 : folded', rate_of_step, self.random_state, self.HYBRID_THRESHOLD)
 
             #Need to add error rate and degradation pathway -- cannot add because no parameters found
 
         #Step 5. Transport to Golgi
         if (single_step == None and final_step >= 5) or (single_step == 5):
-            transfer_buckets(env_misc, 'Env : ER : G4 : folded', 'Env : Golgi', self.rate_of_Golgi_localization)
+            transfer_buckets(env_misc, 'Env : ER : G4 : folded', 'Env : Golgi', self.rate_of_Golgi_localization, self.random_state, self.HYBRID_THRESHOLD)
 
         #Step 6. Golgi glycosylation.
         if (single_step == None and final_step >= 6) or (single_step == 6):
-            amt_transferred = transfer_buckets(env_misc, 'Env : Golgi', 'Env : Golgi : G5', self.rate_golgi_glycosylation)
-            amt_errored = roll_dice(amt_transferred, self.prob_golgi_glycosylation_error)
+            amt_transferred = transfer_buckets(env_misc, 'Env : Golgi', 'Env : Golgi : G5', self.rate_golgi_glycosylation, self.random_state, self.HYBRID_THRESHOLD)
+            amt_errored = roll_dice(amt_transferred, self.prob_golgi_glycosylation_error, self.random_state, self.HYBRID_THRESHOLD)
             move_buckets(env_misc, 'Env : Golgi : G5', 'Env : Golgi : G5 : error', amt_errored)
 
         #Step 7. Trimerization
@@ -105,26 +122,22 @@ class EnvProcessing(Process):
         # Note: changed around what the index of this size-4 array means (index = # of successes in trimer)
         if (single_step == None and final_step >= 7) or (single_step == 7):
             total_Golgi_G5_Env = env_misc['Env : Golgi : G5'] + env_misc['Env : Golgi : G5 : error']
-            num_trimers_created = roll_dice(total_Golgi_G5_Env/float(3), self.rate_trimerization)
-            for i in range(num_trimers_created): # iterate through each trimer
-                successes_in_trimer = 0
-                for j in range(3):
-                    total_Golgi_G5_Env = env_misc['Env : Golgi : G5'] + env_misc['Env : Golgi : G5 : error']
-                    successful_trimer_cutoff = float(env_misc['Env : Golgi : G5'])/total_Golgi_G5_Env
-                    if np.random.rand()<successful_trimer_cutoff: # if Env protein is successful one as part of trimer
-                        successes_in_trimer = successes_in_trimer + 1
-                        env_misc['Env : Golgi : G5'] -= 1
-                    else:
-                        env_misc['Env : Golgi : G5 : error'] -= 1
-                    # index of env_misc['Env : trimers'] is the # of successful Envs in trimer
-                env_misc['Env : trimers'][successes_in_trimer] += 1
+            num_trimers_created = roll_dice(total_Golgi_G5_Env/float(3), self.rate_trimerization, self.random_state, self.HYBRID_THRESHOLD)
+            #B. Each trimer takes 3 Envs without replacement from the successful and errored Envs
+            # index of env_misc['Env : trimers'] is the # of successful Envs in trimer
+            # the trimers are drawn all at once, see trimer_compositions
+            trimers_created = trimer_compositions(env_misc['Env : Golgi : G5'], env_misc['Env : Golgi : G5 : error'], num_trimers_created, self.random_state)
+            successes_in_trimers = np.dot(np.arange(4), trimers_created)
+            env_misc['Env : Golgi : G5'] -= successes_in_trimers
+            env_misc['Env : Golgi : G5 : error'] -= 3*num_trimers_created - successes_in_trimers
+            env_misc['Env : trimers'] += trimers_created
 
         #Step 8. Cleavage and non-covelent complexation (gp160 breaking up into gp120 and gp140, and gp120 and gp140 reassociating)
         #since we do not have rates of non-covenlent complexation, will assume that it is quick and happens in the same step as cleavage
         if (single_step == None and final_step >= 8) or (single_step == 8):
             if sum(env_misc['Env : trimers']) > 0:
                 for i in range(4):
-                    temp_rand = roll_dice(env_misc['Env : trimers'][i], self.rate_cleavage)
+                    temp_rand = roll_dice(env_misc['Env : trimers'][i], self.rate_cleavage, self.random_state, self.HYBRID_THRESHOLD)
                     env_misc['Env : trimers : cleaved'][i] += temp_rand
                     env_misc['Env : trimers'][i] -= temp_rand
 
@@ -137,7 +150,7 @@ class EnvProcessing(Process):
                         env_misc['Env : trimers : membrane'][i] += env_misc['Env : trimers : cleaved'][i]
                         env_misc['Env : trimers : cleaved'][i] = 0
                     else:
-                        tempRand = np.random.poisson(self.rate_membrane_localization)
+                        tempRand = self.random_state.poisson(self.rate_membrane_localization)
                         env_misc['Env : trimers : membrane'][i] += np.min([tempRand, env_misc['Env : trimers : cleaved'][i]])
                         env_misc['Env : trimers : cleaved'][i] -= np.min([tempRand, env_misc['Env : trimers : cleaved'][i]])
 
@@ -145,25 +158,31 @@ class EnvProcessing(Process):
         if (single_step == None and final_step >= 10) or (single_step == 10):
             num_of_progeny = viral_progeny_container.count_progeny()
             if sum(env_misc['Env : trimers : membrane']) > 0 and num_of_progeny > 0:
-                num_trimers_to_bind_virons = np.random.poisson(self.rate_viron_incorporation)
-                for i in range(min([num_trimers_to_bind_virons,int(sum(env_misc['Env : trimers : membrane']))])):
-                    env_misc['Env : trimers : membrane'] = np.array(env_misc['Env : trimers : membrane']).astype('float') # TODO: think about the logic here further
-                    cum_trimer_vector = np.cumsum((env_misc['Env : trimers : membrane'])/float(sum(env_misc['Env : trimers : membrane'])))
-                    temp_rand = np.random.rand() 
-                    viron_to_bind = np.random.randint(0, num_of_progeny)
-                    progeny_of_interest = viral_progeny_container.list_of_progeny[viron_to_bind]
-                    if temp_rand < cum_trimer_vector[0]:
-                        progeny_of_interest.update_num_of_Env_t(0, 1)
-                        env_misc['Env : trimers : membrane'][0] -= 1
-                    elif temp_rand < cum_trimer_vector[1]:
-                        progeny_of_interest.update_num_of_Env_t(1, 1)
-                        env_misc['Env : trimers : membrane'][1] -= 1
-                    elif temp_rand < cum_trimer_vector[2]:
-                        progeny_of_interest.update_num_of_Env_t(2, 1)
-                        env_misc['Env : trimers : membrane'][2] -= 1
-                    else:
-                        progeny_of_interest.update_num_of_Env_t(3, 1)
-                        env_misc['Env : trimers : membrane'][3] -= 1
+                num_trimers_to_bind_virons = self.random_state.poisson(self.rate_viron_incorporation)
+                #In a mean-field simulation the expected trimers, of every kind in proportion, are spread evenly over the progeny
+                if is_mean_field(self.random_state):
+                    trimers_bound = env_misc['Env : trimers : membrane']*min(1, num_trimers_to_bind_virons/sum(env_misc['Env : trimers : membrane']))
+                    env_misc['Env : trimers : membrane'] = env_misc['Env : trimers : membrane'] - trimers_bound
+                    viral_progeny_container.spread_num_of_Env_t(trimers_bound)
+                else:
+                    for i in range(min([num_trimers_to_bind_virons,int(sum(env_misc['Env : trimers : membrane']))])):
+                        env_misc['Env : trimers : membrane'] = np.array(env_misc['Env : trimers : membrane']).astype('float') # TODO: think about the logic here further
+                        cum_trimer_vector = np.cumsum((env_misc['Env : trimers : membrane'])/float(sum(env_misc['Env : trimers : membrane'])))
+                        temp_rand = self.random_state.rand() 
+                        viron_to_bind = self.random_state.randint(0, num_of_progeny)
+                        progeny_of_interest = viral_progeny_container.list_of_progeny[viron_to_bind]
+                        if temp_rand < cum_trimer_vector[0]:
+                            progeny_of_interest.update_num_of_Env_t(0, 1)
+                            env_misc['Env : trimers : membrane'][0] -= 1
+                        elif temp_rand < cum_trimer_vector[1]:
+                            progeny_of_interest.update_num_of_Env_t(1, 1)
+                            env_misc['Env : trimers : membrane'][1] -= 1
+                        elif temp_rand < cum_trimer_vector[2]:
+                            progeny_of_interest.update_num_of_Env_t(2, 1)
+                            env_misc['Env : trimers : membrane'][2] -= 1
+                        else:
+                            progeny_of_interest.update_num_of_Env_t(3, 1)
+                            env_misc['Env : trimers : membrane'][3] -= 1
 
         # Write back to Env bucket in proteins_cyt
         proteins_cyt[Proteins.index['Env']] = env_misc['Env : cytoplasm']
@@ -46,11 +46,15 @@ from mainaux.State import State
 from mainaux.Process import Process
 from process.RevBinding import RevBinding
 from mainaux.InitParamValues import *
+from mainaux.StochasticKernels import transfer_abundances
 
 #This is a Process Class
 class MRNAExport(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();    
@@ -61,20 +65,22 @@ class MRNAExport(Process):
         self.PROB_REV_DEP_EXPORT = param_dict['PROB_REV_DEP_EXPORT'] #1/min #Kim, H., Yin, J. (2005) 
         
         self.MAX_REV_PER_TRANSCRIPT = param_dict['MAX_REV_PER_TRANSCRIPT']
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
         
     def nuclear_export(self, what_may_be_exported, abundances_nuc, abundances_cyt, export_rate):
         #what_may_be_exported = array/list of indexes in abundances_nuc/Cyt of constructs to export
         #abundances_nuc = starting abundances of things to be exported
         #abundances_cyt = starting abundances of things in the destination location
         #export_rate = rate of export
-        for i in what_may_be_exported:
-            temp_rand = np.random.rand(abundances_nuc[i])
-            #count how many are less than the export probability, and do accounting
-            decrement_amount = (temp_rand<export_rate).sum()
-            abundances_cyt[i]=abundances_cyt[i]+decrement_amount
-            abundances_nuc[i]=abundances_nuc[i]-decrement_amount
+        #count how many of each are exported, and do accounting
+        transfer_abundances(abundances_nuc, abundances_cyt, what_may_be_exported, export_rate, self.random_state, self.HYBRID_THRESHOLD)
         return [abundances_nuc, abundances_cyt]
         
+    # Only transcripts in the nucleus are exported
+    def has_work(self):
+        mRNA_state = self.state.get_state('mRNAs')
+        return np.any(mRNA_state.full_len_transcripts_nuc) or np.any(mRNA_state.single_splice_transcript_nuc) or np.any(mRNA_state.multi_splice_transcript_nuc)
+
     def evolve_state(self, timestep):  
         
         #get variables
@@ -91,6 +91,8 @@ from state.Proteins import Proteins
 from state.ViralProgeny import *
 from mainaux.InitParamValues import *
 from mainaux.TestHelpers import count_total_Gag
+from mainaux.StochasticKernels import binomial_thinning, multivariate_hypergeometric
+from mainaux.MeanField import is_mean_field
 import math as math
 
 #References:
@@ -110,8 +112,11 @@ import math as math
 
 #This is a Process Class
 class Packaging(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
         if param_dict==None:
             param_dict = generate_param_dict();         
         #Constant parameters
@@ -129,7 +134,26 @@ class Packaging(Process):
         #self.GAG_VELOCITY = (((float(3)/(4*math.pi))*(self.VOLUME_CYTOPLASM*0.001))**(float(1)/3)) / (float(1)/self.GAG_DIFFUSION_PROB) #m/min
         self.GAG_DIAMETER = param_dict['GAG_DIAMETER'] #m #Datta et al. Gag is NOT globular/spherical. It is 34A x 41A, so just using mean here as an approximation. 
         self.PROB_GAG_BOUND_RNA_DIMERS = param_dict['PROB_GAG_BOUND_RNA_DIMERS'] #fittable parameter, currently  set to be not limiting at all
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
         self.viral_progeny_container = self.state.get_state('viral_progeny_container')
+        #Expected RNA dimers of a mean-field simulation that have not made a progeny yet (see dimerize_gagbound_transcripts)
+        self.expected_dimers = 0
+
+        #Transition table of the Gag bound transcripts: in a timestep, each unbound SL site of a transcript binds a Gag
+        #and each bound SL site releases its Gag independently, so a transcript goes from bin b to bin c of
+        #full_len_transcripts_Gag_bound (b = 8*SL1 + 4*SL2 + 2*SL3 + SL4, bit set if the site is bound) with a probability
+        #that is a product of one factor per SL site. The transitions of all the transcripts of a bin are one multinomial draw.
+        #The SL site loop this replaced reused one random number per transcript for the 4 sites and moved the transcripts
+        #bin by bin, so a transcript could bind several sites one after the other in a timestep; at the binding rates of the
+        #default params the two differ by about the squared rates per timestep (see test_SL_binding_matches_previous_process)
+        #SL_BOUND_BEFORE[s,b,0] is True if SL site s is bound in bin b, SL_BOUND_AFTER[s,0,c] if it is bound in bin c
+        bins = np.arange(16)
+        SL_site_bits = np.array([8, 4, 2, 1])
+        self.SL_BOUND_BEFORE = (bins[np.newaxis,:,np.newaxis] & SL_site_bits[:,np.newaxis,np.newaxis]) > 0
+        self.SL_BOUND_AFTER = (bins[np.newaxis,np.newaxis,:] & SL_site_bits[:,np.newaxis,np.newaxis]) > 0
+        #GAG_BOUND_CHANGE[b,c] is the number of Gag taken up (released if negative) by a transcript going from bin b to bin c
+        self.GAG_BOUND_CHANGE = self.SL_BOUND_AFTER.sum(0) - self.SL_BOUND_BEFORE.sum(0)
+
         #These are temporary parameters that will be used to obtain the parameters required to simulate viron growth
         #These parameters will be swapped out for fit "physiological" parameters after model is appropriately fit             
         
@@ -153,6 +177,66 @@ class Packaging(Process):
             #Circular area = 4.8 * 10^-5 um^2
             #Prob = 4.8 * 10^-5 um^2/1412.162um^2 = 3.3*10^-8
     
+    # Without Gag in the cytoplasm, Gag-bound transcripts and progeny, and before G2/M
+    # cell cycle arrest, nothing binds, dimerizes, diffuses or grows
+    def has_work(self):
+        protein_state = self.state.get_state('proteins')
+        proteins_cyt = protein_state.proteins_cyt
+        if len(self.viral_progeny_container.list_of_progeny) > 0 or np.any(self.state.get_state('mRNAs').full_len_transcripts_Gag_bound):
+            return True
+        if proteins_cyt[Proteins.index['Gag']] != 0 or proteins_cyt[Proteins.index['Gag_dimers']] != 0:
+            return True
+        return self.state.get_state('cell_cycle').cell_cycle_arrest == 1 or proteins_cyt[Proteins.index['Vpr']] > self.VPR_G2ARREST_THRESH
+
+    # Draws the Gag binding to and released from the SL sites of the Gag bound transcripts in a timestep
+    # (see SL_BOUND_BEFORE in __init__); BatchPackaging calls it for every cell of a batch
+    # Gag_bound_bins: the 16 bins of full_len_transcripts_Gag_bound of a cell, updated in place
+    # binding_rates: probability that each of SL1, SL2, SL3, SL4 binds a Gag in the timestep
+    # free_Gag: Gag in the cytoplasm; returns the Gag left in the cytoplasm
+    def bind_SL_sites(self, Gag_bound_bins, binding_rates, free_Gag):
+        #probability of each transition of the table (see SL_BOUND_BEFORE in __init__)
+        site_rates = binding_rates[:,np.newaxis,np.newaxis]
+        transition_probs = np.where(self.SL_BOUND_BEFORE, np.where(self.SL_BOUND_AFTER, 1 - self.GAGNC_DISS_RATE, self.GAGNC_DISS_RATE),
+                                    np.where(self.SL_BOUND_AFTER, site_rates, 1 - site_rates)).prod(0)
+        transitions = np.zeros((16,16), Gag_bound_bins.dtype)
+        for b in np.nonzero(Gag_bound_bins)[0]:
+            transitions[b] = self.random_state.multinomial(Gag_bound_bins[b], transition_probs[b])
+
+        #Gag released by unbinding is free to bind again in the same timestep
+        Gag_change = transitions*self.GAG_BOUND_CHANGE
+        free_Gag = free_Gag - Gag_change[Gag_change < 0].sum()
+        if Gag_change[Gag_change > 0].sum() <= free_Gag:
+            free_Gag -= Gag_change[Gag_change > 0].sum()
+        elif is_mean_field(self.random_state):
+            #Not enough free Gag for every binding: every transition taking up Gag gets the same share of the
+            #free Gag, the rest of its transcripts stay in their bin (see mainaux/MeanField.py)
+            Gag_taking = Gag_change > 0
+            left_in_bin = np.where(Gag_taking, transitions*(1 - free_Gag/float(Gag_change[Gag_taking].sum())), 0)
+            free_Gag = 0
+            transitions -= left_in_bin
+            transitions[np.arange(16), np.arange(16)] += left_in_bin.sum(1)
+        else:
+            #Not enough free Gag for every binding: the free Gag is drawn without replacement from the Gag
+            #the transitions would take up, so no transition is favoured over another. A transition (b, c) is
+            #kept for every GAG_BOUND_CHANGE[b,c] Gag it gets, the other transcripts stay in their bin
+            Gag_taking = Gag_change > 0
+            Gag_needed = self.GAG_BOUND_CHANGE[Gag_taking]
+            Gag_taken = multivariate_hypergeometric(Gag_change[Gag_taking], free_Gag, self.random_state)
+            kept = Gag_taken // Gag_needed
+            free_Gag -= (kept*Gag_needed).sum()
+            #the few Gag left over by the division go to the transitions that are short, taken in a random order
+            drawn = transitions[Gag_taking]
+            for k in self.random_state.permutation(len(kept)):
+                extra = min(drawn[k] - kept[k], free_Gag // Gag_needed[k])
+                kept[k] += extra
+                free_Gag -= extra*Gag_needed[k]
+            left_in_bin = np.zeros((16,16), int)
+            left_in_bin[Gag_taking] = drawn - kept
+            transitions -= left_in_bin
+            transitions[np.arange(16), np.arange(16)] += left_in_bin.sum(1)
+        Gag_bound_bins[:] = transitions.sum(0)
+        return free_Gag
+
     def evolve_state(self, timestep, active_proc=[]):       
     
         #get variables
@@ -169,6 +253,7 @@ class Packaging(Process):
         mRNA_state = self.state.get_state('mRNAs')
         full_len_transcripts_cyt = mRNA_state.full_len_transcripts_cyt
         full_len_transcripts_Gag_bound = mRNA_state.full_len_transcripts_Gag_bound
+        Gag_bound_bins = full_len_transcripts_Gag_bound #the 16 bins, see SL_BOUND_BEFORE in __init__
         full_len_transcripts_Gag_bound = full_len_transcripts_Gag_bound.reshape((2,2,2,2))
         full_length_transcript_dimers_cyt = mRNA_state.full_length_transcript_dimers_cyt
         viral_particles_state = self.state.get_state('viral_progeny')
@@ -179,119 +264,21 @@ class Packaging(Process):
 
 
         #Helper functions
-        def site_locator():
-            one_index_dict = {}
-            zero_index_dict = {}
-            zero_index_dict['SL1_site'] = []
-            zero_index_dict['SL2_site'] = []
-            zero_index_dict['SL3_site'] = []
-            zero_index_dict['SL4_site'] = []
-            one_index_dict['SL1_site'] = []
-            one_index_dict['SL2_site'] = []
-            one_index_dict['SL3_site'] = []
-            one_index_dict['SL4_site'] = []            
-            for i in range(2):
-                for j in range(2):
-                    for k in range(2):
-                        for l in range(2):
-                            if i == 1:
-                                one_index_dict['SL1_site'] += [(i,j,k,l)] # Stores all tuples where i == 1 (should be 8)
-                                zero_index_dict['SL1_site'] += [(0,j,k,l)] # Stores all tuples where i == 0 (should be 8)
-                            if j == 1:
-                                one_index_dict['SL2_site'] += [(i,j,k,l)]
-                                zero_index_dict['SL2_site'] += [(i,0,k,l)]
-                            if k == 1:
-                                one_index_dict['SL3_site'] += [(i,j,k,l)]
-                                zero_index_dict['SL3_site'] += [(i,j,0,l)]
-                            if l == 1:
-                                one_index_dict['SL4_site'] += [(i,j,k,l)]
-                                zero_index_dict['SL4_site'] += [(i,j,k,0)]
-            return one_index_dict, zero_index_dict
-        one_index_dict, zero_index_dict = site_locator()
-
         def gen_binding_rates():
-            rtn_dict = {}
-            rtn_dict['SL1_site'] = (long(self.BINDING_CONSTANT_SL1) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * float(self.VOLUME_CYTOPLASM))
-            rtn_dict['SL2_site'] = (long(self.BINDING_CONSTANT_SL2) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * float(self.VOLUME_CYTOPLASM))
-            rtn_dict['SL3_site'] = (long(self.BINDING_CONSTANT_SL3) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * float(self.VOLUME_CYTOPLASM))
-            rtn_dict['SL4_site'] = (long(self.BINDING_CONSTANT_SL4) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * float(self.VOLUME_CYTOPLASM))
-            return rtn_dict
-        binding_rates_dict = gen_binding_rates()
+            #binding rates of SL1, SL2, SL3, SL4
+            binding_constants = np.array([self.BINDING_CONSTANT_SL1, self.BINDING_CONSTANT_SL2, self.BINDING_CONSTANT_SL3, self.BINDING_CONSTANT_SL4], float)
+            binding_rates = (binding_constants * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * float(self.VOLUME_CYTOPLASM))
+            return np.minimum(binding_rates, 1)
 
         def process_SL_site():
-            list_of_sites = ['SL1_site', 'SL2_site', 'SL3_site', 'SL4_site']
-            rate_SL1_binding = binding_rates_dict['SL1_site']
-            rate_SL2_binding = binding_rates_dict['SL2_site']
-            rate_SL3_binding = binding_rates_dict['SL3_site']
-            rate_SL4_binding = binding_rates_dict['SL4_site']
-            
-            for i in range(2):
-                for j in range(2):
-                    for k in range(2):
-                        for l in range(2):
-                            if full_len_transcripts_Gag_bound[i,j,k,l] > 0:
-                                sampling_values = np.random.rand(full_len_transcripts_Gag_bound[i,j,k,l])
-                                if i == 0:
-                                    tempRand = np.sum(sampling_values < rate_SL1_binding)
-                                    delta_Gag = np.min([tempRand, proteins_cyt[Proteins.index['Gag']]])
-                                    full_len_transcripts_Gag_bound[1,j,k,l] += delta_Gag
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= delta_Gag
-                                    proteins_cyt[Proteins.index['Gag']] -= delta_Gag
-                                elif i == 1:
-                                    tempRand = np.sum(sampling_values < self.GAGNC_DISS_RATE)
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= tempRand
-                                    full_len_transcripts_Gag_bound[0,j,k,l] += tempRand
-                                    proteins_cyt[Proteins.index['Gag']] += tempRand
-
-                            if full_len_transcripts_Gag_bound[i,j,k,l] > 0:
-                                if j == 0:
-                                    tempRand = np.sum(sampling_values < rate_SL2_binding)
-                                    delta_Gag = np.min([tempRand, proteins_cyt[Proteins.index['Gag']]])
-                                    full_len_transcripts_Gag_bound[i,1,k,l] += delta_Gag
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= delta_Gag
-                                    proteins_cyt[Proteins.index['Gag']] -= delta_Gag
-                                elif j == 1:
-                                    tempRand = np.sum(sampling_values < self.GAGNC_DISS_RATE)
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= tempRand
-                                    full_len_transcripts_Gag_bound[i,0,k,l] += tempRand
-                                    proteins_cyt[Proteins.index['Gag']] += tempRand
-
-                            if full_len_transcripts_Gag_bound[i,j,k,l] > 0:
-                                if k == 0:
-                                    tempRand = np.sum(sampling_values < rate_SL3_binding)
-                                    delta_Gag = np.min([tempRand, proteins_cyt[Proteins.index['Gag']]])
-                                    full_len_transcripts_Gag_bound[i,j,1,l] += delta_Gag
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= delta_Gag
-                                    proteins_cyt[Proteins.index['Gag']] -= delta_Gag
-                                elif k == 1:
-                                    tempRand = np.sum(sampling_values < self.GAGNC_DISS_RATE)
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= tempRand
-                                    full_len_transcripts_Gag_bound[i,j,0,l] += tempRand
-                                    proteins_cyt[Proteins.index['Gag']] += tempRand
-
-                            if full_len_transcripts_Gag_bound[i,j,k,l] > 0:                                    
-                                if l == 0:
-                                    tempRand = np.sum(sampling_values < rate_SL4_binding)
-                                    delta_Gag = np.min([tempRand, proteins_cyt[Proteins.index['Gag']]])
-                                    full_len_transcripts_Gag_bound[i,j,k,1] += delta_Gag
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= delta_Gag
-                                    proteins_cyt[Proteins.index['Gag']] -= delta_Gag
-                                elif l == 1:
-                                    tempRand = np.sum(sampling_values < self.GAGNC_DISS_RATE)
-                                    full_len_transcripts_Gag_bound[i,j,k,l] -= tempRand
-                                    full_len_transcripts_Gag_bound[i,j,k,0] += tempRand
-                                    proteins_cyt[Proteins.index['Gag']] += tempRand                                                                                                              
+            proteins_cyt[Proteins.index['Gag']] = self.bind_SL_sites(Gag_bound_bins, binding_rates, proteins_cyt[Proteins.index['Gag']])
 
         def process_cyt_proteins():
             bins_of_interest = [(1,0,0,0), (0,1,0,0), (0,0,1,0), (0,0,0,1)]
-            rate_SL1_binding = binding_rates_dict['SL1_site']
-            rate_SL2_binding = binding_rates_dict['SL2_site']
-            rate_SL3_binding = binding_rates_dict['SL3_site']
-            rate_SL4_binding = binding_rates_dict['SL4_site']            
-            rate_dict = {(1,0,0,0): rate_SL1_binding, (0,1,0,0): rate_SL2_binding, (0,0,1,0): rate_SL3_binding, (0,0,0,1): rate_SL4_binding}
+            rate_dict = dict(zip(bins_of_interest, binding_rates))
             for i in range(9):
                 for bin in bins_of_interest:
-                    tempRand = np.sum(np.random.rand(full_len_transcripts_cyt[i]) < rate_dict[bin])
+                    tempRand = binomial_thinning(full_len_transcripts_cyt[i], rate_dict[bin], self.random_state, self.HYBRID_THRESHOLD)
                     delta_num_of_transcripts = np.min([tempRand, proteins_cyt[Proteins.index['Gag']]])
                     full_len_transcripts_Gag_bound[bin] += delta_num_of_transcripts
                     full_len_transcripts_cyt[i] -= delta_num_of_transcripts
@@ -306,7 +293,7 @@ class Packaging(Process):
             Gag_concentration = (proteins_cyt[Proteins.index['Gag']])/(self.VOLUME_CYTOPLASM*.001) #molecules/m^3
             rate_of_Gag_Gag_collision = (float(1)/2)*(math.pi)*(self.GAG_DIAMETER**2)*(2**(float(1)/2))*(self.GAG_VELOCITY)*(Gag_concentration**2)
             #print(rate_of_Gag_Gag_collision)
-            tempRand = np.random.poisson(proteins_cyt[Proteins.index['Gag']]*rate_of_Gag_Gag_collision) #number of collisions in timestep
+            tempRand = self.random_state.poisson(proteins_cyt[Proteins.index['Gag']]*rate_of_Gag_Gag_collision) #number of collisions in timestep
             if (tempRand*2)<=proteins_cyt[Proteins.index['Gag']]:
                 dimers_made = tempRand
             else:
@@ -315,15 +302,27 @@ class Packaging(Process):
             proteins_cyt[Proteins.index['Gag_dimers']] += dimers_made
 
         def Gag_and_Gag_dimer_diffusion():
-            tempRand = np.sum(np.random.rand(proteins_cyt[Proteins.index['Gag']])<self.GAG_DIFFUSION_PROB)
+            tempRand = binomial_thinning(proteins_cyt[Proteins.index['Gag']], self.GAG_DIFFUSION_PROB, self.random_state, self.HYBRID_THRESHOLD)
             proteins_cyt[Proteins.index['Gag']] -= tempRand
             proteins_mem[Proteins.index['Gag']] += tempRand 
-            tempRand = np.sum(np.random.rand(proteins_cyt[Proteins.index['Gag_dimers']])<self.GAG_DIMER_DIFFUSION_PROB)
+            tempRand = binomial_thinning(proteins_cyt[Proteins.index['Gag_dimers']], self.GAG_DIMER_DIFFUSION_PROB, self.random_state, self.HYBRID_THRESHOLD)
             proteins_cyt[Proteins.index['Gag_dimers']] -= tempRand
             proteins_mem[Proteins.index['Gag_dimers']] += tempRand
 
         def dimerize_gagbound_transcripts():
-            tempRand = np.sum(np.random.rand(np.floor(full_len_transcripts_Gag_bound[1,1,1,:].sum()/float(2))) < self.PROB_GAG_BOUND_RNA_DIMERS)
+            tempRand = binomial_thinning(np.floor(full_len_transcripts_Gag_bound[1,1,1,:].sum()/float(2)), self.PROB_GAG_BOUND_RNA_DIMERS, self.random_state, self.HYBRID_THRESHOLD)
+
+            #In a mean-field simulation the expected dimers take transcripts with and without SL4 bound in
+            #proportion, and make a progeny each time they add up to a whole dimer (see mainaux/MeanField.py)
+            if is_mean_field(self.random_state):
+                prob_SL4_Gag = float(full_len_transcripts_Gag_bound[1,1,1,1])/full_len_transcripts_Gag_bound[1,1,1,:].sum()
+                full_len_transcripts_Gag_bound[1,1,1,1] -= 2*tempRand*prob_SL4_Gag
+                full_len_transcripts_Gag_bound[1,1,1,0] -= 2*tempRand*(1 - prob_SL4_Gag)
+                self.expected_dimers += tempRand
+                while self.expected_dimers >= 1:
+                    self.viral_progeny_container.create_progeny(6 + 2*prob_SL4_Gag, timestep)
+                    self.expected_dimers -= 1
+                return
 
             while tempRand > 0:
                 Gag_index = 0
@@ -336,7 +335,7 @@ class Packaging(Process):
                     elif prob_SL4_Gag == 0:
                         full_len_transcripts_Gag_bound[1,1,1,0] -= 1
                     else: # guaranteed at least 1 empty SL4 Gag, 1 nonempty SL4 Gag
-                        if np.random.rand()<prob_SL4_Gag:
+                        if self.random_state.rand()<prob_SL4_Gag:
                             full_len_transcripts_Gag_bound[1,1,1,1] -= 1
                             Gag_index += 1
                         else:
@@ -378,6 +377,9 @@ class Packaging(Process):
             # rate_SL3_binding = (long(self.BINDING_CONSTANT_SL3) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * self.VOLUME_CYTOPLASM)
             # rate_SL4_binding = (long(self.BINDING_CONSTANT_SL4) * long(proteins_cyt[Proteins.index['Gag']]))/(long(self.AVOGADRO_NUM) * self.VOLUME_CYTOPLASM)
             # print(rate_SL1_binding, rate_SL2_binding, rate_SL3_binding, rate_SL4_binding)
+            # the binding rates are only needed here
+            binding_rates = gen_binding_rates()
+
             #First calculate SL binding in the 4D matrix
             process_SL_site()
 
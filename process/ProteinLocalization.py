@@ -43,8 +43,11 @@ from mainaux.InitParamValues import *
 
 #This is a Process Class
 class ProteinLocalization(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
@@ -57,6 +60,14 @@ class ProteinLocalization(Process):
         self.PROB_TAT_SHUTTLING_IN = param_dict['PROB_TAT_SHUTTLING_IN'] #1/min #Kim/Yin 2005
                 
 
+    # Only Rev and Tat shuttle
+    def has_work(self):
+        protein_state = self.state.get_state('proteins')
+        for index in [Proteins.index['Rev'], Proteins.index['Tat']]:
+            if protein_state.proteins_cyt[index] != 0 or protein_state.proteins_nuc[index] != 0:
+                return True
+        return False
+
     def evolve_state(self, timestep):
         #Rev Binding Timescale:
         #The rev binding and dissociating rates are very fast, and I am unable to see reasonable dynamics 
@@ -74,10 +85,10 @@ class ProteinLocalization(Process):
         
         #Rev Shuttling
         #Arbirary assumption of a poisson distribution
-        Rev_shuttling_in = np.min([np.random.poisson(proteins_cyt[Proteins.index['Rev']]*self.PROB_REV_SHUTTLING_IN), proteins_cyt[Proteins.index['Rev']]])
+        Rev_shuttling_in = np.min([self.random_state.poisson(proteins_cyt[Proteins.index['Rev']]*self.PROB_REV_SHUTTLING_IN), proteins_cyt[Proteins.index['Rev']]])
         proteins_cyt[Proteins.index['Rev']]=proteins_cyt[Proteins.index['Rev']]-Rev_shuttling_in
         proteins_nuc[Proteins.index['Rev']]=proteins_nuc[Proteins.index['Rev']]+Rev_shuttling_in
-        Rev_shuttling_out = np.min([np.random.poisson(proteins_nuc[Proteins.index['Rev']]*self.PROB_REV_SHUTTLING_OUT), proteins_nuc[Proteins.index['Rev']]])
+        Rev_shuttling_out = np.min([self.random_state.poisson(proteins_nuc[Proteins.index['Rev']]*self.PROB_REV_SHUTTLING_OUT), proteins_nuc[Proteins.index['Rev']]])
         proteins_cyt[Proteins.index['Rev']]=proteins_cyt[Proteins.index['Rev']]+Rev_shuttling_out
         proteins_nuc[Proteins.index['Rev']]=proteins_nuc[Proteins.index['Rev']]-Rev_shuttling_out
         ####This may be super inefficient
@@ -90,11 +101,11 @@ class ProteinLocalization(Process):
         
         #Tat Shuttling
         #Arbirary assumption of a poisson distribution
-        Tat_shuttling_in = np.min([np.random.poisson(proteins_cyt[Proteins.index['Tat']]*self.PROB_TAT_SHUTTLING_IN), proteins_cyt[Proteins.index['Tat']]])
+        Tat_shuttling_in = np.min([self.random_state.poisson(proteins_cyt[Proteins.index['Tat']]*self.PROB_TAT_SHUTTLING_IN), proteins_cyt[Proteins.index['Tat']]])
         proteins_cyt[Proteins.index['Tat']]=proteins_cyt[Proteins.index['Tat']]-Tat_shuttling_in
         proteins_nuc[Proteins.index['Tat']]=proteins_nuc[Proteins.index['Tat']]+Tat_shuttling_in
         #Currently the shutling out probability is set to 0, so this code is commented out
-        Tat_shuttling_out = np.min([np.random.poisson(proteins_nuc[Proteins.index['Tat']]*self.PROB_TAT_SHUTTLING_OUT), proteins_nuc[Proteins.index['Tat']]])
+        Tat_shuttling_out = np.min([self.random_state.poisson(proteins_nuc[Proteins.index['Tat']]*self.PROB_TAT_SHUTTLING_OUT), proteins_nuc[Proteins.index['Tat']]])
         proteins_cyt[Proteins.index['Tat']]=proteins_cyt[Proteins.index['Tat']]+Tat_shuttling_out
         proteins_nuc[Proteins.index['Tat']]=proteins_nuc[Proteins.index['Tat']]-Tat_shuttling_out               
                     
@@ -33,10 +33,11 @@ unbinding from the full-length and singly-spliced mRNAs.
 """
 
 import numpy as np
-from scipy.integrate import odeint
+from scipy.integrate import odeint, ode
 from mainaux.Process import Process
 from state.Proteins import Proteins
 from mainaux.InitParamValues import *
+from mainaux.MeanField import is_mean_field
 
 # References:
 #1. Pond, S. J. K., Ridgeway, W. K., Robertson, R., Wang, J., & Millar, D. P. (2009). HIV-1 Rev protein assembles on viral RNA one molecule at a time. Proceedings of the National Academy of Sciences of the United States of America, 106(5), 1404–8. doi:10.1073/pnas.0807388106
@@ -45,10 +46,17 @@ from mainaux.InitParamValues import *
 
 #This is a Process Class
 class RevBinding(Process):
+    ODE_METHODS = ['Rev_ode', 'stacked_Rev_ode']
+    # A mean-field simulation need not resolve its expectations below a thousandth of a molecule
+    MEAN_FIELD_ATOL = 1e-3
+
     #Define static variables
     #MAX_REV_PER_TRANSCRIPT = 8; #Pond et al., 2009;  ###MAX_REV_PER_TRANSCRIPT = 12 #Kim and Yin 2005
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
@@ -87,6 +95,46 @@ class RevBinding(Process):
               R[6]*self.REV_DISSOCIATION_CONSTANTS[5]-R[5]*self.REV_BINDING_CONSTANTS_SCALED[5]*R[9]+
               R[7]*self.REV_DISSOCIATION_CONSTANTS[6]-R[6]*self.REV_BINDING_CONSTANTS_SCALED[6]*R[9])
         return [f0, f1, f2, f3, f4, f5, f6, f7, f8, f9]
+
+    def stacked_Rev_ode(self, R, t):
+        #R holds one row per ODE system, laid out as in Rev_ode:
+        #R[:,0..MAX_REV_PER_TRANSCRIPT] = mRNA with 0..MAX_REV_PER_TRANSCRIPT Rev bound
+        #R[:,-1] = free Rev
+        MAX = self.MAX_REV_PER_TRANSCRIPT
+        R = R.reshape((-1, MAX+2))
+        mRNA = R[:,0:MAX+1]
+        free_Rev = R[:,-1:]
+        #net_Rev_released[:,i] = Rev released by mRNA with i+1 Rev - Rev bound by mRNA with i Rev
+        net_Rev_released = mRNA[:,1:]*self.REV_DISSOCIATION_CONSTANTS[0:MAX] - mRNA[:,0:MAX]*self.REV_BINDING_CONSTANTS_SCALED[0:MAX]*free_Rev
+        f = np.zeros_like(R)
+        f[:,0:MAX] += net_Rev_released
+        f[:,1:MAX+1] -= net_Rev_released
+        f[:,-1] = net_Rev_released[:,0:MAX-1].sum(1) #same terms as f9 in Rev_ode
+        return f.ravel()
+
+    def stacked_Rev_jacobian(self, R, t):
+        #Jacobian of stacked_Rev_ode in the banded layout of the scipy solvers, with MAX_REV_PER_TRANSCRIPT+1
+        #bands below and above the diagonal:
+        #J_banded[MAX_REV_PER_TRANSCRIPT+1 + i - j, j] = d stacked_Rev_ode(R)[i] / d R[j]
+        MAX = self.MAX_REV_PER_TRANSCRIPT
+        R = R.reshape((-1, MAX+2))
+        num_of_systems = R.shape[0]
+        #d_net_Rev_released[:,i,j] = d net_Rev_released[:,i] / d R[:,j] (see stacked_Rev_ode)
+        d_net_Rev_released = np.zeros((num_of_systems, MAX, MAX+2))
+        bins = np.arange(MAX)
+        d_net_Rev_released[:,bins,bins] = -self.REV_BINDING_CONSTANTS_SCALED[0:MAX]*R[:,-1:]
+        d_net_Rev_released[:,bins,bins+1] = self.REV_DISSOCIATION_CONSTANTS[0:MAX]
+        d_net_Rev_released[:,bins,-1] = -self.REV_BINDING_CONSTANTS_SCALED[0:MAX]*R[:,0:MAX]
+        J = np.zeros((num_of_systems, MAX+2, MAX+2))
+        J[:,0:MAX,:] += d_net_Rev_released
+        J[:,1:MAX+1,:] -= d_net_Rev_released
+        J[:,-1,:] = d_net_Rev_released[:,0:MAX-1,:].sum(1)
+        #place the blocks of the systems along the diagonal
+        [i, j] = np.indices((MAX+2, MAX+2))
+        offsets = (MAX+2)*np.arange(num_of_systems)[:,np.newaxis,np.newaxis]
+        J_banded = np.zeros((2*MAX+3, num_of_systems*(MAX+2)))
+        J_banded[np.broadcast_to(MAX+1 + i - j, J.shape), j + offsets] = J
+        return J_banded
         
     def ODE_discretizer(self, soln, prev_mRNA_abundances, prev_protein_abundances):
         #This function discretizes, mass balances, and ensures non-negative values of ODE solutions for integration with the rest of the system
@@ -103,7 +151,7 @@ class RevBinding(Process):
         # Mass balance handling (mRNA)
         while mRNA_after != mRNA_before:
             discrepancy = mRNA_after-mRNA_before # positive if mRNA_after > mRNA_before (mRNA was created, so need to remove mRNA from system)
-            temp_index = np.random.randint(self.MAX_REV_PER_TRANSCRIPT+1) # Randomly pick bins to adjust the discrepancy; results are from [0, arg).
+            temp_index = self.random_state.randint(self.MAX_REV_PER_TRANSCRIPT+1) # Randomly pick bins to adjust the discrepancy; results are from [0, arg).
             soln_round[temp_index]=soln_round[temp_index]-discrepancy # soln_round[temp_index]; want to bring Rev_mRNA_after to the value Rev_mRNA_before
             soln_round[soln_round<0]=0 # This is the reason why the while loop may run multiple times
             mRNA_after = np.sum(soln_round[0:-1])
@@ -137,7 +185,7 @@ class RevBinding(Process):
                 temp_counter = 0
                 while discrepancy != 0:
                     temp_counter += 1
-                    temp_index = np.random.randint(1,self.MAX_REV_PER_TRANSCRIPT+1) #randomly pick mRNA bin to adjust the discrepancy; only choose from bins with Rev binding != 0. That is, only pick mRNA bins with at least one Rev bounded.
+                    temp_index = self.random_state.randint(1,self.MAX_REV_PER_TRANSCRIPT+1) #randomly pick mRNA bin to adjust the discrepancy; only choose from bins with Rev binding != 0. That is, only pick mRNA bins with at least one Rev bounded.
                     if soln_round[temp_index]>0:
                         soln_round[temp_index] = soln_round[temp_index] - 1
                         soln_round[temp_index-1] = soln_round[temp_index-1] + 1
@@ -149,6 +197,34 @@ class RevBinding(Process):
         new_mRNA_abundances = soln_round[0:-1]
         return [new_mRNA_abundances, new_protein_abundances]
 
+    # Solves the ODE systems of all the mRNA types of a mean-field simulation at once and returns
+    # [new mRNA abundances of each type, net free Rev]
+    # The systems are stacked as in BatchRevBinding, so the Jacobian is banded, and solved with the
+    # BDF method, which takes fewer evaluations than odeint for these stiff systems. The state holds
+    # expectations (see mainaux/MeanField.py), so the solution at the end of the timestep is taken
+    # as it is, without discretizing it
+    def solve_mean_field(self, mRNA_abundances, bindable_Rev, t_seg_Rev):
+        MAX = self.MAX_REV_PER_TRANSCRIPT
+        R = np.concatenate((np.array(mRNA_abundances), np.array(bindable_Rev)[:,np.newaxis]), 1)
+        #vode takes its arguments in the order (t, y)
+        solver = ode(lambda t, y: self.stacked_Rev_ode(y, t), lambda t, y: self.stacked_Rev_jacobian(y, t))
+        solver.set_integrator('vode', method='bdf', lband=MAX+1, uband=MAX+1, atol=self.MEAN_FIELD_ATOL)
+        solver.set_initial_value(R.ravel(), t_seg_Rev[0])
+        soln_end = np.maximum(solver.integrate(t_seg_Rev[-1]).reshape(R.shape), 0)
+        return [list(soln_end[:,0:-1]), np.sum(soln_end[:,-1])]
+
+    # Rev allocated to mRNAs that make up mRNA_fraction of the bindable mRNAs; rounded down to whole
+    # molecules except in a mean-field simulation
+    def allocate_Rev(self, mRNA_fraction, Rev):
+        if is_mean_field(self.random_state):
+            return mRNA_fraction*Rev
+        return np.floor(mRNA_fraction*Rev)
+
+    # Without transcripts in the nucleus the ODEs leave every amount as is
+    def has_work(self):
+        mRNA_state = self.state.get_state('mRNAs')
+        return np.any(mRNA_state.full_len_transcripts_nuc) or np.any(mRNA_state.single_splice_transcript_nuc)
+
     def evolve_state(self, timestep):
         #Rev Binding Timescale:
         #The rev binding and dissociating rates are very fast, and I am unable to see reasonable dynamics 
@@ -173,41 +249,36 @@ class RevBinding(Process):
         #((Total Rev)/(Total mRNA))*(Abindance of given mRNA)
         #Bindable Rev 
         bindable_mRNA_sum = np.sum([np.sum(full_len_transcripts_nuc[0:8]), np.sum(single_splice_transcript_nuc[0:56])])
-        bindable_Rev_sum = 0 #will hold the total amount of Rev that we allow the mRNAs to see
         
         #TODO come up with something to add noise to this allocation
         
-        
-        #Start with full length transcripts
-        # initial ode conditions
-        if np.sum(full_len_transcripts_nuc[0:8]) == 0:
-            bindable_Rev = 0
-        else:
-            bindable_Rev = np.floor(np.divide(np.sum(full_len_transcripts_nuc[0:8]), bindable_mRNA_sum)*proteins_nuc[Proteins.index['Rev']])
-            # (sum of all the bindable full len mRNAs)/(sum of all the bindable mRNAs)*# of Rev in the nucleus
-        bindable_Rev_sum = bindable_Rev_sum + bindable_Rev
-        R = np.concatenate((full_len_transcripts_nuc, np.array([bindable_Rev])),0)
+        #Full length transcripts first, then Singly Spliced
+        #mRNA_abundances[0] = full length transcripts, mRNA_abundances[i+1] = single-spliced form i
+        mRNA_abundances = [full_len_transcripts_nuc] + [single_splice_transcript_nuc[np.arange(i,57+i,7)] for i in range(7)]
+        bindable_Rev = [] #the amount of Rev that we allow each type of mRNA to see
+        for mRNA_abundance in mRNA_abundances:
+            if np.sum(mRNA_abundance[0:8]) == 0:
+                bindable_Rev.append(0)
+            else:
+                bindable_Rev.append(self.allocate_Rev(np.divide(np.sum(mRNA_abundance[0:8]), bindable_mRNA_sum), proteins_nuc[Proteins.index['Rev']]))
+                # (sum of the bindable mRNAs of this type)/(sum of all the bindable mRNAs)*# of Rev in the nucleus
+        bindable_Rev_sum = np.sum(bindable_Rev)
+
         t_seg_Rev  = np.linspace(0, 59, 60)
-        soln = odeint(self.Rev_ode, R, t_seg_Rev)
-        #discretize, mass balance
-        [full_len_transcripts_nuc, net_Rev] = self.ODE_discretizer(soln, full_len_transcripts_nuc, bindable_Rev)
-           
-        #Next Singly Spliced
+        if is_mean_field(self.random_state):
+            [mRNA_abundances, net_Rev] = self.solve_mean_field(mRNA_abundances, bindable_Rev, t_seg_Rev)
+        else:
+            net_Rev = 0
+            for i in range(8):
+                # initial ode conditions
+                R = np.concatenate((mRNA_abundances[i], np.array([bindable_Rev[i]])),0)
+                soln = odeint(self.Rev_ode, R, t_seg_Rev)
+                #discretize, mass balance
+                [mRNA_abundances[i], temp_Rev] = self.ODE_discretizer(soln, mRNA_abundances[i], bindable_Rev[i])
+                net_Rev = net_Rev + temp_Rev
+        full_len_transcripts_nuc = mRNA_abundances[0]
         for i in range(7):
-            if np.sum(single_splice_transcript_nuc[np.arange(i,50+i,7)]) == 0:
-                bindable_Rev = 0
-            else:
-                bindable_Rev = np.floor(np.divide(np.sum(single_splice_transcript_nuc[np.arange(i,50+i,7)]), bindable_mRNA_sum)*proteins_nuc[Proteins.index['Rev']])
-            bindable_Rev_sum = bindable_Rev_sum + bindable_Rev
-            # initial ode conditions
-            single_spliced_current = single_splice_transcript_nuc[np.arange(i,57+i,7)]
-            R = np.concatenate((single_spliced_current, np.array([bindable_Rev])),0)
-            t_seg_Rev  = np.linspace(0, 59, 60)
-            soln = odeint(self.Rev_ode, R, t_seg_Rev)
-            #discretize, mass balance
-            [single_spliced_current, temp_Rev] = self.ODE_discretizer(soln, single_spliced_current, bindable_Rev)
-            single_splice_transcript_nuc[np.arange(i,57+i,7)] = np.int32(single_spliced_current)
-            net_Rev = net_Rev + temp_Rev
+            single_splice_transcript_nuc[np.arange(i,57+i,7)] = mRNA_abundances[i+1]
             
         proteins_nuc[Proteins.index['Rev']] = (proteins_nuc[Proteins.index['Rev']]-bindable_Rev_sum) + net_Rev  #first term accounts for rounding in allocation. Not all Rev may have been made available for binding               
                     
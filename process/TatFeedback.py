@@ -39,6 +39,7 @@ import numpy as np
 from scipy.integrate import odeint
 from mainaux.Process import Process
 from mainaux.InitParamValues import *
+from mainaux.MeanField import is_mean_field
 
 #References:
 #1. Weinberger, L.S., Burnett, J.C., Toettcher, J.E., Arkin, A.P., Schaffer, D.V. (2005). Stochastic Gene Expression in a Lentiviral Positive-Feedback Loop: HIV-1 Tat Fluctuations Drive Phenotypic Diversity. Cell 122: 169-182. 
@@ -46,8 +47,13 @@ from mainaux.InitParamValues import *
 
 #This is a Process Class
 class TatFeedback(Process):
-    def __init__(self, state, param_dict=None):
+    ODE_METHODS = ['TatODE']
+
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();  
@@ -92,7 +98,7 @@ class TatFeedback(Process):
             temp_counter +=1
             discrepancy = Tat_after-Tat_before # positive if Tat_after > Tat_before (Tat was created, so need to remove Tat from system)
             array_of_indices_of_interest = [0,2,3]
-            temp_index = array_of_indices_of_interest[np.random.randint(0,3)] #randomly pick bins to adjust the discrepancy
+            temp_index = array_of_indices_of_interest[self.random_state.randint(0,3)] #randomly pick bins to adjust the discrepancy
             soln_round[temp_index]=soln_round[temp_index]-discrepancy
             soln_round[soln_round<0]=0
             Tat_after = np.sum(soln_round[np.array([0,2,3])])
@@ -142,7 +148,11 @@ class TatFeedback(Process):
         #soln = matplotlib.mlab.rk4(TatODE, y0, tsegTat)
         
         #Accounting and discretizing and mass balance
-        [free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl] =  self.ODE_discretizer(soln, proteins_nuc[2], pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl)
+        #(a mean-field simulation holds expectations, which need not be whole numbers, see mainaux/MeanField.py)
+        if is_mean_field(self.random_state):
+            [free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl] = np.maximum(soln[-1,0:4], 0)
+        else:
+            [free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl] =  self.ODE_discretizer(soln, proteins_nuc[2], pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl)
         proteins_nuc[2] = free_Tat
 
         Tat_derived_transcription_rate = np.max([0, soln[-1,4]]) #allow no negatives
@@ -160,6 +170,13 @@ class TatFeedback(Process):
         host_factor_state.Tat_pTEFb_deacetyl = Tat_pTEFb_deacetyl # Update the pTEFb deacetyl value
         host_factor_state.Tat_pTEFb_acetyl = Tat_pTEFb_acetyl # Update the pTEFb acetyl value
         reaction_rate_state.Tat_derived_transcription_rate = Tat_derived_transcription_rate       
+
+    # Used to fast-forward through timesteps without any Tat (see Simulation.fast_forward),
+    # where the ODEs leave every amount as is and only pTEFb is replenished
+    # Adds the pTEFb evolve_state would have added over num_of_timesteps timesteps starting at timestep
+    def replenish_pTEFb(self, timestep, num_of_timesteps):
+        host_factor_state = self.state.get_state('host_factors')
+        host_factor_state.pTEFb_nuc = host_factor_state.pTEFb_nuc + np.around(self.pTEFb_NUC_INIT*np.exp(self.pTEFb_DOUBLING_RATE*(timestep+num_of_timesteps))) - np.around(self.pTEFb_NUC_INIT*np.exp(self.pTEFb_DOUBLING_RATE*(timestep)))
         
         #update state to new values
         #self.state.set_state('proteins', protein_state)
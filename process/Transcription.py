@@ -31,21 +31,28 @@ from mainaux.State import State
 from mainaux.Process import Process
 from process.processaux.IntegrationSiteEffects import IntegrationSiteEffects
 from mainaux.InitParamValues import *
+from mainaux.MeanField import is_mean_field
 
 #References:
 #1. Kim, H., Yin, J. (2005) In silico mutagenesis of RNA Splicing in HIV-1. Biotechnology and bioengineering 91: 877-893.
 
 #This is a Process Class
 class Transcription(Process):
-    def __init__(self, state, param_dict=None):
+    # promoter constants may be drawn per simulation (integration site effects), and
+    # Tat feedback can lock the promoter on
+    CHECKPOINT_ATTRIBUTES = ['PROMOTER_ON_RATE', 'PROMOTER_OFF_RATE', 'BASAL_TRANSCRIPTION_RATE', 'PROMOTER_ALWAYS_ON', 'ACTUAL_TRANSCRIPTION_RATE']
+
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
                 
         #User Option
-        self.turn_integration_site_effects_on = 0 #0 for off, 1 for on   
-        #TODO: move the toggle to this option in simulation or runSimulation, where easier for user to specify
+        self.turn_integration_site_effects_on = param_dict['INTEGRATION_SITE_EFFECTS'] #0 for off, 1 for on
 
         #Constant parameters
         self.MAX_TAT_ENHANCEMENT = param_dict['MAX_TAT_ENHANCEMENT'] #100x the Basal Rate #Kim et al.        
@@ -58,7 +65,7 @@ class Transcription(Process):
         
         if self.turn_integration_site_effects_on == 1:
             self.IntegrationSiteEffects = IntegrationSiteEffects()
-            [self.PROMOTER_ON_RATE, self.PROMOTER_OFF_RATE, self.BASAL_TRANSCRIPTION_RATE] = self.IntegrationSiteEffects.initialize_constants()
+            [self.PROMOTER_ON_RATE, self.PROMOTER_OFF_RATE, self.BASAL_TRANSCRIPTION_RATE] = self.IntegrationSiteEffects.initialize_constants(self.random_state, param_dict['INTEGRATION_SITE_CLONE'])
 
         self.PROMOTER_ALWAYS_ON = False
         self.ACTUAL_TRANSCRIPTION_RATE = self.BASAL_TRANSCRIPTION_RATE
@@ -150,12 +157,16 @@ class Transcription(Process):
 
         # Case where Tat_derived_transcription_rate <= self.THRESH_TAT_FEEDBACK (did not reach threshold rate yet)
         # Assign the value of promoter_activity here
+        # In a mean-field simulation promoter_activity is the probability that the promoter is on
+        # (see mainaux/MeanField.py)
         if self.PROMOTER_ALWAYS_ON == False:
-            if promoter_activity == 0:
-                if np.random.rand() < self.PROMOTER_ON_RATE:
+            if is_mean_field(self.random_state):
+                promoter_activity = promoter_activity + (1 - promoter_activity)*self.PROMOTER_ON_RATE - promoter_activity*self.PROMOTER_OFF_RATE
+            elif promoter_activity == 0:
+                if self.random_state.rand() < self.PROMOTER_ON_RATE:
                     promoter_activity = 1
             else: # promoter_activity == 1 at the beginning of this timestep
-                if np.random.rand() < self.PROMOTER_OFF_RATE:
+                if self.random_state.rand() < self.PROMOTER_OFF_RATE:
                     promoter_activity = 0            
 
         # Deal with what happens if derived rate is greater than basal rate
@@ -171,19 +182,43 @@ class Transcription(Process):
             self.ACTUAL_TRANSCRIPTION_RATE = self.THRESH_TAT_FEEDBACK *self.MAX_TAT_ENHANCEMENT
 
         # Deal with the actual creation of mRNA
-        if promoter_activity == 1 or self.PROMOTER_ALWAYS_ON:
+        if is_mean_field(self.random_state):
+            tempValue = promoter_activity*self.ACTUAL_TRANSCRIPTION_RATE
+            full_len_transcripts_nuc[0] = full_len_transcripts_nuc[0] + tempValue
+            transcripts_synthesized = transcripts_synthesized + tempValue
+        elif promoter_activity == 1 or self.PROMOTER_ALWAYS_ON:
             if self.ACTUAL_TRANSCRIPTION_RATE < 1:
-                if np.random.rand() < self.ACTUAL_TRANSCRIPTION_RATE:
+                if self.random_state.rand() < self.ACTUAL_TRANSCRIPTION_RATE:
                     full_len_transcripts_nuc[0] += 1
                     transcripts_synthesized += 1
             else:
-                tempValue = np.random.poisson(self.ACTUAL_TRANSCRIPTION_RATE)
+                tempValue = self.random_state.poisson(self.ACTUAL_TRANSCRIPTION_RATE)
                 full_len_transcripts_nuc[0] = full_len_transcripts_nuc[0] + tempValue
                 transcripts_synthesized = transcripts_synthesized + tempValue
 
         # write back parameters to state object
         DNA_state.promoter_activity = promoter_activity
         mRNA_state.transcripts_synthesized = transcripts_synthesized
+
+    # Used to fast-forward through timesteps where the promoter is off and there is no Tat
+    # (see Simulation.fast_forward): in each of them, evolve_state only draws one random
+    # number to decide whether the promoter turns on
+    # Returns how many of the next max_timesteps timesteps the promoter stays off for, and
+    # draws exactly the random numbers evolve_state would have drawn in those timesteps,
+    # so the simulation continues as if it had been run timestep by timestep
+    def draw_promoter_off_timesteps(self, max_timesteps):
+        num_of_timesteps = 0
+        while num_of_timesteps < max_timesteps:
+            chunk_size = min(1024, max_timesteps - num_of_timesteps)
+            prev_random_state = self.random_state.get_state()
+            promoter_on_timesteps = np.nonzero(self.random_state.rand(chunk_size) < self.PROMOTER_ON_RATE)[0]
+            if len(promoter_on_timesteps) > 0:
+                # rewind, and only draw the numbers of the timesteps before the promoter turns on
+                self.random_state.set_state(prev_random_state)
+                self.random_state.rand(promoter_on_timesteps[0])
+                return num_of_timesteps + promoter_on_timesteps[0]
+            num_of_timesteps += chunk_size
+        return num_of_timesteps
         
         #update state to new values
         #self.state.set_state('mRNAs', mRNA_state)
@@ -46,6 +46,7 @@ from mainaux.Process import Process
 from process.RevBinding import RevBinding
 from state.Proteins import Proteins
 from mainaux.InitParamValues import *
+from mainaux.StochasticKernels import binomial_thinning
 
 #References:
 #1. Kim, H., Yin, J. (2005) In silico mutagenesis of RNA Splicing in HIV-1. Biotechnology and bioengineering 91: 877-893.
@@ -53,8 +54,11 @@ from mainaux.InitParamValues import *
 
 #This is a Process Class
 class Translation(Process):
-    def __init__(self, state, param_dict=None):
+    def __init__(self, state, param_dict=None, random_state=None):
         self.state = state
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by this process
 
         if param_dict==None:
             param_dict = generate_param_dict();
@@ -65,6 +69,35 @@ class Translation(Process):
         self.FREQ_TRANSLATION_IRES = param_dict['FREQ_TRANSLATION_IRES'] #proteins/min #fittable parameter, not found in literature
         self.MAX_REV_PER_TRANSCRIPT = param_dict['MAX_REV_PER_TRANSCRIPT']
         self.FREQ_GAG_PRO_POL_TRANSLATION = param_dict['FREQ_GAG_PRO_POL_TRANSLATION'] #fraction of time a full length transcript with be translated to Gag/Pro/Pol rather than Gag #Coffin et al. 1997
+        self.HYBRID_THRESHOLD = param_dict['HYBRID_THRESHOLD']
+
+        #Every mRNA bin codes for a single protein, so the transcript->protein map is stored as the index
+        #(in Proteins.index) of the protein of each bin
+        index = Proteins.index
+        self.SINGLE_SPLICE_PROTEIN_INDEXES = np.zeros((7*(self.MAX_REV_PER_TRANSCRIPT+1)), int)
+        for i in range(7*(self.MAX_REV_PER_TRANSCRIPT+1)):
+            j = i % 7
+            if j>=3:
+                self.SINGLE_SPLICE_PROTEIN_INDEXES[i] = index['Env'] #Env
+            else:
+                self.SINGLE_SPLICE_PROTEIN_INDEXES[i] = j #Vif, Vpr, Tat
+        self.MULTI_SPLICE_PROTEIN_INDEXES = np.zeros((17), int)
+        for j in range(17):
+            if j==0:
+                self.MULTI_SPLICE_PROTEIN_INDEXES[j] = index['Vif'] #Vif
+            elif j==1 or j==7 or j==12:
+                self.MULTI_SPLICE_PROTEIN_INDEXES[j] = index['Tat'] #Tat
+            elif j==5 or j==11 or j==16:
+                self.MULTI_SPLICE_PROTEIN_INDEXES[j] = index['Nef'] #Nef
+            elif j==6:
+                self.MULTI_SPLICE_PROTEIN_INDEXES[j] = index['Vpr'] #Vpr
+            else:
+                self.MULTI_SPLICE_PROTEIN_INDEXES[j] = index['Rev'] #Rev
+
+    # Only transcripts in the cytoplasm are translated
+    def has_work(self):
+        mRNA_state = self.state.get_state('mRNAs')
+        return np.any(mRNA_state.single_splice_transcript_cyt) or np.any(mRNA_state.multi_splice_transcript_cyt) or np.any(mRNA_state.full_len_transcripts_cyt)
 
     def evolve_state(self, timestep):
         #Rev Binding Timescale:
@@ -95,39 +128,26 @@ class Translation(Process):
             translation_frequency = self.FREQ_TRANSLATION
         
         #assuming abundance of translation machinery
-        for j in range(7): #Single splice
-            for i in np.arange(0+j,(7*self.MAX_REV_PER_TRANSCRIPT)+1+j,7):
-                tempRand = np.sum(np.random.poisson(translation_frequency, single_splice_transcript_cyt[i])) #determine num of translation events per transcript
-                if j>=3:
-                    proteins_cyt[index['Env']]=proteins_cyt[index['Env']]+tempRand #Env
-                else:
-                    proteins_cyt[j]=proteins_cyt[j]+tempRand #Vif, Vpr, Tat
-
-        for j in range(np.size(multi_splice_transcript_cyt)): #multi splice
-            tempRand = np.sum(np.random.poisson(translation_frequency, multi_splice_transcript_cyt[j])) #determine num of translation events per transcript
-            if j==0:
-                proteins_cyt[index['Vif']]=proteins_cyt[index['Vif']]+tempRand #Vif
-            elif j==1 or j==7 or j==12:
-                proteins_cyt[index['Tat']]=proteins_cyt[index['Tat']]+tempRand #Tat
-            elif j==5 or j==11 or j==16:
-                proteins_cyt[index['Nef']]=proteins_cyt[index['Nef']]+tempRand #Nef
-            elif j==6:
-                proteins_cyt[index['Vpr']]=proteins_cyt[index['Vpr']]+tempRand #Vpr
-            else:
-                proteins_cyt[index['Rev']]=proteins_cyt[index['Rev']]+tempRand #Rev
-
-        for j in range(np.size(full_len_transcripts_cyt)): #full
-            tempRand = np.sum(np.random.poisson(translation_frequency, full_len_transcripts_cyt[j]))
-            #if regular 5'cap based translation is suppressed, then HIV-1 IRES can ensure synthesis of Gag/Pol. 
-            #Unsure of the rate at which this occurs. 
-            if translation_suppressed == 1:            
-                tempRand = np.sum(np.random.poisson(self.FREQ_TRANSLATION_IRES, full_len_transcripts_cyt[j]))
-            #If a full length transcript is ribeosome bound,
-            #there is a self.FREQ_GAG_PRO_POL_TRANSLATION chance of a frameshift at the STOP site for Gag,
-            #such that the STOP is passed over and the full length Gag/Pro/Pol is translated #Coffin et al. 
-            tempRand2 = (np.random.rand(tempRand)<self.FREQ_GAG_PRO_POL_TRANSLATION).sum()
-            proteins_cyt[index['Gag']]=proteins_cyt[index['Gag']]+tempRand-tempRand2 #Gag
-            proteins_cyt[index['GagProPol']]=proteins_cyt[index['GagProPol']]+tempRand2 #Gag
+        #The sum of a Poisson(translation_frequency) draw per transcript (the num of translation events per
+        #transcript) is drawn directly as one Poisson(# of transcripts * translation_frequency) draw per bin,
+        #and added to the protein coded by the bin
+        np.add.at(proteins_cyt, self.SINGLE_SPLICE_PROTEIN_INDEXES, self.random_state.poisson(single_splice_transcript_cyt*translation_frequency)) #Single splice
+        np.add.at(proteins_cyt, self.MULTI_SPLICE_PROTEIN_INDEXES, self.random_state.poisson(multi_splice_transcript_cyt*translation_frequency)) #multi splice
+
+        #full
+        #if regular 5'cap based translation is suppressed, then HIV-1 IRES can ensure synthesis of Gag/Pol. 
+        #Unsure of the rate at which this occurs. 
+        if translation_suppressed == 1:
+            full_len_frequency = self.FREQ_TRANSLATION_IRES
+        else:
+            full_len_frequency = translation_frequency
+        tempRand = self.random_state.poisson(np.sum(full_len_transcripts_cyt)*full_len_frequency)
+        #If a full length transcript is ribeosome bound,
+        #there is a self.FREQ_GAG_PRO_POL_TRANSLATION chance of a frameshift at the STOP site for Gag,
+        #such that the STOP is passed over and the full length Gag/Pro/Pol is translated #Coffin et al. 
+        tempRand2 = binomial_thinning(tempRand, self.FREQ_GAG_PRO_POL_TRANSLATION, self.random_state, self.HYBRID_THRESHOLD)
+        proteins_cyt[index['Gag']]=proteins_cyt[index['Gag']]+tempRand-tempRand2 #Gag
+        proteins_cyt[index['GagProPol']]=proteins_cyt[index['GagProPol']]+tempRand2 #Gag
                     
         #write back parameters to state object
         protein_state.protein_cyt = proteins_cyt
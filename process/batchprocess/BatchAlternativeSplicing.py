@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+This is the batched counterpart of process/AlternativeSplicing.py. Its
+evolve_state method is called at each timestep of a BatchSimulation.
+
+An instance of BatchAlternativeSplicing is initialized once per
+BatchSimulation with a BatchState as input. The states 'mRNAs' and 'proteins'
+are modified in this process, for every cell of the batch.
+
+Instead of drawing a random number per transcript, the number of transcripts
+spliced out of each bin is drawn as one binomial, and the spliced transcripts
+are split among the resulting splice forms with a multinomial draw. The
+single-spliced arrays are viewed as (cell, Rev bound, splice form) so that
+every bin of every cell is handled by the same array operation.
+
+Summary of the biology:
+See process/AlternativeSplicing.py
+"""
+
+import numpy as np
+from process.AlternativeSplicing import AlternativeSplicing
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import *
+
+#This is a Process Class
+class BatchAlternativeSplicing(AlternativeSplicing):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        AlternativeSplicing.__init__(self, state, param_dict, sampler.random_state)
+
+        self.PROB_F1_TO_F5 = cumulative_to_probabilities(self.CUMULATIVE_F1_TO_F5)
+        self.PROB_F3_TO_F5 = cumulative_to_probabilities(self.CUMULATIVE_F3_TO_F5)
+        #Rev bound transcripts (index = # of Rev bound) are spliced with a delay
+        self.DELAY_BY_REV_BOUND = np.ones((self.MAX_REV_PER_TRANSCRIPT+1)) * self.SPLICE_DELAY_FACTOR
+        self.DELAY_BY_REV_BOUND[0] = 0
+
+    def evolve_state(self, timestep):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_nuc = protein_state.proteins_nuc
+
+        mRNA_state = self.state.get_state('mRNAs')
+        full_len_transcripts_nuc = mRNA_state.full_len_transcripts_nuc
+        multi_splice_transcript_nuc = mRNA_state.multi_splice_transcript_nuc
+        #view of shape (cell, # of Rev bound, splice form)
+        single_splice_transcript_nuc = mRNA_state.single_splice_transcript_nuc.reshape((self.state.num_of_cells, self.MAX_REV_PER_TRANSCRIPT+1, 7))
+
+        ##########
+        #Splice 1#
+        ##########
+        #splice forms [0, 1, 2, 3, 6] = [A1 vif, A2 vpr, A3 tat, A4abc env, A5 env]
+        splice_forms = np.array([0, 1, 2, 3, 6])
+        amt_spliced = self.sampler.binomial(full_len_transcripts_nuc, self.PROB_SPLICE_FULL_TO_SINGLE*(1-self.DELAY_BY_REV_BOUND))
+        full_len_transcripts_nuc -= amt_spliced
+        single_splice_transcript_nuc[:,:,splice_forms] += multinomial_split(self.sampler, amt_spliced, self.PROB_F1_TO_F5)
+
+        #################
+        #Step4: Splice 2#
+        #################
+        #single spliced vif, vpr, tat, env, nef --> multi spliced [0, 6, 12, 13, 16]
+        #This splice event releases bound Rev molecules
+        amt_spliced = self.sampler.binomial(single_splice_transcript_nuc[:,:,splice_forms], (self.PROB_SPLICE_SINGLE_TO_MULTI*(1-self.DELAY_BY_REV_BOUND))[:,np.newaxis])
+        single_splice_transcript_nuc[:,:,splice_forms] -= amt_spliced
+        multi_splice_transcript_nuc[:,[0, 6, 12, 13, 16]] += amt_spliced.sum(1)
+        proteins_nuc[:,Proteins.index['Rev']] += (amt_spliced * np.arange(self.MAX_REV_PER_TRANSCRIPT+1)[:,np.newaxis]).sum(2).sum(1)
+
+        #################
+        #Step5: Splice 3#
+        #################
+        #vif multi splice --> [1, 2, 5] = [A3 tat, A4abc rev, A5 nef]
+        #vpr multi splice --> [7, 8, 11] = [A3 tat, A4abc rev, A5 nef]
+        amt_spliced = self.sampler.binomial(multi_splice_transcript_nuc[:,[0, 6]], self.PROB_VIF_THIRD_SPLICE)
+        multi_splice_transcript_nuc[:,[0, 6]] -= amt_spliced
+        amt_per_form = multinomial_split(self.sampler, amt_spliced, self.PROB_F3_TO_F5)
+        multi_splice_transcript_nuc[:,[1, 2, 5]] += amt_per_form[:,0,:]
+        multi_splice_transcript_nuc[:,[7, 8, 11]] += amt_per_form[:,1,:]
@@ -0,0 +1,54 @@
+"""
+This is the batched counterpart of process/Degradation.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchDegradation is initialized once per BatchSimulation with a
+BatchState as input. The states 'proteins' and 'mRNAs' are modified in this
+process, for every cell of the batch.
+
+The amount degraded from each bin is drawn as a binomial over all cells at
+once. Degradation of Rev-bound mRNAs releases the bound Rev, exactly as in
+Degradation.degrade.
+
+Summary of the biology:
+See process/Degradation.py
+"""
+
+import numpy as np
+from process.Degradation import Degradation
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+class BatchDegradation(Degradation):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        Degradation.__init__(self, state, param_dict, sampler.random_state)
+
+    # abundances: array of shape (num_of_cells, # of bins), updated in place
+    # Returns the number of released factors per cell (bin i holds i/num_constructs bound factors)
+    def degrade(self, deg_rate, abundances, num_constructs=None):
+        decrement_amount = self.sampler.binomial(abundances, deg_rate)
+        abundances -= decrement_amount
+        if num_constructs == None:
+            return None
+        return (decrement_amount * (np.arange(np.size(abundances, 1)) // num_constructs)).sum(1)
+
+    def evolve_state(self, timestep):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_nuc = protein_state.proteins_nuc
+        proteins_cyt = protein_state.proteins_cyt
+        mRNA_state = self.state.get_state('mRNAs')
+
+        Rev_index = Proteins.index['Rev']
+        proteins_nuc[:,Rev_index] += self.degrade(self.PROB_mRNA_DEG, mRNA_state.full_len_transcripts_nuc, 1)
+        proteins_cyt[:,Rev_index] += self.degrade(self.PROB_mRNA_DEG, mRNA_state.full_len_transcripts_cyt, 1)
+        proteins_nuc[:,Rev_index] += self.degrade(self.PROB_mRNA_DEG, mRNA_state.single_splice_transcript_nuc, 7)
+        proteins_cyt[:,Rev_index] += self.degrade(self.PROB_mRNA_DEG, mRNA_state.single_splice_transcript_cyt, 7)
+        self.degrade(self.PROB_mRNA_DEG, mRNA_state.multi_splice_transcript_nuc)
+        self.degrade(self.PROB_mRNA_DEG, mRNA_state.multi_splice_transcript_cyt)
+        self.degrade(self.PROB_PROTEIN_DEG_NUC, proteins_nuc)
+        self.degrade(self.PROB_PROTEIN_DEG_CYT, proteins_cyt)
+        self.degrade(self.PROB_PROTEIN_DEG_MEM, protein_state.proteins_mem)
@@ -0,0 +1,123 @@
+"""
+This is the batched counterpart of process/EnvProcessing.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchEnvProcessing is initialized once per BatchSimulation with
+a BatchState as input. The states 'proteins' and 'viral_progeny_container' are
+modified in this process, for every cell of the batch.
+
+Steps 1-6, 8 and 9 are drawn over all cells at once. Trimerization (step 7)
+and addition to virions (step 10) draw Env proteins without replacement, which
+is done with hypergeometric draws instead of one random number per Env.
+
+Summary of the biology:
+See process/EnvProcessing.py
+"""
+
+import numpy as np
+from process.EnvProcessing import EnvProcessing
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import *
+
+class BatchEnvProcessing(EnvProcessing):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        EnvProcessing.__init__(self, state, param_dict, sampler.random_state)
+
+    # Moves everything from env_misc[key1] to env_misc[key2] in the cells where the capacity
+    # of the step is not exceeded, and a capacity limited amount in the others
+    def saturating_transfer(self, env_misc, key1, key2, capacity):
+        amt_to_transfer = np.where(capacity >= env_misc[key1], env_misc[key1], roll_dice(self.sampler, env_misc[key1], capacity))
+        move_buckets(env_misc, key1, key2, amt_to_transfer)
+
+    def evolve_state(self, timestep, final_step=10, single_step=None):
+        protein_state = self.state.get_state('proteins')
+        proteins_cyt = protein_state.proteins_cyt
+        proteins_virion = protein_state.proteins_virion
+        env_misc = protein_state.env_misc
+        list_of_containers = self.state.get_state('viral_progeny_container')
+
+        env_misc['Env : cytoplasm'] = proteins_cyt[:,Proteins.index['Env']].copy()
+
+        #Step 1. Env proteins from the cytoplasm are brought into the ER
+        if (single_step == None and final_step >= 1) or (single_step == 1):
+            transfer_buckets(self.sampler, env_misc, 'Env : cytoplasm', 'Env : ER', self.rate_of_ER_localization)
+
+        #Step 2. Env proteins in the ER are glycosylated by oligosaccharyltransferase
+        if (single_step == None and final_step >= 2) or (single_step == 2):
+            rate_of_step = self.Oligosaccharyltransferase*self.rate_oligosaccharyltransferase
+            transfer_buckets(self.sampler, env_misc, 'Env : ER', 'Env : ER : G1', rate_of_step)
+
+        #Step 3. Env proteins in the ER are glycosylated by glucosidase I and II
+        if (single_step == None and final_step >= 3) or (single_step == 3):
+            self.saturating_transfer(env_misc, 'Env : ER : G1', 'Env : ER : G2', self.GlucosidaseI*self.rate_glucosidaseI)
+            self.saturating_transfer(env_misc, 'Env : ER : G2', 'Env : ER : G3', self.GlucosidaseII*self.rate_glucosidaseII)
+
+        #Step 4. Folding by Calnexin chaperone, then second glucosidase II reaction
+        if (single_step == None and final_step >= 4) or (single_step == 4):
+            transfer_buckets(self.sampler, env_misc, 'Env : ER : G3', 'Env : ER : G3 : folded', self.rate_Env_folding)
+            self.saturating_transfer(env_misc, 'Env : ER : G3 : folded', 'Env : ER : G4 : folded', self.GlucosidaseII*self.rate_glucosidaseII)
+
+        #Step 5. Transport to Golgi
+        if (single_step == None and final_step >= 5) or (single_step == 5):
+            transfer_buckets(self.sampler, env_misc, 'Env : ER : G4 : folded', 'Env : Golgi', self.rate_of_Golgi_localization)
+
+        #Step 6. Golgi glycosylation.
+        if (single_step == None and final_step >= 6) or (single_step == 6):
+            amt_transferred = transfer_buckets(self.sampler, env_misc, 'Env : Golgi', 'Env : Golgi : G5', self.rate_golgi_glycosylation)
+            amt_errored = roll_dice(self.sampler, amt_transferred, self.prob_golgi_glycosylation_error)
+            move_buckets(env_misc, 'Env : Golgi : G5', 'Env : Golgi : G5 : error', amt_errored)
+
+        #Step 7. Trimerization
+        #Each trimer takes 3 Envs without replacement from the pool of successful and errored Envs
+        #index of env_misc['Env : trimers'] is the # of successful Envs in trimer
+        if (single_step == None and final_step >= 7) or (single_step == 7):
+            total_Golgi_G5_Env = env_misc['Env : Golgi : G5'] + env_misc['Env : Golgi : G5 : error']
+            num_trimers_created = roll_dice(self.sampler, total_Golgi_G5_Env // 3, self.rate_trimerization)
+            for cell_index in np.where(num_trimers_created > 0)[0]:
+                num_of_trimers = num_trimers_created[cell_index]
+                num_of_successes = self.sampler.hypergeometric(env_misc['Env : Golgi : G5'][cell_index], env_misc['Env : Golgi : G5 : error'][cell_index], 3*num_of_trimers)
+                Env_in_trimers = np.concatenate((np.ones((num_of_successes), int), np.zeros((3*num_of_trimers - num_of_successes), int)))
+                successes_in_trimer = self.sampler.permutation(Env_in_trimers).reshape((-1, 3)).sum(1)
+                env_misc['Env : trimers'][cell_index] += np.bincount(successes_in_trimer, minlength=4)
+                env_misc['Env : Golgi : G5'][cell_index] -= num_of_successes
+                env_misc['Env : Golgi : G5 : error'][cell_index] -= 3*num_of_trimers - num_of_successes
+
+        #Step 8. Cleavage and non-covelent complexation
+        if (single_step == None and final_step >= 8) or (single_step == 8):
+            temp_rand = roll_dice(self.sampler, env_misc['Env : trimers'], self.rate_cleavage)
+            env_misc['Env : trimers : cleaved'] += temp_rand
+            env_misc['Env : trimers'] -= temp_rand
+
+        #Step 9. Membrane localization
+        if (single_step == None and final_step >= 9) or (single_step == 9):
+            cleaved = env_misc['Env : trimers : cleaved']
+            over_capacity = cleaved > self.rate_membrane_localization
+            tempRand = np.minimum(self.sampler.poisson(self.rate_membrane_localization*over_capacity), cleaved)
+            amt_localized = np.where(over_capacity, tempRand, cleaved)
+            env_misc['Env : trimers : membrane'] += amt_localized
+            env_misc['Env : trimers : cleaved'] -= amt_localized
+
+        #Step 10. Addition to Virons
+        #Each trimer added goes to a progeny picked uniformly at random
+        if (single_step == None and final_step >= 10) or (single_step == 10):
+            for cell_index, viral_progeny_container in enumerate(list_of_containers):
+                num_of_progeny = viral_progeny_container.count_progeny()
+                membrane_trimers = env_misc['Env : trimers : membrane'][cell_index]
+                if membrane_trimers.sum() > 0 and num_of_progeny > 0:
+                    num_trimers_to_bind_virons = min(self.sampler.poisson(self.rate_viron_incorporation), membrane_trimers.sum())
+                    trimers_bound = multivariate_hypergeometric(self.sampler, membrane_trimers, num_trimers_to_bind_virons)
+                    membrane_trimers -= trimers_bound
+                    successes_in_trimer = np.repeat(np.arange(4), trimers_bound)
+                    virons_to_bind = self.sampler.randint(0, num_of_progeny, np.size(successes_in_trimer))
+                    for num_of_successes, viron_to_bind in zip(successes_in_trimer, virons_to_bind):
+                        viral_progeny_container.list_of_progeny[viron_to_bind].update_num_of_Env_t(num_of_successes, 1)
+
+        # Write back to Env bucket in proteins_cyt
+        proteins_cyt[:,Proteins.index['Env']] = env_misc['Env : cytoplasm']
+        env_misc['Env : cytoplasm'] = np.zeros((self.state.num_of_cells), int) # 'Env : cytoplasm' is just a bin to play with for the duration of the process
+        for cell_index, viral_progeny_container in enumerate(list_of_containers):
+            if viral_progeny_container.count_progeny() > 0:
+                proteins_virion[cell_index,Proteins.index['Env']] = 3 * viral_progeny_container.count_num_of_Env_t_array().sum()
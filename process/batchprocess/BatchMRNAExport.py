@@ -0,0 +1,47 @@
+"""
+This is the batched counterpart of process/MRNAExport.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchMRNAExport is initialized once per BatchSimulation with a
+BatchState as input. Only the state 'mRNAs' is modified in this process, for
+every cell of the batch.
+
+The amount of each exportable mRNA bin that leaves the nucleus is drawn as a
+binomial over all cells at once.
+
+Summary of the biology:
+See process/MRNAExport.py
+"""
+
+import numpy as np
+from process.MRNAExport import MRNAExport
+from mainaux.BatchHelpers import Sampler
+
+class BatchMRNAExport(MRNAExport):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        MRNAExport.__init__(self, state, param_dict, sampler.random_state)
+
+    # abundances_nuc, abundances_cyt: arrays of shape (num_of_cells, # of bins), updated in place
+    def nuclear_export(self, what_may_be_exported, abundances_nuc, abundances_cyt, export_rate):
+        decrement_amount = self.sampler.binomial(abundances_nuc[:,what_may_be_exported], export_rate)
+        abundances_cyt[:,what_may_be_exported] += decrement_amount
+        abundances_nuc[:,what_may_be_exported] -= decrement_amount
+        return [abundances_nuc, abundances_cyt]
+
+    def evolve_state(self, timestep):
+        #get variables
+        mRNA_state = self.state.get_state('mRNAs')
+        NUM_OF_REV_REQ_FOR_EXPORT = int(self.NUM_OF_REV_REQ_FOR_EXPORT)
+
+        #Rev independent export of multi-spliced mRNAs
+        what_may_be_exported = np.arange(np.size(mRNA_state.multi_splice_transcript_nuc, 1))
+        self.nuclear_export(what_may_be_exported, mRNA_state.multi_splice_transcript_nuc, mRNA_state.multi_splice_transcript_cyt, self.PROB_REV_INDEP_EXPORT)
+
+        #Rev dependent export of full-length and single-spliced mRNAs
+        what_may_be_exported = np.arange(NUM_OF_REV_REQ_FOR_EXPORT, self.MAX_REV_PER_TRANSCRIPT+1)
+        self.nuclear_export(what_may_be_exported, mRNA_state.full_len_transcripts_nuc, mRNA_state.full_len_transcripts_cyt, self.PROB_REV_DEP_EXPORT)
+        what_may_be_exported = np.arange((NUM_OF_REV_REQ_FOR_EXPORT*7), (7*(self.MAX_REV_PER_TRANSCRIPT+1)))
+        self.nuclear_export(what_may_be_exported, mRNA_state.single_splice_transcript_nuc, mRNA_state.single_splice_transcript_cyt, self.PROB_REV_DEP_EXPORT)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+This is the batched counterpart of process/Packaging.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchPackaging is initialized once per BatchSimulation with a
+BatchState as input. The states 'proteins', 'mRNAs', 'cell_cycle',
+'reaction_rates' and 'viral_progeny_container' are modified in this process,
+for every cell of the batch.
+
+The Gag-bound transcripts of every cell are stored as 16 bins (see
+state/MRNAs.py); bin b has SL site s bound if the bit (8 >> s) of b is set.
+Binding and unbinding at the SL sites is drawn cell by cell with
+Packaging.bind_SL_sites, so both processes use the same model: every SL site
+of a transcript binds or releases a Gag once per timestep, independently, and
+limiting Gag is shared without favouring any bin (see
+Packaging.SL_BOUND_BEFORE). The draws take a few multinomials per cell,
+whatever the number of transcripts.
+
+Viral progeny are objects, so progeny creation and virion growth are still
+done cell by cell, each cell with its own ViralProgenyContainer.
+
+Summary of the biology:
+See process/Packaging.py
+"""
+
+import numpy as np
+import math as math
+from process.Packaging import Packaging
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+#This is a Process Class
+class BatchPackaging(Packaging):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        Packaging.__init__(self, state, param_dict, sampler.random_state)
+
+        #binding constants of SL1, SL2, SL3, SL4
+        self.BINDING_CONSTANTS = np.array([self.BINDING_CONSTANT_SL1, self.BINDING_CONSTANT_SL2, self.BINDING_CONSTANT_SL3, self.BINDING_CONSTANT_SL4]).astype(float)
+        #SL_SITE_BIT[s] is the bit of a Gag bound bin that is set if SL site s is bound
+        self.SL_SITE_BIT = [8, 4, 2, 1]
+
+    def evolve_state(self, timestep, active_proc=[]):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_cyt = protein_state.proteins_cyt
+        proteins_mem = protein_state.proteins_mem
+        proteins_virion = protein_state.proteins_virion
+        cell_cycle_state = self.state.get_state('cell_cycle')
+        reaction_rates_state = self.state.get_state('reaction_rates')
+        mRNA_state = self.state.get_state('mRNAs')
+        full_len_transcripts_cyt = mRNA_state.full_len_transcripts_cyt
+        full_len_transcripts_Gag_bound = mRNA_state.full_len_transcripts_Gag_bound
+        list_of_containers = self.state.get_state('viral_progeny_container')
+
+        Gag_index = Proteins.index['Gag']
+
+        if active_proc == []:
+            active_proc = ["cell_cycle_arrest", "dimerize_Gag_monomers", "Gag_and_Gag_dimer_diffusion", "dimerize_gagbound_transcripts", "virion_growth"]
+
+        #1. Vpr accumulation to a certain level causes the cell to go into G2/M cell cycle arrest
+        cell_cycle_arrest = np.where(proteins_cyt[:,Proteins.index['Vpr']] > self.VPR_G2ARREST_THRESH, 1, cell_cycle_state.cell_cycle_arrest)
+        #2. In G2/M cell cycle arrest, 5'cap dependent translation is suppressed
+        translation_suppressed = np.where(cell_cycle_arrest == 1, 1, reaction_rates_state.translation_suppressed)
+
+        #3. Gag binding to the SL sites of full length transcripts
+        if "cell_cycle_arrest" in active_proc:
+            binding_active = (cell_cycle_arrest == 1) & (proteins_cyt[:,Proteins.index['Vif']] > 0)
+            if binding_active.any():
+                #binding_rates[:,s] is the binding rate of SL site s in each cell (0 where no binding takes place)
+                binding_rates = np.outer(proteins_cyt[:,Gag_index], self.BINDING_CONSTANTS) / (self.AVOGADRO_NUM * float(self.VOLUME_CYTOPLASM))
+                binding_rates = binding_rates * binding_active[:,np.newaxis]
+
+                #First calculate SL binding and unbinding, cell by cell with the transition table of Packaging
+                for cell_index in np.nonzero(binding_active)[0]:
+                    proteins_cyt[cell_index,Gag_index] = self.bind_SL_sites(full_len_transcripts_Gag_bound[cell_index], np.minimum(binding_rates[cell_index], 1), proteins_cyt[cell_index,Gag_index])
+
+                #Second deal with full completely unbound ones
+                #Assume any bound Rev is released (see Packaging.process_cyt_proteins)
+                for i in range(np.size(full_len_transcripts_cyt, 1)):
+                    for s in range(4):
+                        tempRand = self.sampler.binomial(full_len_transcripts_cyt[:,i] * binding_active, binding_rates[:,s])
+                        delta_num_of_transcripts = np.minimum(tempRand, proteins_cyt[:,Gag_index])
+                        full_len_transcripts_Gag_bound[:,self.SL_SITE_BIT[s]] += delta_num_of_transcripts
+                        full_len_transcripts_cyt[:,i] -= delta_num_of_transcripts
+                        proteins_cyt[:,Gag_index] -= delta_num_of_transcripts
+                        proteins_cyt[:,Proteins.index['Rev']] += tempRand*i
+
+                #move everything in the [0,0,0,0] bin back to full_transcript_cyt
+                full_len_transcripts_cyt[:,0] += full_len_transcripts_Gag_bound[:,0] * binding_active
+                full_len_transcripts_Gag_bound[:,0] *= ~binding_active
+
+        #4. Allow Gag monomers in the cytoplasm to dimerize
+        if "dimerize_Gag_monomers" in active_proc:
+            Gag_concentration = proteins_cyt[:,Gag_index]/(self.VOLUME_CYTOPLASM*.001) #molecules/m^3
+            rate_of_Gag_Gag_collision = (float(1)/2)*(math.pi)*(self.GAG_DIAMETER**2)*(2**(float(1)/2))*(self.GAG_VELOCITY)*(Gag_concentration**2)
+            tempRand = self.sampler.poisson(proteins_cyt[:,Gag_index]*rate_of_Gag_Gag_collision)
+            dimers_made = np.where((tempRand*2) <= proteins_cyt[:,Gag_index], tempRand, proteins_cyt[:,Gag_index] // 2)
+            proteins_cyt[:,Gag_index] -= dimers_made*2
+            proteins_cyt[:,Proteins.index['Gag_dimers']] += dimers_made
+
+        #5. Determine how many Gag proteins diffuse to the cell membrane
+        if "Gag_and_Gag_dimer_diffusion" in active_proc:
+            for protein_name, diffusion_prob in [('Gag', self.GAG_DIFFUSION_PROB), ('Gag_dimers', self.GAG_DIMER_DIFFUSION_PROB)]:
+                tempRand = self.sampler.binomial(proteins_cyt[:,Proteins.index[protein_name]], diffusion_prob)
+                proteins_cyt[:,Proteins.index[protein_name]] -= tempRand
+                proteins_mem[:,Proteins.index[protein_name]] += tempRand
+
+        #6. Model gRNA dimerization
+        #bins 14 and 15 hold full length RNA with SL1, SL2, and SL3 bound (without and with SL4 bound)
+        num_dimerable_gRNA = full_len_transcripts_Gag_bound[:,14] + full_len_transcripts_Gag_bound[:,15]
+        if "dimerize_gagbound_transcripts" in active_proc:
+            num_of_dimers = self.sampler.binomial((num_dimerable_gRNA // 2) * (num_dimerable_gRNA > 2), self.PROB_GAG_BOUND_RNA_DIMERS)
+            for cell_index in np.where(num_of_dimers > 0)[0]:
+                #pair up RNAs drawn without replacement; 1 marks an RNA with SL4 bound
+                dimerable_gRNA = np.concatenate((np.zeros((full_len_transcripts_Gag_bound[cell_index,14]), int), np.ones((full_len_transcripts_Gag_bound[cell_index,15]), int)))
+                SL4_bound_per_dimer = self.sampler.permutation(dimerable_gRNA)[0:2*num_of_dimers[cell_index]].reshape((-1, 2)).sum(1)
+                full_len_transcripts_Gag_bound[cell_index,15] -= SL4_bound_per_dimer.sum()
+                full_len_transcripts_Gag_bound[cell_index,14] -= 2*num_of_dimers[cell_index] - SL4_bound_per_dimer.sum()
+                for num_SL4_bound in SL4_bound_per_dimer:
+                    list_of_containers[cell_index].create_progeny(6 + num_SL4_bound, timestep)
+
+        if "virion_growth" in active_proc:
+            for viral_progeny_container in list_of_containers:
+                if viral_progeny_container.count_progeny() > 0:
+                    viral_progeny_container.virion_growth(timestep)
+
+        #write back parameters to state object
+        cell_cycle_state.cell_cycle_arrest = cell_cycle_arrest
+        reaction_rates_state.translation_suppressed = translation_suppressed
+
+        for cell_index, viral_progeny_container in enumerate(list_of_containers):
+            if viral_progeny_container.count_progeny() > 0:
+                for protein_name in ['Gag', 'Vif', 'GagProPol', 'Vpr', 'Nef']:
+                    proteins_virion[cell_index,Proteins.index[protein_name]] = getattr(viral_progeny_container, 'count_num_of_' + protein_name)()
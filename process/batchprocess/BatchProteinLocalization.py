@@ -0,0 +1,40 @@
+"""
+This is the batched counterpart of process/ProteinLocalization.py. Its
+evolve_state method is called at each timestep of a BatchSimulation.
+
+An instance of BatchProteinLocalization is initialized once per
+BatchSimulation with a BatchState as input. Only the state 'proteins' is
+modified in this process, for every cell of the batch.
+
+Summary of the biology:
+See process/ProteinLocalization.py
+"""
+
+import numpy as np
+from process.ProteinLocalization import ProteinLocalization
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+class BatchProteinLocalization(ProteinLocalization):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        ProteinLocalization.__init__(self, state, param_dict, sampler.random_state)
+
+    # Moves a Poisson number of proteins (at most all of them) from from_array to to_array
+    def shuttle(self, protein_index, from_array, to_array, rate):
+        amt_shuttled = np.minimum(self.sampler.poisson(from_array[:,protein_index]*rate), from_array[:,protein_index])
+        from_array[:,protein_index] -= amt_shuttled
+        to_array[:,protein_index] += amt_shuttled
+
+    def evolve_state(self, timestep):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_nuc = protein_state.proteins_nuc
+        proteins_cyt = protein_state.proteins_cyt
+
+        self.shuttle(Proteins.index['Rev'], proteins_cyt, proteins_nuc, self.PROB_REV_SHUTTLING_IN)
+        self.shuttle(Proteins.index['Rev'], proteins_nuc, proteins_cyt, self.PROB_REV_SHUTTLING_OUT)
+        self.shuttle(Proteins.index['Tat'], proteins_cyt, proteins_nuc, self.PROB_TAT_SHUTTLING_IN)
+        self.shuttle(Proteins.index['Tat'], proteins_nuc, proteins_cyt, self.PROB_TAT_SHUTTLING_OUT)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+This is the batched counterpart of process/RevBinding.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchRevBinding is initialized once per BatchSimulation with a
+BatchState as input. The states 'mRNAs' and 'proteins' are modified in this
+process, for every cell of the batch.
+
+RevBinding solves one Rev binding ODE system for the full-length mRNAs and one
+for each of the 7 single-spliced forms. Here the 8 systems of every cell are
+stacked into one system (see RevBinding.stacked_Rev_ode) and solved with a
+single odeint call. Each system's variables are stored next to each other, so
+the Jacobian of the stacked system is banded. Discretization and mass balance
+follow RevBinding.ODE_discretizer, one row per system.
+
+Summary of the biology:
+See process/RevBinding.py
+"""
+
+import numpy as np
+from scipy.integrate import odeint
+from process.RevBinding import RevBinding
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+#This is a Process Class
+class BatchRevBinding(RevBinding):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        RevBinding.__init__(self, state, param_dict, sampler.random_state)
+
+    def ODE_discretizer(self, soln_end, prev_mRNA_abundances, prev_protein_abundances):
+        #This function discretizes, mass balances, and ensures non-negative values of ODE solutions, one row per ODE system
+        #soln_end: ODE solution at the end of the timestep, shape (# of systems, MAX_REV_PER_TRANSCRIPT+2)
+        #prev_mRNA_abundances: abundances of mRNAs before applying the ODE, shape (# of systems, MAX_REV_PER_TRANSCRIPT+1)
+        #prev_protein_abundances: bindable Rev before applying the ODE, shape (# of systems)
+        MAX = self.MAX_REV_PER_TRANSCRIPT
+        soln_end = soln_end.copy()
+        soln_end[soln_end == .5] = 1
+        soln_round = np.round(soln_end)
+        soln_round[soln_round<0]=0 # Don't allow negative abundances
+        mRNA_before = prev_mRNA_abundances.sum(1)
+        mRNA_after = soln_round[:,0:-1].sum(1)
+
+        # Mass balance handling (mRNA)
+        unbalanced = np.where(mRNA_after != mRNA_before)[0]
+        while np.size(unbalanced) > 0:
+            discrepancy = mRNA_after[unbalanced] - mRNA_before[unbalanced]
+            temp_index = self.sampler.randint(0, MAX+1, np.size(unbalanced)) # Randomly pick bins to adjust the discrepancy
+            soln_round[unbalanced, temp_index] = soln_round[unbalanced, temp_index] - discrepancy
+            soln_round[soln_round<0]=0
+            mRNA_after = soln_round[:,0:-1].sum(1)
+            unbalanced = np.where(mRNA_after != mRNA_before)[0]
+
+        #Mass Balance (Rev)
+        Rev_before = (prev_mRNA_abundances*np.arange(MAX+1)).sum(1) + prev_protein_abundances
+        Rev_after = (soln_round[:,0:-1]*np.arange(MAX+1)).sum(1) + soln_round[:,-1]
+        discrepancy = Rev_after - Rev_before
+        #Settle what can be settled with free Rev
+        settled_by_free_Rev = np.minimum(discrepancy, soln_round[:,-1])
+        soln_round[:,-1] = soln_round[:,-1] - settled_by_free_Rev
+        discrepancy = discrepancy - settled_by_free_Rev
+        #Reduce the rest of the discrepancy by moving mRNAs from a higher to lower Rev occupancy
+        unbalanced = np.where(discrepancy > 0)[0]
+        while np.size(unbalanced) > 0:
+            temp_index = self.sampler.randint(1, MAX+1, np.size(unbalanced)) # only pick mRNA bins with at least one Rev bound
+            can_move = soln_round[unbalanced, temp_index] > 0
+            unbalanced = unbalanced[can_move]
+            temp_index = temp_index[can_move]
+            soln_round[unbalanced, temp_index] -= 1
+            soln_round[unbalanced, temp_index-1] += 1
+            discrepancy[unbalanced] -= 1
+            unbalanced = np.where(discrepancy > 0)[0]
+        return [soln_round[:,0:-1].astype(int), soln_round[:,-1].astype(int)]
+
+    def evolve_state(self, timestep):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_nuc = protein_state.proteins_nuc
+        mRNA_state = self.state.get_state('mRNAs')
+        full_len_transcripts_nuc = mRNA_state.full_len_transcripts_nuc
+        num_of_cells = self.state.num_of_cells
+        MAX = self.MAX_REV_PER_TRANSCRIPT
+        #view of shape (cell, # of Rev bound, splice form)
+        single_splice_transcript_nuc = mRNA_state.single_splice_transcript_nuc.reshape((num_of_cells, MAX+1, 7))
+
+        #mRNA abundances of every ODE system, shape (cell, system, # of Rev bound)
+        #system 0 is the full length transcripts, systems 1-7 are the single-spliced forms
+        mRNA_abundances = np.concatenate((full_len_transcripts_nuc[:,np.newaxis,:], single_splice_transcript_nuc.transpose((0, 2, 1))), 1)
+
+        #Allocate Rev amongst different mRNA types relative to mRNA abundances (see RevBinding.evolve_state)
+        bindable_mRNA = mRNA_abundances[:,:,0:MAX].sum(2)
+        bindable_mRNA_sum = bindable_mRNA.sum(1)
+        Rev_fraction = bindable_mRNA / np.maximum(bindable_mRNA_sum, 1).astype(float)[:,np.newaxis]
+        bindable_Rev = np.floor(Rev_fraction * proteins_nuc[:,Proteins.index['Rev']][:,np.newaxis])
+        bindable_Rev_sum = bindable_Rev.sum(1)
+
+        # initial ode conditions
+        R = np.concatenate((mRNA_abundances, bindable_Rev[:,:,np.newaxis]), 2).reshape((-1, MAX+2)).astype(float)
+        t_seg_Rev = np.linspace(0, 59, 60)
+        soln = odeint(self.stacked_Rev_ode, R.ravel(), t_seg_Rev, ml=MAX+1, mu=MAX+1)
+        #discretize, mass balance
+        [new_mRNA_abundances, net_Rev] = self.ODE_discretizer(soln[-1,:].reshape((-1, MAX+2)), mRNA_abundances.reshape((-1, MAX+1)), bindable_Rev.ravel())
+        new_mRNA_abundances = new_mRNA_abundances.reshape((num_of_cells, 8, MAX+1))
+
+        #write back parameters to state object
+        full_len_transcripts_nuc[:] = new_mRNA_abundances[:,0,:]
+        single_splice_transcript_nuc[:] = new_mRNA_abundances[:,1:,:].transpose((0, 2, 1))
+        proteins_nuc[:,Proteins.index['Rev']] = (proteins_nuc[:,Proteins.index['Rev']] - bindable_Rev_sum) + net_Rev.reshape((num_of_cells, 8)).sum(1)
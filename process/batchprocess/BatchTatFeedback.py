@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+This is the batched counterpart of process/TatFeedback.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchTatFeedback is initialized once per BatchSimulation with
+a BatchState as input. The states 'host_factors', 'proteins', and
+'reaction_rates' are modified in this process, for every cell of the batch.
+
+The Tat/pTEFb ODEs of all cells are stacked into one system and solved with a
+single odeint call. Each cell's 5 variables are stored next to each other, so
+the Jacobian of the stacked system is banded, which keeps the solve cheap for
+large batches. Discretization and mass balance follow
+TatFeedback.ODE_discretizer, one row per cell.
+
+Summary of the biology:
+See process/TatFeedback.py
+"""
+
+import numpy as np
+from scipy.integrate import odeint
+from process.TatFeedback import TatFeedback
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+#This is a Process Class
+class BatchTatFeedback(TatFeedback):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        TatFeedback.__init__(self, state, param_dict, sampler.random_state)
+
+    # solve the stacked system dy/dt = f(y, t)
+    # y holds [Tat_nuc, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl, "mRNA"] for each cell in turn
+    def TatODE(self, y, t):
+        y = y.reshape((-1, 5))
+        Tat_nuc = y[:,0]
+        pTEFb_nuc = y[:,1]
+        Tat_pTEFb_deacetyl = y[:,2]
+        Tat_pTEFb_acetyl = y[:,3]
+
+        # the model equations (see TatFeedback.TatODE)
+        f = np.empty_like(y)
+        f[:,0] = self.RATE_TAT_ACT_TRANSCRIPTION*Tat_pTEFb_acetyl - self.RATE_TAT_pTEFb_BIND*Tat_nuc*pTEFb_nuc
+        f[:,1] = self.RATE_TAT_ACT_TRANSCRIPTION*Tat_pTEFb_acetyl - self.RATE_TAT_pTEFb_BIND*Tat_nuc*pTEFb_nuc
+        f[:,2] = self.RATE_TAT_pTEFb_BIND*Tat_nuc*pTEFb_nuc - self.RATE_TAT_pTEFb_ACETYL*Tat_pTEFb_deacetyl
+        f[:,3] = self.RATE_TAT_pTEFb_ACETYL*Tat_pTEFb_deacetyl - self.RATE_TAT_ACT_TRANSCRIPTION*Tat_pTEFb_acetyl
+        f[:,4] = self.RATE_TAT_ACT_TRANSCRIPTION*Tat_pTEFb_acetyl
+        return f.ravel()
+
+    def ODE_discretizer(self, soln_end, free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl):
+        #This function discretizes, mass balances, and ensures positive values of ODE solutions, one row per cell
+        #soln_end: ODE solution at the end of the timestep, shape (num_of_cells, 5)
+        #free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl: amounts before applying the ODE
+        soln_end = soln_end.copy()
+        soln_end[soln_end == .5] = 1
+        soln_round = np.around(soln_end) #discretize
+        soln_round[soln_round<0]=0 #don't allow negatives
+        Tat_before = free_Tat + Tat_pTEFb_deacetyl + Tat_pTEFb_acetyl
+        Tat_after = soln_round[:,[0,2,3]].sum(1)
+        unbalanced_cells = np.where(Tat_after != Tat_before)[0]
+        array_of_indices_of_interest = np.array([0,2,3])
+        while np.size(unbalanced_cells) > 0: #mass balance (Tat)
+            discrepancy = Tat_after[unbalanced_cells] - Tat_before[unbalanced_cells]
+            temp_index = array_of_indices_of_interest[self.sampler.randint(0, 3, np.size(unbalanced_cells))] #randomly pick bins to adjust the discrepancy
+            soln_round[unbalanced_cells, temp_index] = soln_round[unbalanced_cells, temp_index] - discrepancy
+            soln_round[soln_round<0]=0
+            Tat_after = soln_round[:,[0,2,3]].sum(1)
+            unbalanced_cells = np.where(Tat_after != Tat_before)[0]
+        pTEFb_after = soln_round[:,1]+soln_round[:,2]+soln_round[:,3]
+        pTEFb_before = Tat_pTEFb_deacetyl + Tat_pTEFb_acetyl + pTEFb_nuc
+        soln_round[:,1] = soln_round[:,1] - (pTEFb_after - pTEFb_before) #mass balance (pTEFb)
+        if (soln_round[:,1] < 0).any():
+            soln_round[soln_round[:,1] < 0, 1] = 0
+            print('ERROR: Error in pTEFb mass balance. Amt of pTEFb in nucleus went below zero')
+        return [soln_round[:,0], soln_round[:,1], soln_round[:,2], soln_round[:,3]]
+
+    def evolve_state(self, timestep):
+        #get variables
+        host_factor_state = self.state.get_state('host_factors')
+        protein_state = self.state.get_state('proteins')
+        proteins_nuc = protein_state.proteins_nuc
+        reaction_rate_state = self.state.get_state('reaction_rates')
+
+        #replenish pTFEb -- exponential doubling as Tcell grows (same amount for every cell)
+        pTEFb_nuc = host_factor_state.pTEFb_nuc + np.around(self.pTEFb_NUC_INIT*np.exp(self.pTEFb_DOUBLING_RATE*(timestep+1))) - np.around(self.pTEFb_NUC_INIT*np.exp(self.pTEFb_DOUBLING_RATE*(timestep)))
+
+        #determine the effect of Tat feedback...dependent on the abundance of Tat in the nucleus
+        free_Tat = proteins_nuc[:,Proteins.index['Tat']].copy()
+        y0 = np.column_stack((free_Tat, pTEFb_nuc, host_factor_state.Tat_pTEFb_deacetyl, host_factor_state.Tat_pTEFb_acetyl, np.zeros(self.state.num_of_cells))).astype(float)
+        t_seg_Tat = np.linspace(0, 59, 60)   # time grid for Tat feedback integration
+        soln = odeint(self.TatODE, y0.ravel(), t_seg_Tat, ml=4, mu=4)
+        soln_end = soln[-1,:].reshape((-1, 5))
+
+        #Accounting and discretizing and mass balance
+        [free_Tat, pTEFb_nuc, Tat_pTEFb_deacetyl, Tat_pTEFb_acetyl] = self.ODE_discretizer(soln_end, free_Tat, pTEFb_nuc, host_factor_state.Tat_pTEFb_deacetyl, host_factor_state.Tat_pTEFb_acetyl)
+        proteins_nuc[:,Proteins.index['Tat']] = free_Tat
+
+        #write back parameters to state object
+        host_factor_state.pTEFb_nuc = pTEFb_nuc
+        host_factor_state.Tat_pTEFb_deacetyl = Tat_pTEFb_deacetyl
+        host_factor_state.Tat_pTEFb_acetyl = Tat_pTEFb_acetyl
+        reaction_rate_state.Tat_derived_transcription_rate = np.maximum(0, soln_end[:,4]) #allow no negatives
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+This is the batched counterpart of process/Transcription.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchTranscription is initialized once per BatchSimulation with
+a BatchState as input. The states 'mRNAs' and 'DNAs' are modified in this
+process, for every cell of the batch.
+
+PROMOTER_ALWAYS_ON and ACTUAL_TRANSCRIPTION_RATE hold one value per cell.
+The promoter of every cell is switched with a single vector of random numbers,
+and every cell draws its new transcripts the same way Transcription does
+(a Bernoulli draw when the rate is below 1, a Poisson draw otherwise).
+
+Summary of the biology:
+See process/Transcription.py
+"""
+
+import numpy as np
+from process.Transcription import Transcription
+from mainaux.BatchHelpers import Sampler
+
+#This is a Process Class
+class BatchTranscription(Transcription):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        Transcription.__init__(self, state, param_dict, sampler.random_state)
+
+        num_of_cells = self.state.num_of_cells
+        self.PROMOTER_ALWAYS_ON = np.zeros((num_of_cells), bool)
+        self.ACTUAL_TRANSCRIPTION_RATE = np.ones((num_of_cells)) * self.BASAL_TRANSCRIPTION_RATE
+
+    def evolve_state(self, timestep):
+        #get variables
+        DNA_state = self.state.get_state('DNAs')
+        promoter_activity = DNA_state.promoter_activity
+        reaction_rate_state = self.state.get_state('reaction_rates')
+        Tat_derived_transcription_rate = reaction_rate_state.Tat_derived_transcription_rate
+        mRNA_state = self.state.get_state('mRNAs')
+        full_len_transcripts_nuc = mRNA_state.full_len_transcripts_nuc
+        num_of_cells = self.state.num_of_cells
+
+        # Cells whose derived rate is greater than the threshold rate keep their promoter on from now on
+        newly_always_on = (Tat_derived_transcription_rate > self.THRESH_TAT_FEEDBACK) & ~self.PROMOTER_ALWAYS_ON
+        self.PROMOTER_ALWAYS_ON = self.PROMOTER_ALWAYS_ON | newly_always_on
+        promoter_activity = np.where(newly_always_on, 1, promoter_activity)
+
+        # Every other cell may switch its promoter on or off
+        temp_rand = self.sampler.rand(num_of_cells)
+        switch_on = ~self.PROMOTER_ALWAYS_ON & (promoter_activity == 0) & (temp_rand < self.PROMOTER_ON_RATE)
+        switch_off = ~self.PROMOTER_ALWAYS_ON & (promoter_activity == 1) & (temp_rand < self.PROMOTER_OFF_RATE)
+        promoter_activity = np.where(switch_on, 1, np.where(switch_off, 0, promoter_activity))
+
+        # Actual rate = max(Tat derived rate, basal rate), capped at the upper limit
+        self.ACTUAL_TRANSCRIPTION_RATE = np.maximum(Tat_derived_transcription_rate, self.BASAL_TRANSCRIPTION_RATE).astype(float)
+        self.ACTUAL_TRANSCRIPTION_RATE = np.minimum(self.ACTUAL_TRANSCRIPTION_RATE, self.THRESH_TAT_FEEDBACK * self.MAX_TAT_ENHANCEMENT)
+
+        # Deal with the actual creation of mRNA
+        transcribing = (promoter_activity == 1) | self.PROMOTER_ALWAYS_ON
+        new_transcripts = np.where(self.ACTUAL_TRANSCRIPTION_RATE < 1, self.sampler.rand(num_of_cells) < self.ACTUAL_TRANSCRIPTION_RATE, self.sampler.poisson(self.ACTUAL_TRANSCRIPTION_RATE))
+        new_transcripts = new_transcripts.astype(int) * transcribing
+        full_len_transcripts_nuc[:,0] += new_transcripts
+
+        # write back parameters to state object
+        DNA_state.promoter_activity = promoter_activity
+        mRNA_state.transcripts_synthesized = mRNA_state.transcripts_synthesized + new_transcripts
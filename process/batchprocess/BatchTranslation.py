@@ -0,0 +1,55 @@
+"""
+This is the batched counterpart of process/Translation.py. Its evolve_state
+method is called at each timestep of a BatchSimulation.
+
+An instance of BatchTranslation is initialized once per BatchSimulation with a
+BatchState as input. Only the state 'proteins' is modified in this process,
+for every cell of the batch.
+
+The sum of a Poisson(lambda) draw per transcript is drawn directly as one
+Poisson(# of transcripts * lambda) draw per mRNA bin. The proteins coded by
+each bin are looked up in a 0/1 matrix, so that the translation events of all
+bins are added to proteins_cyt with a single matrix product.
+
+Summary of the biology:
+See process/Translation.py
+"""
+
+import numpy as np
+from process.Translation import Translation
+from state.Proteins import Proteins
+from mainaux.BatchHelpers import Sampler
+
+class BatchTranslation(Translation):
+    def __init__(self, state, param_dict=None, sampler=None):
+        if sampler == None:
+            sampler = Sampler()
+        self.sampler = sampler
+        Translation.__init__(self, state, param_dict, sampler.random_state)
+
+        #SINGLE_SPLICE_TO_PROTEIN[i, k] == 1 if single-spliced bin i codes for protein k (see Translation.SINGLE_SPLICE_PROTEIN_INDEXES)
+        self.SINGLE_SPLICE_TO_PROTEIN = np.eye(9, dtype=int)[self.SINGLE_SPLICE_PROTEIN_INDEXES]
+        #MULTI_SPLICE_TO_PROTEIN[j, k] == 1 if multi-spliced bin j codes for protein k
+        self.MULTI_SPLICE_TO_PROTEIN = np.eye(9, dtype=int)[self.MULTI_SPLICE_PROTEIN_INDEXES]
+
+    def evolve_state(self, timestep):
+        #get variables
+        protein_state = self.state.get_state('proteins')
+        proteins_cyt = protein_state.proteins_cyt
+        mRNA_state = self.state.get_state('mRNAs')
+        translation_suppressed = self.state.get_state('reaction_rates').translation_suppressed
+
+        index = Proteins.index
+
+        translation_frequency = np.where(translation_suppressed == 1, self.FREQ_TRANSLATION_SUPPRESSED, self.FREQ_TRANSLATION)[:,np.newaxis]
+
+        #Single and multi splice
+        proteins_cyt += np.dot(self.sampler.poisson(mRNA_state.single_splice_transcript_cyt*translation_frequency), self.SINGLE_SPLICE_TO_PROTEIN)
+        proteins_cyt += np.dot(self.sampler.poisson(mRNA_state.multi_splice_transcript_cyt*translation_frequency), self.MULTI_SPLICE_TO_PROTEIN)
+
+        #Full length; translated at the IRES frequency when translation is suppressed
+        full_len_frequency = np.where(translation_suppressed == 1, self.FREQ_TRANSLATION_IRES, self.FREQ_TRANSLATION)
+        tempRand = self.sampler.poisson(mRNA_state.full_len_transcripts_cyt.sum(1)*full_len_frequency)
+        tempRand2 = self.sampler.binomial(tempRand, self.FREQ_GAG_PRO_POL_TRANSLATION)
+        proteins_cyt[:,index['Gag']] += tempRand-tempRand2 #Gag
+        proteins_cyt[:,index['GagProPol']] += tempRand2 #Gag/Pro/Pol
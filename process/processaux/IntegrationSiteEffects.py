@@ -30,6 +30,9 @@ We make the major assumption that these 30 clones represent the variation of
 these parameters across all integration sites in correct proportion. For each 
 individual simulation, we will randomly pick a number 1-30, and that simulation
 will run using the Skupsky et al. constants for the corresponding clone.  
+The clone can also be fixed (see INTEGRATION_SITE_CLONE in parameters.csv), so that
+ensembles can be stratified by clone, each clone taking its share CLONE_WEIGHTS of the
+simulations (see SimHelpers.run_clone_stratified_ensemble).
 
 Clonal data was obtained from Skupsky et al. Figure 4 A and B.
 Step 1: Correlate clones between A and B based on log10(mu) mean
@@ -68,9 +71,14 @@ class IntegrationSiteEffects(object):
                                                          0.830890772, 0.512323097, 0.489264759, 1.201002567, 0.675373375, 0.757781390,
                                                          1.228977510, 1.903460792, 0.793494527, 0.811977389, 0.793494527, 1.286897436])
         self.CLONES_RATE_PROMOTER_OFF = 0.066 
+        #share of integration sites represented by each clone
+        self.CLONE_WEIGHTS = np.ones(30)/30.
     
-    def initialize_constants(self):
-        clone = np.random.randint(0,30) #equal probability of selecting any of the 30 clones
+    #clone: index of the clone to use, None to draw one at random
+    def initialize_constants(self, random_state=np.random, clone=None):
+        if clone == None:
+            clone = random_state.randint(0,30) #equal probability of selecting any of the 30 clones
+        self.clone = clone
         self.RATE_PROMOTER_ON = self.CLONES_RATE_PROMOTER_ON[clone]
         self.RATE_PROMOTER_OFF = self.CLONES_RATE_PROMOTER_OFF
         self.BASAL_TRANSCRIPTION_RATE = self.CLONES_BASAL_TRANSCRIPTION_RATE[clone]
@@ -3,17 +3,19 @@ import numpy as np
 
 from process.RevBinding import RevBinding
 from mainaux.InitParamValues import *
+from mainaux.InitClassVars import *
 
 #This is a type of State Class
 class CellCycle(object):
-    def __init__(self, param_dict=None):
+    # num_of_cells: if given, every value is held once per cell (see mainaux/BatchState.py)
+    def __init__(self, param_dict=None, num_of_cells=None):
         if param_dict==None:
             param_dict = generate_param_dict();
         
         #Initialize necessary parameters
         
         #Initialize Variables
-        self.cell_cycle_arrest = 0      
+        self.cell_cycle_arrest = initialize_ensemble_scalar(0, num_of_cells)      
         
     def record_state(self, record, timestep, max_timesteps):
         record.add_tracking(timestep, max_timesteps, 'cell_cycle_arrest', self.cell_cycle_arrest)
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from mainaux.InitClassVars import *
 
 #This is a type of State Class
 class DNAs(object):
-    def __init__(self):
+    # num_of_cells: if given, every value is held once per cell (see mainaux/BatchState.py)
+    def __init__(self, num_of_cells=None):
         #Initialize necessary parameters
-        self.promoter_activity = 0 #0=off, 1=on       
+        self.promoter_activity = initialize_ensemble_scalar(0, num_of_cells) #0=off, 1=on       
         
     def record_state(self, record, timestep, max_timesteps):
         record.add_tracking(timestep, max_timesteps, 'promoter_activity', self.promoter_activity)
@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from mainaux.InitClassVars import *
 
 #This is a type of State Class
 class HostFactors(object):
-    def __init__(self):
+    # num_of_cells: if given, every value is held once per cell (see mainaux/BatchState.py)
+    def __init__(self, num_of_cells=None):
         #Initialize necessary parameters
     
         #Factors associated with Tat feedback
-        self.pTEFb_nuc = 500
-        self.pTEFb_nuc_init = 500
-        self.Tat_pTEFb_deacetyl = 0
-        self.Tat_pTEFb_acetyl = 0
+        self.pTEFb_nuc = initialize_ensemble_scalar(500, num_of_cells)
+        self.pTEFb_nuc_init = initialize_ensemble_scalar(500, num_of_cells)
+        self.Tat_pTEFb_deacetyl = initialize_ensemble_scalar(0, num_of_cells)
+        self.Tat_pTEFb_acetyl = initialize_ensemble_scalar(0, num_of_cells)
@@ -3,18 +3,21 @@ import numpy as np
 
 from process.RevBinding import RevBinding
 from mainaux.InitParamValues import *
+from mainaux.InitClassVars import *
 
 #This is a type of State Class
 class MRNAs(object):
-    def __init__(self, param_dict=None):
+    # num_of_cells: if given, every array gains a leading dimension of that size
+    # so that a batch of cells can be advanced together (see mainaux/BatchState.py)
+    def __init__(self, param_dict=None, num_of_cells=None):
         if param_dict==None:
             param_dict = generate_param_dict();
         
         #Initialize necessary parameters
         MAX_REV_PER_TRANSCRIPT = param_dict['MAX_REV_PER_TRANSCRIPT']
         #Initialize Variables
-        self.full_len_transcripts_nuc = np.zeros((MAX_REV_PER_TRANSCRIPT+1), int) #an array of length MAX_REV_PER_TRANSCRIPT+1. Index 0 holds full transcript with no Rev. Index MAX_REV_PER_TRANSCRIPT holds full transcript with MAX_REV_PER_TRANSCRIPT Rev.
-        self.single_splice_transcript_nuc = np.zeros((7*(MAX_REV_PER_TRANSCRIPT+1)), int) 
+        self.full_len_transcripts_nuc = initialize_ensemble_array(MAX_REV_PER_TRANSCRIPT+1, num_of_cells) #an array of length MAX_REV_PER_TRANSCRIPT+1. Index 0 holds full transcript with no Rev. Index MAX_REV_PER_TRANSCRIPT holds full transcript with MAX_REV_PER_TRANSCRIPT Rev.
+        self.single_splice_transcript_nuc = initialize_ensemble_array(7*(MAX_REV_PER_TRANSCRIPT+1), num_of_cells) 
             #an array of length 7*MAX_REV_PER_TRANSCRIPT to hold the counts of each type of single-spliced mRNA: 
             #[0-6] (inclusive) D1 to A1, A2, A3, A4a, A4b, A4c, A5; 0 Rev
             #[7-13]  D1 to A1, A2, A3, A4a, A4b, A4c, A5; 1 Rev
@@ -25,7 +28,7 @@ class MRNAs(object):
             #[42-48] D1 to A1, A2, A3, A4a, A4b, A4c, A5; 6 Rev
             #[49-55] D1 to A1, A2, A3, A4a, A4b, A4c, A5; 7 Rev
             #[56-62] D1 to A1, A2, A3, A4a, A4b, A4c, A5; 8 Rev
-        self.multi_splice_transcript_nuc = np.zeros((17), int) 
+        self.multi_splice_transcript_nuc = initialize_ensemble_array(17, num_of_cells) 
             #an array of length X to hold the counts of each type of multi-spliced mRNA: 
             #[0]: D1-A1, D4-A7 #vif
             #[1]: D1-A1, D2-A3, D4-A7 #tat
@@ -44,11 +47,11 @@ class MRNAs(object):
             #[14]: D1-A4b, D4-D7 #rev
             #[15]: D1-A4c, D4-D7 #rev
             #[16]: D1-A5, D4-D7 #nef
-        self.full_len_transcripts_cyt = np.zeros((MAX_REV_PER_TRANSCRIPT+1), int)
-        self.single_splice_transcript_cyt = np.zeros((7*(MAX_REV_PER_TRANSCRIPT+1)), int) 
-        self.multi_splice_transcript_cyt = np.zeros((17), int) 
-        self.transcripts_synthesized = 0 #count of how many viral transcripts were made (TOTAL)
-        self.full_len_transcripts_Gag_bound = np.zeros((16), int)
+        self.full_len_transcripts_cyt = initialize_ensemble_array(MAX_REV_PER_TRANSCRIPT+1, num_of_cells)
+        self.single_splice_transcript_cyt = initialize_ensemble_array(7*(MAX_REV_PER_TRANSCRIPT+1), num_of_cells) 
+        self.multi_splice_transcript_cyt = initialize_ensemble_array(17, num_of_cells) 
+        self.transcripts_synthesized = initialize_ensemble_scalar(0, num_of_cells) #count of how many viral transcripts were made (TOTAL)
+        self.full_len_transcripts_Gag_bound = initialize_ensemble_array(16, num_of_cells)
             #In practice will be reshaped to a 2x2x2x2 matrix 
             #in which each dimension can be a 0 or a 1 for each of SL1, SL2, SL3, and SL4 being
             #Bound or not bound
@@ -69,7 +72,7 @@ class MRNAs(object):
             #[13]: SL1, SL2, SL4
             #[14]: SL1, SL2, SL3
             #[15]: SL1, SL2, SL3, SL4
-        self.full_length_transcript_dimers_cyt = np.zeros((3), int)
+        self.full_length_transcript_dimers_cyt = initialize_ensemble_array(3, num_of_cells)
             #[0]: dimer in cytoplasm with 6 Gag bound (SL1,2,3 on both RNAs, and neither SL4)
             #[1]: dimer in the cytoplasm with 7 Gag bound (SL1,2,3 on both RNAs, and one SL4)
             #[2]: dimer in the cytoplasm with 8 Gag bound (SL1,2,3 on both RNAs, and both SL4)
@@ -6,9 +6,11 @@ from mainaux.InitClassVars import *
 class Proteins(object):
     index = initialize_protein_dict()
 
-    def __init__(self):
+    # num_of_cells: if given, every array gains a leading dimension of that size
+    # so that a batch of cells can be advanced together (see mainaux/BatchState.py)
+    def __init__(self, num_of_cells=None):
         #Initialize necessary parameters
-        self.proteins_cyt = np.zeros((9), int) 
+        self.proteins_cyt = initialize_ensemble_array(9, num_of_cells) 
         #[0]: Vif
         #[1]: Vpr
         #[2]: Tat
@@ -18,9 +20,9 @@ class Proteins(object):
         #[6]: Gag
         #[7]: Gag/Pro/Pol
         #[8]: Gag_Dimers
-        self.proteins_nuc = np.zeros((9), int)
-        self.proteins_mem = np.zeros((9), int)
-        self.proteins_virion = np.zeros((9), int)
+        self.proteins_nuc = initialize_ensemble_array(9, num_of_cells)
+        self.proteins_mem = initialize_ensemble_array(9, num_of_cells)
+        self.proteins_virion = initialize_ensemble_array(9, num_of_cells)
         self.env_misc = dict()
         # self.env_misc['gp160'] = 0
         # self.env_misc['gp160 : ER'] = 0
@@ -37,19 +39,19 @@ class Proteins(object):
         # self.env_misc['gp41: Virion'] = 0
         # self.env_misc['gp120 : Mem'] = 0
         # self.env_misc['gp120 : Virion'] = 0
-        self.env_misc['Env : cytoplasm'] = 0
-        self.env_misc['Env : ER'] = 0
-        self.env_misc['Env : ER : G1'] = 0
-        self.env_misc['Env : ER : G2'] = 0
-        self.env_misc['Env : ER : G3'] = 0
-        self.env_misc['Env : ER : G3 : folded'] = 0
-        self.env_misc['Env : ER : G4 : folded'] = 0
-        self.env_misc['Env : Golgi'] = 0
-        self.env_misc['Env : Golgi : G5'] = 0
-        self.env_misc['Env : Golgi : G5 : error'] = 0
-        self.env_misc['Env : trimers'] = np.zeros((4), int)
-        self.env_misc['Env : trimers : cleaved'] = np.zeros((4), int)
-        self.env_misc['Env : trimers : membrane'] = np.zeros((4), int)
+        self.env_misc['Env : cytoplasm'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER : G1'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER : G2'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER : G3'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER : G3 : folded'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : ER : G4 : folded'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : Golgi'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : Golgi : G5'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : Golgi : G5 : error'] = initialize_ensemble_scalar(0, num_of_cells)
+        self.env_misc['Env : trimers'] = initialize_ensemble_array(4, num_of_cells)
+        self.env_misc['Env : trimers : cleaved'] = initialize_ensemble_array(4, num_of_cells)
+        self.env_misc['Env : trimers : membrane'] = initialize_ensemble_array(4, num_of_cells)
 
     @staticmethod
     def initialize_class_vars():
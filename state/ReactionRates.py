@@ -1,12 +1,14 @@
 # -*- coding: utf-8 -*-
 import numpy as np
+from mainaux.InitClassVars import *
 
 #This is a type of State Class
 class ReactionRates(object):
-    def __init__(self):
+    # num_of_cells: if given, every value is held once per cell (see mainaux/BatchState.py)
+    def __init__(self, num_of_cells=None):
         #Initialize necessary parameters
-        self.Tat_derived_transcription_rate = 0
-        self.translation_suppressed = 0    
+        self.Tat_derived_transcription_rate = initialize_ensemble_scalar(0, num_of_cells)
+        self.translation_suppressed = initialize_ensemble_scalar(0, num_of_cells)    
         
     def record_state(self, record, timestep, max_timesteps):
         record.add_tracking(timestep, max_timesteps, 'Tat_derived_transcription_rate', self.Tat_derived_transcription_rate)    
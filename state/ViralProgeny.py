@@ -1,14 +1,17 @@
 from state.Proteins import Proteins
 import numpy as np
-import random
 from mainaux.InitParamValues import *
 from mainaux.ProcessHelpers import *
 #import pdb
 #from mainaux.TestHelpers import count_total_Gag
 
 class ViralProgenyContainer(object):
-    def __init__(self, state):
-        param_dict = generate_param_dict();
+    def __init__(self, state, param_dict=None, random_state=None):
+        if param_dict==None:
+            param_dict = generate_param_dict();
+        if random_state==None:
+            random_state = np.random
+        self.random_state = random_state #source of all random numbers drawn by the progeny
 
         self.helper_state_dict = {
             "NUCLEATE_CYT": ViralProgeny.NUCLEATE_CYT,
@@ -80,8 +83,21 @@ class ViralProgenyContainer(object):
         self.list_of_progeny += [new_progeny]
         self.list_of_progeny_in_creation_order += [new_progeny] 
 
+    # Spreads the Env trimers num_of_Env_t_added (amounts with 0-3 successes in trimer) evenly over
+    # all the progeny, as ViralProgeny.update_num_of_Env_t would one progeny at a time; used by
+    # mean-field simulations, whose amounts are expectations (see mainaux/MeanField.py)
+    def spread_num_of_Env_t(self, num_of_Env_t_added):
+        num_of_Env_t_per_progeny = num_of_Env_t_added/float(self.progeny_count)
+        for progeny in self.list_of_progeny:
+            progeny.num_of_Env_t += num_of_Env_t_per_progeny
+        self.num_of_Env_t += num_of_Env_t_added
+        names = [progeny.name for progeny in self.list_of_progeny]
+        self.helper_protein_dict['Env_t'][names] += np.sum(num_of_Env_t_per_progeny)
+        self.helper_protein_dict['unsuccessful_Env_t'][names] += np.sum(num_of_Env_t_per_progeny[0:3])
+        self.helper_protein_dict['successful_Env_t'][names] += num_of_Env_t_per_progeny[3]
+
     def randomize_progeny(self):
-        random.shuffle(self.list_of_progeny)
+        self.random_state.shuffle(self.list_of_progeny)
 
     def count_progeny(self):
         return self.progeny_count
@@ -113,6 +129,8 @@ class ViralProgenyContainer(object):
             def count_num_of_protein():
                 return getattr(self, "num_of_" + attr_name[13:])
             return count_num_of_protein
+        if attr_name == "random_state": # containers saved before they held their own generator
+            return np.random
         return super(object, self).__getattribute__(attr_name)
         
     # # Make more efficient
@@ -253,7 +271,7 @@ class ViralProgenyContainer(object):
         self.randomize_progeny()
         for progeny in self.list_of_progeny: # each iteration deals with 1 progeny
             if progeny.state == ViralProgeny.NUCLEATE_CYT:
-                tempRand = np.random.rand() < self.PROB_RNA_NUCLEATE_TRANSLOCATION
+                tempRand = self.random_state.rand() < self.PROB_RNA_NUCLEATE_TRANSLOCATION
                 if tempRand:
                     progeny.update_state(ViralProgeny.NUCLEATE_MEM)
 
@@ -270,7 +288,7 @@ class ViralProgenyContainer(object):
                         progeny.growth_const = 0
                 if progeny.final_Gag_count == 0:
                     #TODO: Add a better representation of distribution of punta sizes
-                    progeny.final_Gag_count = np.random.poisson(self.AVE_GAG_PER_VIRON)
+                    progeny.final_Gag_count = self.random_state.poisson(self.AVE_GAG_PER_VIRON)
 
                 #this rate of growth exponenetially grows as virion grows   
                 rate_of_Gag_mon_cyt_binding = self.proteins_cyt[Proteins.index['Gag']] * progeny.num_of_Gag * progeny.growth_const
@@ -293,7 +311,7 @@ class ViralProgenyContainer(object):
 
                 #a. movement of Gag cytoplasmic monomers
                 number_of_Gag_still_needed = progeny.final_Gag_count - progeny.num_of_Gag                
-                tempRand = min(np.random.poisson(rate_of_Gag_mon_cyt_binding), self.proteins_cyt[Proteins.index['Gag']], number_of_Gag_still_needed)
+                tempRand = min(self.random_state.poisson(rate_of_Gag_mon_cyt_binding), self.proteins_cyt[Proteins.index['Gag']], number_of_Gag_still_needed)
                 # print "tempRand: " + str(tempRand)
                 # print "rate_of_Gag_mon_cyt_binding: " + str(rate_of_Gag_mon_cyt_binding)
                 # print "Number of Gag in Proteins Cyt : " + str(self.proteins_cyt[Proteins.index['Gag']])
@@ -302,19 +320,19 @@ class ViralProgenyContainer(object):
 
                 # b. movement of Gag cytoplasmic dimers
                 number_of_Gag_dimer_still_needed = int((progeny.final_Gag_count - progeny.num_of_Gag)*0.5)
-                tempRand = min(np.random.poisson(rate_of_Gag_dim_cyt_binding), self.proteins_cyt[Proteins.index['Gag_dimers']], number_of_Gag_dimer_still_needed)
+                tempRand = min(self.random_state.poisson(rate_of_Gag_dim_cyt_binding), self.proteins_cyt[Proteins.index['Gag_dimers']], number_of_Gag_dimer_still_needed)
                 self.proteins_cyt[Proteins.index['Gag_dimers']] = self.proteins_cyt[Proteins.index['Gag_dimers']] - tempRand
                 progeny.update_num_of_Gag(2*tempRand)
 
                 # c. lateral movement of Gag monomers
                 number_of_Gag_still_needed = progeny.final_Gag_count - progeny.num_of_Gag      
-                tempRand = min(np.random.poisson(rate_of_Gag_mon_mem_binding), self.proteins_mem[Proteins.index['Gag']], number_of_Gag_still_needed)
+                tempRand = min(self.random_state.poisson(rate_of_Gag_mon_mem_binding), self.proteins_mem[Proteins.index['Gag']], number_of_Gag_still_needed)
                 self.proteins_mem[Proteins.index['Gag']] = self.proteins_mem[Proteins.index['Gag']] - tempRand
                 progeny.update_num_of_Gag(tempRand)
 
                 # d. lateral movement of Gag dimers
                 number_of_Gag_dimer_still_needed = int((progeny.final_Gag_count - progeny.num_of_Gag)*0.5)
-                tempRand = min(np.random.poisson(rate_of_Gag_dim_mem_binding), self.proteins_mem[Proteins.index['Gag_dimers']], number_of_Gag_dimer_still_needed)
+                tempRand = min(self.random_state.poisson(rate_of_Gag_dim_mem_binding), self.proteins_mem[Proteins.index['Gag_dimers']], number_of_Gag_dimer_still_needed)
                 self.proteins_mem[Proteins.index['Gag_dimers']] = self.proteins_mem[Proteins.index['Gag_dimers']] - tempRand
                 progeny.update_num_of_Gag(2*tempRand)
 
@@ -323,7 +341,7 @@ class ViralProgenyContainer(object):
                 def binding_helper(protein_name):
                     binding_rate_of_protein = getattr(self, "AVE_" + protein_name.upper() + "_PER_VIRON")/float(self.AVE_GAG_PER_VIRON) * total_rate_of_Gag_binding
                     proteins_cyt = getattr(self, "proteins_cyt")
-                    tempRand = min(np.random.poisson(binding_rate_of_protein), proteins_cyt[Proteins.index[protein_name]])
+                    tempRand = min(self.random_state.poisson(binding_rate_of_protein), proteins_cyt[Proteins.index[protein_name]])
                     proteins_cyt[Proteins.index[protein_name]] -= tempRand
                     getattr(progeny, "update_num_of_" + protein_name)(tempRand)
 
@@ -342,14 +360,13 @@ class ViralProgenyContainer(object):
                 # If no gag binds in a certain amount of time, nuclate falls off
                 #does it dissociate? Dissociation not modelled here. 
                 if progeny.state == ViralProgeny.NUCLEATE_MEM:
-                    if np.random.rand() < self.NUCLEATE_DISS_RATE:
+                    if self.random_state.rand() < self.NUCLEATE_DISS_RATE:
                         progeny.update_state(ViralProgeny.NUCLEATE_CYT)                                         
 
 # state = ViralProgeny.NUCLEATE_CYT (not bound to membrane), ViralProgeny.NUCLEATE_MEM (bound to membrane), ViralProgeny.GROWING_VIRION, ViralProgeny.VIRION_PREBUDDING, ViralProgeny.BUDDED_VIRION
 
 class ViralProgeny(object):
     # static var
-    name = 0
     NUCLEATE_CYT = 1
     NUCLEATE_MEM = 2
     GROWING_VIRION = 3
@@ -358,6 +375,9 @@ class ViralProgeny(object):
 
     def __init__(self, container, num_of_Gag, timestep=0):
         self.container = container
+        # Index of this progeny in the container's helper_protein_dict arrays
+        # (progeny are numbered per container, in order of creation)
+        self.name = container.progeny_count - 1
         self.state = None        
         self.update_state(ViralProgeny.NUCLEATE_CYT)
         self.num_of_Gag = 0
@@ -367,12 +387,10 @@ class ViralProgeny(object):
         self.num_of_Nef = 0
         self.update_num_of_Gag(num_of_Gag)
         self.growth_const = None
-        self.name = ViralProgeny.name
-        ViralProgeny.name += 1
         self.growing_timestep = timestep
         self.prebud_timestep = timestep
         self.final_Gag_count = 0
-        self.num_of_Env_t = np.array([0,0,0,0])
+        self.num_of_Env_t = np.zeros_like(container.num_of_Env_t) # floats in a mean-field simulation (see mainaux/MeanField.py)
 
     def update_state(self, state, timestep=0):
         prev_state = self.state
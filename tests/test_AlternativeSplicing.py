@@ -421,6 +421,19 @@ class TestAlternativeSplicing(unittest.TestCase):
 
         self.assertEqual(np.sum(self.multi_splice_transcript_nuc[[5,11]]), initial_mRNA_sum)        
 
+    # With a splice delay factor of 1, only the transcripts without Rev bound are spliced
+    def test_splice_delay_factor(self):
+        self.splice_proc.SPLICE_DELAY_FACTOR = 1
+        self.splice_proc.PROB_SPLICE_FULL_TO_SINGLE = 1
+        self.splice_proc.PROB_SPLICE_SINGLE_TO_MULTI = 0
+        self.full_len_transcripts_nuc[:] = 100
+        self.splice_proc.evolve_state(0)
+        self.assertEqual(self.full_len_transcripts_nuc[0], 0)
+        self.assertTrue((self.full_len_transcripts_nuc[1:] == 100).all())
+        # the spliced transcripts keep their (zero) Rev, and are split among the splice forms
+        self.assertEqual(np.sum(self.single_splice_transcript_nuc[0:7]), 100)
+        self.assertEqual(np.sum(self.single_splice_transcript_nuc[7:]), 0)
+
     # Start out with zero of everything  
     def test_zero_abundance(self):
         for i in range(30):
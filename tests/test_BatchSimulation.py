@@ -0,0 +1,105 @@
+from mainaux.BatchSimulation import *
+from mainaux.SimHelpers import initialize_runsim_dict
+from scipy.stats import ks_2samp
+from mainaux.Record import Record
+from mainaux.TestHelpers import *
+from process.batchprocess.BatchAlternativeSplicing import *
+from process.batchprocess.BatchRevBinding import *
+from process.batchprocess.BatchDegradation import *
+from process.batchprocess.BatchMRNAExport import *
+import mainaux.PlotCompilation as PlotCompilation
+import unittest
+import numpy as np
+
+class TestBatchSimulation(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.num_of_cells = 3
+        self.s1_state = batch_s1_state(self.num_of_cells)
+
+    def count_per_cell(self, count_function):
+        self.s1_state.refresh_cell_states()
+        return [count_function(self.s1_state.get_cell_state(i)) for i in range(self.num_of_cells)]
+
+    # Cells of a batch start out as independent copies of a single cell state
+    def test_cell_states(self):
+        self.assertEqual(self.count_per_cell(count_total_mRNA), [count_total_mRNA(s1_state())]*self.num_of_cells)
+        self.s1_state.get_cell_state(0).get_state('mRNAs').full_len_transcripts_nuc[0] += 1
+        mRNA_counts = self.count_per_cell(count_total_mRNA)
+        self.assertEqual(mRNA_counts[0], mRNA_counts[1] + 1)
+        self.assertEqual(mRNA_counts[1], mRNA_counts[2])
+
+    # Rev and mRNA are conserved by splicing, binding and export
+    def test_Rev_and_mRNA_balance(self):
+        for process_class in [BatchAlternativeSplicing, BatchRevBinding, BatchMRNAExport]:
+            process = process_class(self.s1_state)
+            prev_Rev_counts = self.count_per_cell(count_total_Rev)
+            prev_mRNA_counts = self.count_per_cell(count_total_mRNA)
+            process.evolve_state(5)
+            self.assertEqual(prev_Rev_counts, self.count_per_cell(count_total_Rev))
+            self.assertEqual(prev_mRNA_counts, self.count_per_cell(count_total_mRNA))
+
+    # Degrading mRNAs releases their bound Rev
+    def test_Rev_balance_degradation(self):
+        deg_process = BatchDegradation(self.s1_state)
+        deg_process.PROB_PROTEIN_DEG_NUC = 0
+        deg_process.PROB_PROTEIN_DEG_CYT = 0
+        prev_Rev_counts = self.count_per_cell(count_total_Rev)
+        deg_process.evolve_state(5)
+        self.assertEqual(prev_Rev_counts, self.count_per_cell(count_total_Rev))
+
+        deg_process.PROB_mRNA_DEG = 1
+        deg_process.evolve_state(6)
+        self.assertEqual(self.count_per_cell(count_total_mRNA), [0]*self.num_of_cells)
+
+    def make_records(self):
+        list_of_records = []
+        for i in range(self.num_of_cells):
+            list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(['proteins_nuc', 'progeny_count'])
+            list_of_records.append(Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=1))
+            list_of_records[i].sim_index = i
+        return list_of_records
+
+    # Every cell of a full batch run is recorded into its own record
+    def test_run(self):
+        list_of_records = self.make_records()
+        batch_sim = BatchSimulation(list_of_records, 50)
+        batch_sim.run()
+        for cell_index, record in enumerate(list_of_records):
+            self.assertEqual(np.shape(record.variable_tracking_dict['proteins_nuc']), (9, 50))
+            self.assertTrue((record.variable_tracking_dict['proteins_nuc'][:,-1] == batch_sim.state.get_state('proteins').proteins_nuc[cell_index]).all())
+        batch_state = batch_sim.state
+        for array in [batch_state.get_state('proteins').proteins_nuc, batch_state.get_state('proteins').proteins_cyt, batch_state.get_state('mRNAs').full_len_transcripts_nuc, batch_state.get_state('mRNAs').single_splice_transcript_nuc]:
+            self.assertTrue((array >= 0).all())
+            self.assertTrue(array.dtype.kind == 'i')
+
+    # Rerunning a batch with the same root seed reproduces it, whatever the global random state
+    def test_root_seed(self):
+        list_of_runs = []
+        for run_index in range(2):
+            np.random.seed(run_index)
+            list_of_records = self.make_records()
+            BatchSimulation(list_of_records, 50, root_seed=1234).run()
+            list_of_runs.append(list_of_records)
+        for record1, record2 in zip(list_of_runs[0], list_of_runs[1]):
+            self.assertEqual(record1.root_seed, 1234)
+            self.assertTrue((record1.variable_tracking_dict['proteins_nuc'] == record2.variable_tracking_dict['proteins_nuc']).all())
+
+    # A batch draws from the same distributions as cells run one by one through Simulation: the totals of
+    # each key at the last timestep agree in mean (within 4 standard errors) and pass a two-sample
+    # Kolmogorov-Smirnov test (the onset of export makes them heavy-tailed, so their spreads are noisy)
+    def test_distributions_match_simulation(self):
+        list_of_key_names = ['proteins_nuc', 'proteins_cyt', 'full_len_transcripts_nuc', 'full_len_transcripts_cyt', 'single_splice_transcript_cyt', 'multi_splice_transcript_cyt']
+        num_of_simulations = 20
+        sim_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_simulations, 150, 10, 'PROMOTER_ON_RATE', 1, root_seed=11)
+        batch_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(list_of_key_names, num_of_simulations, 150, 10, 'PROMOTER_ON_RATE', 1, root_seed=12, batch_size=10)
+        for key in list_of_key_names:
+            sim_totals = np.array([tracking[:,-1].sum() for tracking in sim_tracking_dict[key]], float)
+            batch_totals = np.array([tracking[:,-1].sum() for tracking in batch_tracking_dict[key]], float)
+            standard_error = np.sqrt((sim_totals.var() + batch_totals.var())/num_of_simulations)
+            self.assertTrue(abs(sim_totals.mean() - batch_totals.mean()) < 4*standard_error, key)
+            self.assertTrue(ks_2samp(sim_totals, batch_totals)[1] > 0.001, key)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+from mainaux.Simulation import Simulation
+from mainaux.Record import Record
+import mainaux.Checkpoint as Checkpoint
+import mainaux.PlotCompilation as PlotCompilation
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import shutil
+import os
+import numpy as np
+
+class TestCheckpoint(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.batch_label = "TestCheckpoint"
+        self.NUM_OF_TIMESTEPS = 60
+
+    def tearDown(self):
+        shutil.rmtree(Checkpoint.checkpoint_directory(self.batch_label), True)
+
+    def new_simulation(self, root_seed, save_state_timestep_list=None, **kwargs):
+        list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(['proteins_nuc', 'full_len_transcripts_nuc', 'progeny_count'])
+        record = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=1)
+        record.batch_label = self.batch_label
+        # keep the promoter on from the start so that the short run is not all zeros
+        return Simulation(record, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 1, save_state=save_state_timestep_list != None, save_state_timestep_list=save_state_timestep_list, root_seed=root_seed, **kwargs)
+
+    # A resumed simulation finishes exactly like the uninterrupted one
+    def test_resume(self):
+        sim1 = self.new_simulation(6, [40])
+        sim1.run()
+        path = Checkpoint.find_latest_checkpoint(self.batch_label, 0)
+        self.assertEqual(Checkpoint.read_index(self.batch_label), [(0, 40, path)])
+
+        sim2 = self.new_simulation(4)
+        sim2.resume_from_checkpoint(path)
+        self.assertEqual(sim2.current_timestep, 40)
+        self.assertEqual(sim2.root_seed, 6)
+        sim2.run()
+        for key in sim1.record.variable_tracking_dict:
+            self.assertTrue((sim1.record.variable_tracking_dict[key] == sim2.record.variable_tracking_dict[key]).all())
+        self.assertTrue(sim1.record.variable_tracking_dict['proteins_nuc'].any())
+
+    # Branches forked from a checkpoint share its past and then diverge
+    def test_fork_ensemble(self):
+        sim1 = self.new_simulation(6, [40])
+        sim1.run()
+        path = Checkpoint.find_latest_checkpoint(self.batch_label, 0)
+        master_tracking_dict, list_of_plotting_keys = SimHelpers.fork_ensemble(path, ['proteins_nuc', 'full_len_transcripts_nuc', 'progeny_count'], 3, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=5)
+        list_of_branches = master_tracking_dict['proteins_nuc']
+        self.assertEqual(len(list_of_branches), 3)
+        for branch_data in list_of_branches:
+            self.assertTrue((branch_data[:,:40] == sim1.record.variable_tracking_dict['proteins_nuc'][:,:40]).all())
+        self.assertFalse((list_of_branches[0] == list_of_branches[1]).all())
+
+    # Checkpoints written in the background hold the same arrays as those written in place
+    def test_async_checkpoints(self):
+        sim1 = self.new_simulation(3, [20, 40], async_checkpoints=False)
+        sim1.run()
+        data1 = Checkpoint.load_checkpoint(Checkpoint.find_latest_checkpoint(self.batch_label, 0))
+        shutil.rmtree(Checkpoint.checkpoint_directory(self.batch_label))
+
+        sim2 = self.new_simulation(3, [20, 40])
+        sim2.run()
+        self.assertEqual(sim2.checkpoint_writer, None)
+        self.assertEqual([timestep for sim_index, timestep, path in Checkpoint.read_index(self.batch_label)], [20, 40])
+        data2 = Checkpoint.load_checkpoint(Checkpoint.find_latest_checkpoint(self.batch_label, 0))
+        self.assertEqual(sorted(data1), sorted(data2))
+        for key in data1:
+            self.assertTrue((data1[key] == data2[key]).all())
+
+    # The checkpoints of a simulation that raises are still written before the exception propagates
+    def test_checkpoints_written_on_exception(self):
+        sim = self.new_simulation(3, [20])
+        evolve_processes = sim.evolve_processes
+        def failing_evolve_processes(timestep):
+            if timestep == 30:
+                raise Exception("failing at timestep 30")
+            evolve_processes(timestep)
+        sim.evolve_processes = failing_evolve_processes
+        self.assertRaises(Exception, sim.run)
+        self.assertEqual(sim.checkpoint_writer, None)
+        self.assertEqual([timestep for sim_index, timestep, path in Checkpoint.read_index(self.batch_label)], [20])
+        self.assertEqual(Checkpoint.load_checkpoint(Checkpoint.find_latest_checkpoint(self.batch_label, 0))['timestep'], 20)
+
+    # A checkpoint is written through a temporary file of its own, which is gone once it is renamed
+    def test_write_checkpoint(self):
+        directory = Checkpoint.checkpoint_directory(self.batch_label)
+        path = directory + "sim0_t10.npz"
+        Checkpoint.write_checkpoint(path, {'array': np.arange(3)})
+        Checkpoint.write_checkpoint(path, {'array': np.arange(4)})
+        self.assertEqual(os.listdir(directory), ["sim0_t10.npz"])
+        self.assertEqual(os.stat(path).st_mode & 0777, Checkpoint.CHECKPOINT_FILE_MODE)
+        data = np.load(path)
+        self.assertTrue((data['array'] == np.arange(4)).all())
+        data.close()
+
+    # A checkpoint that cannot be written is reported, and the simulation still finishes
+    def test_failed_checkpoint(self):
+        # a file in place of the batch directory makes every write fail
+        batch_path = Checkpoint.checkpoint_directory(self.batch_label)[:-1]
+        if not os.path.exists(os.path.dirname(batch_path)):
+            os.makedirs(os.path.dirname(batch_path))
+        open(batch_path, 'wb').close()
+        try:
+            sim = self.new_simulation(3, [40])
+            sim.run()
+        finally:
+            os.remove(batch_path)
+        self.assertEqual(sim.current_timestep, self.NUM_OF_TIMESTEPS)
+        self.assertEqual(len(sim.list_of_failed_checkpoints), 1)
+        self.assertEqual(sim.list_of_failed_checkpoints[0][0], Checkpoint.checkpoint_path(self.batch_label, 0, 40))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -140,7 +140,23 @@ class TestDegradation(unittest.TestCase):
                 self.fail('One or more abundances is not an integer.')
             else:
                 self.assertEquals(1,1)
-        
+
+    # In hybrid mode, high abundances are degraded by the approximation and
+    # stay non-negative integers close to their expected values
+    def test_hybrid_threshold(self):
+        self.s1_deg_process.HYBRID_THRESHOLD = 100
+        self.s1_proteins_cyt[Proteins.index['Gag']] = 100000
+        self.s1_proteins_cyt[Proteins.index['Vif']] = 50
+        for i in range(30):
+            self.s1_deg_process.evolve_state(i)
+            if abundance_is_negative(self.s1_state):
+                self.fail('One or more abundances is a negative value.')
+            elif abundance_is_not_integer(self.s1_state):
+                self.fail('One or more abundances is not an integer.')
+        expected_Gag = 100000*(1 - self.s1_deg_process.PROB_PROTEIN_DEG_CYT)**30
+        self.assertTrue(abs(self.s1_proteins_cyt[Proteins.index['Gag']] - expected_Gag) < 0.01*expected_Gag)
+        self.assertTrue(self.s1_proteins_cyt[Proteins.index['Vif']] <= 50)
+
     # Use this method if I want to change any conditions
     # immediately after running a test.
     def tearDown(self):
@@ -51,6 +51,13 @@ class TestMRNAExport(unittest.TestCase):
             
             self.assertEqual(prev_mRNA_count, curr_mRNA_count)
     
+    # Without mRNA in the nucleus there is nothing to export
+    def test_has_work(self):
+        self.assertFalse(self.mRNAexport_process.has_work())
+        self.assertTrue(self.s1_mRNAexport_process.has_work())
+        self.single_splice_transcript_nuc[0] = 1
+        self.assertTrue(self.mRNAexport_process.has_work())
+
     # After mRNA export, the full-length/single-spliced mRNA strands with
     # < MRNAExport.NUM_OF_REV_REQ_FOR_EXPORT should have the same abundance
     # in their respective locations (nucleus or cytoplasm)
@@ -0,0 +1,89 @@
+from mainaux.MeanField import *
+from mainaux.StochasticKernels import binomial_thinning
+from mainaux.Simulation import Simulation
+from mainaux.Record import Record
+import mainaux.PlotCompilation as PlotCompilation
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import numpy as np
+import time
+
+class TestMeanField(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.NUM_OF_TIMESTEPS = 30
+        self.list_of_key_names = ['proteins_nuc', 'full_len_transcripts_nuc']
+
+    def new_simulation(self, root_seed, mean_field, number_of_timesteps=None):
+        if number_of_timesteps == None:
+            number_of_timesteps = self.NUM_OF_TIMESTEPS
+        list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(self.list_of_key_names)
+        record = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=1)
+        return Simulation(record, number_of_timesteps, 'PROMOTER_ON_RATE', 1, root_seed=root_seed, mean_field=mean_field)
+
+    # Draws of amounts return their expectations
+    def test_expectations(self):
+        random_state = MeanFieldRandomState()
+        self.assertEqual(random_state.poisson(0.05), 0.05)
+        self.assertTrue((random_state.poisson(2.5, 4) == 2.5).all())
+        self.assertTrue((random_state.binomial(np.arange(5), 0.25) == np.arange(5)*0.25).all())
+        self.assertEqual(random_state.hypergeometric(6, 2, 4), 3)
+        self.assertTrue(np.allclose(random_state.multinomial(10, [0.5, 0.3, 0.2]), [5, 3, 2]))
+        self.assertEqual(random_state.normal(3, 2), 3)
+
+    # Thinning takes one expectation per bin, however many molecules there are, and small
+    # expectations are kept instead of being rounded away
+    def test_binomial_thinning(self):
+        random_state = MeanFieldRandomState()
+        self.assertEqual(binomial_thinning(10**12, 0.3, random_state, 100), 3*10**11)
+        self.assertTrue(abs(binomial_thinning(10**5, 10**-6, random_state, 100) - 0.1) < 10**-12)
+        self.assertTrue((binomial_thinning(np.array([0, 4, 10]), np.array([0.5, 0.5, 2]), random_state) == [0, 2, 10]).all())
+
+    # Mean-field sweeps cannot be combined with batches or common random numbers
+    def test_sweep_options(self):
+        with self.assertRaises(Exception):
+            SimHelpers.generate_increment_param_plots(1, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 0, 1, 'linear', 1, True, False, None, None, 1, self.list_of_key_names, batch_size=2, mean_field=True)
+        with self.assertRaises(Exception):
+            SimHelpers.generate_increment_param_plots(1, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 0, 1, 'linear', 1, True, False, None, None, 1, self.list_of_key_names, common_random_numbers=True, mean_field=True)
+
+    # A mean-field simulation is the same whatever its root seed
+    def test_deterministic(self):
+        sim1 = self.new_simulation(1, True)
+        sim1.run()
+        sim2 = self.new_simulation(2, True)
+        sim2.run()
+        for key in sim1.record.variable_tracking_dict:
+            self.assertTrue((sim1.record.variable_tracking_dict[key] == sim2.record.variable_tracking_dict[key]).all())
+        self.assertTrue(sim1.record.variable_tracking_dict['full_len_transcripts_nuc'][:, -1].sum() > 0)
+        # expectations are recorded as they are
+        self.assertEqual(sim1.record.variable_tracking_dict['full_len_transcripts_nuc'].dtype, float)
+        with self.assertRaises(Exception):
+            Simulation(sim1.record, self.NUM_OF_TIMESTEPS, root_seed=1, profile=True, mean_field=True)
+
+    # Every param value of a sweep gets one trajectory
+    def test_mean_field_sweep(self):
+        list_of_master_tracking_dicts, list_of_plotting_keys = SimHelpers.run_mean_field_sweep(self.list_of_key_names, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', [0, 1])
+        self.assertEqual(len(list_of_master_tracking_dicts), 2)
+        self.assertEqual(len(list_of_master_tracking_dicts[1]['full_len_transcripts_nuc']), 1)
+        self.assertEqual(list_of_master_tracking_dicts[0]['full_len_transcripts_nuc'][0].sum(), 0)
+        expected_tracking_dict = SimHelpers.initialize_runsim_dict(self.list_of_key_names, 1, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=5, mean_field=True)[0]
+        for key in expected_tracking_dict:
+            self.assertTrue((list_of_master_tracking_dicts[1][key][0] == expected_tracking_dict[key][0]).all())
+
+    # A trajectory takes a fraction of the time of a stochastic run of the same simulation, whose
+    # Rev binding ODEs are solved one mRNA type at a time
+    def test_faster_than_simulation(self):
+        stochastic_sim = self.new_simulation(3, False, 400)
+        start_time = time.time()
+        stochastic_sim.run()
+        stochastic_seconds = time.time() - start_time
+        mean_field_sim = self.new_simulation(3, True, 400)
+        start_time = time.time()
+        mean_field_sim.run()
+        mean_field_seconds = time.time() - start_time
+        self.assertTrue(stochastic_sim.record.variable_tracking_dict['full_len_transcripts_nuc'][:, -1].sum() > 0)
+        self.assertTrue(mean_field_seconds*3 < stochastic_seconds)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,29 @@ from state.ViralProgeny import *
 import unittest
 import numpy as np
 
+# Gag binding to the SL sites as Packaging drew it before the transition table: the bins are visited in
+# order, each bin draws one random number per transcript, reused for the 4 sites, and the transcripts that
+# bind or release a Gag are moved at once, so a later bin also moves the transcripts it received
+# Returns the new bins and the free Gag
+def previous_SL_binding(bins, Gag, binding_rates, diss_rate, random_state):
+    bins = bins.copy().reshape((2,2,2,2))
+    for cell in np.ndindex(2,2,2,2):
+        for s in range(4):
+            if bins[cell] > 0:
+                if s == 0:
+                    sampling_values = random_state.rand(bins[cell])
+                moved_to = list(cell)
+                moved_to[s] = 1 - cell[s]
+                if cell[s] == 0:
+                    moved = min(np.sum(sampling_values < binding_rates[s]), Gag)
+                    Gag -= moved
+                else:
+                    moved = np.sum(sampling_values < diss_rate)
+                    Gag += moved
+                bins[tuple(moved_to)] += moved
+                bins[cell] -= moved
+    return bins.reshape(16), Gag
+
 class TestPackaging(unittest.TestCase):
     TIMESTEP = 1500
     
@@ -132,6 +155,66 @@ class TestPackaging(unittest.TestCase):
             if self.sx_proteins_cyt[Proteins.index['Nef']] and self.sx_proteins_cyt[Proteins.index['Gag']] and self.sx_proteins_cyt[Proteins.index['Gag_dimers']]:                
                 self.assertNotEqual(prev_progeny_Nef_count, self.sx_container.count_num_of_Nef())
 
+    # Gag binding to the SL sites never takes up more Gag than is free in the cytoplasm
+    def test_Gag_limited_SL_binding(self):
+        self.sx_pack_proc.GAGNC_DISS_RATE = 0
+        self.sx_pack_proc.BINDING_CONSTANT_SL1 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL2 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL3 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL4 = 10**20
+        self.sx_full_len_transcripts_cyt[:] = 0
+        self.sx_full_len_transcripts_Gag_bound_no_reshape[:] = 0
+        self.sx_full_len_transcripts_Gag_bound_no_reshape[[8, 12, 14]] = 100
+        self.sx_proteins_cyt[Proteins.index['Gag']] = 150
+        prev_total_Gag_count = count_total_Gag(self.sx_state)
+        self.sx_pack_proc.evolve_state(self.TIMESTEP, "cell_cycle_arrest")
+        self.assertEqual(self.sx_proteins_cyt[Proteins.index['Gag']], 0)
+        self.assertEqual(count_total_Gag(self.sx_state), prev_total_Gag_count)
+        self.assertEqual(self.sx_full_len_transcripts_Gag_bound_no_reshape[[8, 12, 14, 15]].sum(), 300)
+
+    # When Gag is limiting, the Gag-taking transitions share it whatever their order in the transition table
+    def test_Gag_limited_SL_binding_unbiased(self):
+        self.sx_pack_proc.GAGNC_DISS_RATE = 0
+        self.sx_pack_proc.BINDING_CONSTANT_SL1 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL2 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL3 = 10**20
+        self.sx_pack_proc.BINDING_CONSTANT_SL4 = 10**20
+        self.sx_full_len_transcripts_cyt[:] = 0
+        self.sx_full_len_transcripts_Gag_bound_no_reshape[:] = 0
+        self.sx_full_len_transcripts_Gag_bound_no_reshape[[3, 12]] = 100
+        self.sx_proteins_cyt[Proteins.index['Gag']] = 100
+        self.sx_pack_proc.evolve_state(self.TIMESTEP, "cell_cycle_arrest")
+        # both bins need 2 Gag to reach bin 15, so 50 transcripts bind, about 25 from each bin
+        self.assertEqual(self.sx_proteins_cyt[Proteins.index['Gag']], 0)
+        self.assertEqual(self.sx_full_len_transcripts_Gag_bound_no_reshape[15], 50)
+        self.assertTrue(60 < self.sx_full_len_transcripts_Gag_bound_no_reshape[3] < 90)
+        self.assertTrue(60 < self.sx_full_len_transcripts_Gag_bound_no_reshape[12] < 90)
+
+    # Packaging binds and releases the Gag of each SL site independently. The process it replaced (see
+    # previous_SL_binding) reused one random number per transcript for the 4 sites and moved the transcripts
+    # bin by bin, so a transcript could bind several sites one after the other in a timestep. At the binding
+    # rates of the default params the difference is of the order of the squared rates
+    def test_SL_binding_matches_previous_process(self):
+        pack_proc = Packaging(self.sx_state, random_state=np.random.RandomState(5))
+        self.sx_full_len_transcripts_cyt[:] = 0
+        start_bins = np.array([0, 50, 0, 100, 200, 0, 50, 0, 300, 0, 0, 100, 200, 0, 200, 100])
+        binding_constants = np.array([pack_proc.BINDING_CONSTANT_SL1, pack_proc.BINDING_CONSTANT_SL2, pack_proc.BINDING_CONSTANT_SL3, pack_proc.BINDING_CONSTANT_SL4], float)
+        binding_rates = binding_constants*20000/(pack_proc.AVOGADRO_NUM*pack_proc.VOLUME_CYTOPLASM)
+        random_state = np.random.RandomState(6)
+        SL_site_bits = np.array([8, 4, 2, 1])
+        bound_per_site = lambda bins: np.array([bins[(np.arange(16) & bit) > 0].sum() for bit in SL_site_bits])
+        samples, previous_samples = [], []
+        for i in range(300):
+            self.sx_full_len_transcripts_Gag_bound_no_reshape[:] = start_bins
+            self.sx_proteins_cyt[Proteins.index['Gag']] = 20000
+            pack_proc.evolve_state(self.TIMESTEP, "cell_cycle_arrest")
+            samples.append(bound_per_site(self.sx_full_len_transcripts_Gag_bound_no_reshape))
+            previous_bins, Gag = previous_SL_binding(start_bins, 20000, binding_rates, pack_proc.GAGNC_DISS_RATE, random_state)
+            previous_samples.append(bound_per_site(previous_bins))
+        samples, previous_samples = np.array(samples), np.array(previous_samples)
+        self.assertTrue((np.abs(samples.mean(0) - previous_samples.mean(0)) < 0.01*previous_samples.mean(0)).all())
+        self.assertTrue((np.abs(samples.std(0) - previous_samples.std(0)) < 0.25*previous_samples.std(0)).all())
+
     def test_gagnc_diss_rate(self):
         # If dissociation rate is 0, then expect SL bound counts to never decrease
         self.sx_pack_proc.GAGNC_DISS_RATE = 0
@@ -0,0 +1,93 @@
+from mainaux.Simulation import Simulation
+from mainaux.Record import Record
+from mainaux.Profiler import *
+import mainaux.PlotCompilation as PlotCompilation
+import unittest
+import numpy as np
+
+class TestProfiler(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.NUM_OF_TIMESTEPS = 30
+
+    def new_simulation(self, root_seed, profile, **kwargs):
+        list_of_plotting_keys, list_of_dependent_keys, set_of_req_record_key_names = PlotCompilation.generate_plotting_keys(['proteins_nuc', 'full_len_transcripts_nuc'])
+        record = Record(list_of_dependent_keys, set_of_req_record_key_names, sampling_rate=1)
+        return Simulation(record, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 1, root_seed=root_seed, profile=profile, **kwargs)
+
+    # Every random number drawn is counted once, however the draw methods call each other
+    def test_counting_random_state(self):
+        random_state = CountingRandomState(7)
+        random_state.rand(5)
+        random_state.rand()
+        random_state.poisson(3, 4)
+        random_state.shuffle(range(6))
+        self.assertEqual(random_state.num_of_draws, 16)
+        # the same numbers as a plain RandomState
+        plain_random_state = np.random.RandomState(7)
+        plain_random_state.rand(5)
+        plain_random_state.rand()
+        plain_random_state.poisson(3, 4)
+        plain_random_state.shuffle(range(6))
+        self.assertEqual(random_state.rand(), plain_random_state.rand())
+
+    # Each counted ODE method still calls its own method
+    def test_count_ODE_evaluations(self):
+        class TwoODEs(object):
+            ODE_METHODS = ['first_ode', 'second_ode']
+            def first_ode(self, y, t):
+                return 1
+            def second_ode(self, y, t):
+                return 2
+        process = TwoODEs()
+        profiler = Profiler(CountingRandomState(7))
+        profiler.count_ODE_evaluations('TwoODEs', process)
+        self.assertEqual(process.first_ode(0, 0), 1)
+        self.assertEqual(process.second_ode(0, 0), 2)
+        self.assertEqual(profiler.stats_dict['TwoODEs'][3], 2)
+
+    # Profiling does not change the results of a simulation
+    def test_profile(self):
+        sim1 = self.new_simulation(2, False)
+        sim1.run()
+        sim2 = self.new_simulation(2, True)
+        sim2.run()
+        for key in sim1.record.variable_tracking_dict:
+            self.assertTrue((sim1.record.variable_tracking_dict[key] == sim2.record.variable_tracking_dict[key]).all())
+        self.assertEqual(sim1.profiler, None)
+
+        stats_dict = sim2.profiler.stats_dict
+        for process in sim2.process_list:
+            self.assertEqual(stats_dict[type(process).__name__][0], self.NUM_OF_TIMESTEPS)
+        self.assertEqual(stats_dict['proteins (record_state)'][0], self.NUM_OF_TIMESTEPS)
+        self.assertTrue(stats_dict['TatFeedback'][3] > 0)
+        self.assertTrue(stats_dict['RevBinding'][3] > 0)
+        self.assertEqual(stats_dict['Degradation'][3], 0)
+        self.assertEqual(sum(row[2] for row in stats_dict.values()), sim2.random_state.num_of_draws)
+
+        merged_profiler = merge_profilers([sim2.profiler, sim2.profiler])
+        self.assertEqual(merged_profiler.num_of_runs, 2)
+        self.assertEqual(merged_profiler.stats_dict['Transcription'][2], 2*stats_dict['Transcription'][2])
+        self.assertTrue('Transcription' in merged_profiler.table())
+
+    # Skipping processes that have no work does not change the results of a simulation
+    def test_activity_gating(self):
+        sim1 = self.new_simulation(2, False, activity_gating=False)
+        sim1.run()
+        sim2 = self.new_simulation(2, True)
+        sim2.run()
+        for key in sim1.record.variable_tracking_dict:
+            self.assertTrue((sim1.record.variable_tracking_dict[key] == sim2.record.variable_tracking_dict[key]).all())
+        self.assertEqual(sim1.num_of_skipped_calls, dict())
+
+        # nothing is translated, localized or packaged before the first transcripts are exported
+        stats_dict = sim2.profiler.stats_dict
+        for process_name in ['Translation', 'ProteinLocalization', 'Packaging', 'EnvProcessing']:
+            self.assertTrue(sim2.num_of_skipped_calls[process_name] > 0)
+            self.assertEqual(stats_dict[process_name][4], sim2.num_of_skipped_calls[process_name])
+        self.assertFalse('Transcription' in sim2.num_of_skipped_calls)
+        self.assertEqual(stats_dict['Translation'][0], self.NUM_OF_TIMESTEPS)
+
+if __name__ == '__main__':
+    unittest.main()
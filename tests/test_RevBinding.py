@@ -187,6 +187,14 @@ class TestRevBinding(unittest.TestCase):
         self.assertTrue(new_Rev_count == 17 or new_Rev_count == 19 or new_Rev_count == 21)
         
 
+    # Without transcripts in the nucleus there is nothing for Rev to bind, whatever the Rev count
+    def test_has_work(self):
+        self.proteins_nuc[Proteins.index['Rev']] = 100
+        self.assertFalse(self.r_binding_proc.has_work())
+        self.assertTrue(self.s1_r_binding_proc.has_work())
+        self.single_splice_transcript_nuc[0] = 1
+        self.assertTrue(self.r_binding_proc.has_work())
+
     # Start out with zero of everything  
     def test_zero_abundance(self):
         for i in range(30):
@@ -0,0 +1,50 @@
+from mainaux.SimDaemon import *
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import tempfile
+import shutil
+import threading
+import time
+
+class TestSimDaemon(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.address = self.directory + "/daemon.sock"
+        self.daemon = SimDaemon(self.address, 2)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        self.NUM_OF_TIMESTEPS = 30
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.directory, True)
+
+    # A job gives the same data as the same simulations run by SimHelpers
+    def test_job(self):
+        job_dict = {'num_of_timesteps': self.NUM_OF_TIMESTEPS, 'list_of_key_names': ['proteins_nuc', 'full_len_transcripts_nuc'],
+                    'num_of_simulations': 3, 'param_overrides': {'PROMOTER_ON_RATE': 1}, 'root_seed': 4}
+        master_tracking_dict, root_seed = run_job(self.address, job_dict)
+        self.assertEqual(root_seed, 4)
+        expected_tracking_dict, list_of_plotting_keys = SimHelpers.initialize_runsim_dict(['proteins_nuc', 'full_len_transcripts_nuc'], 3, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=4)
+        self.assertEqual(sorted(master_tracking_dict), sorted(expected_tracking_dict))
+        for key in expected_tracking_dict:
+            for sim_index in range(3):
+                self.assertTrue((master_tracking_dict[key][sim_index] == expected_tracking_dict[key][sim_index]).all())
+
+        # the workers are warm, so a short job returns quickly
+        start_time = time.time()
+        run_job(self.address, {'num_of_timesteps': 5, 'list_of_key_names': ['proteins_nuc']})
+        self.assertTrue(time.time() - start_time < 1)
+
+    # A job that fails is reported to the client, and the daemon keeps running
+    def test_failed_job(self):
+        with self.assertRaises(Exception):
+            run_job(self.address, {'num_of_timesteps': 5, 'list_of_key_names': ['proteins_nuc'], 'param_overrides': {'NOT_A_PARAM': 1}})
+        master_tracking_dict, root_seed = run_job(self.address, {'num_of_timesteps': 5, 'list_of_key_names': ['proteins_nuc'], 'sim_indices': [2]})
+        self.assertEqual(len(master_tracking_dict['proteins_nuc']), 1)
+
+if __name__ == '__main__':
+    unittest.main()
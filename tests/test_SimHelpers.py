@@ -0,0 +1,116 @@
+from mainaux.SimHelpers import *
+from state.Proteins import Proteins
+import unittest
+import numpy as np
+
+class TestSimHelpers(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.NUM_OF_TIMESTEPS = 30
+        self.list_of_key_names = ['proteins_nuc', 'full_len_transcripts_nuc']
+
+    # Rounds stop as soon as every target is met, and the ensemble is the same as a fixed one of that size
+    def test_adaptive_ensemble(self):
+        target = ('full_len_transcripts_nuc', 0, 29, 1000.)
+        master_tracking_dict, list_of_plotting_keys, list_of_half_widths = run_adaptive_ensemble(self.list_of_key_names, [target], 10, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, round_size=2, root_seed=6)
+        self.assertEqual(len(master_tracking_dict['proteins_nuc']), 2)
+        self.assertTrue(list_of_half_widths[0] <= 1000.)
+
+        # a target that cannot be met runs up to the maximum number of simulations
+        target = ('full_len_transcripts_nuc', 0, 29, 0.)
+        master_tracking_dict, list_of_plotting_keys, list_of_half_widths = run_adaptive_ensemble(self.list_of_key_names, [target], 5, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, round_size=2, root_seed=6)
+        self.assertEqual(len(master_tracking_dict['proteins_nuc']), 5)
+        self.assertTrue(list_of_half_widths[0] > 0)
+
+        expected_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(self.list_of_key_names, 5, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=6)
+        for key in expected_tracking_dict:
+            for sim_index in range(5):
+                self.assertTrue((master_tracking_dict[key][sim_index] == expected_tracking_dict[key][sim_index]).all())
+
+    # Filtered ensembles hold the simulations generate_subset_dict keeps, and stop failing simulations early
+    def test_filtered_ensemble(self):
+        list_of_filters = [('full_len_transcripts_nuc', 0, 29, 10, ">="), ('proteins_nuc', Proteins.index['Tat'], None, 0, ">=")]
+        master_tracking_dict, list_of_plotting_keys, num_of_simulations = run_filtered_ensemble(self.list_of_key_names, list_of_filters, 2, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=6)
+        self.assertEqual(len(master_tracking_dict['proteins_nuc']), 2)
+
+        expected_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(self.list_of_key_names, num_of_simulations, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, root_seed=6)
+        expected_tracking_dict = generate_subset_dict(expected_tracking_dict, 'full_len_transcripts_nuc', 0, 29, 10, ">=")
+        for key in expected_tracking_dict:
+            for i in range(2):
+                self.assertTrue((master_tracking_dict[key][i] == expected_tracking_dict[key][i]).all())
+
+        # a simulation stops right after the timestep it fails a filter at
+        record = Record(*PlotCompilation.generate_plotting_keys(self.list_of_key_names)[1:])
+        sim = Simulation(record, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 1, root_seed=6, list_of_filters=[('full_len_transcripts_nuc', 0, 10, 1000, ">=")])
+        sim.run()
+        self.assertFalse(sim.accepted)
+        self.assertEqual(sim.current_timestep, 11)
+
+    # With a sampling rate above 1, the timestep of a filter is a minute, as in generate_subset_dict
+    def test_filtered_ensemble_sampling_rate(self):
+        list_of_filters = [('full_len_transcripts_nuc', 0, 27, 10, ">=")]
+        master_tracking_dict, list_of_plotting_keys, num_of_simulations = run_filtered_ensemble(self.list_of_key_names, list_of_filters, 2, self.NUM_OF_TIMESTEPS, 3, 'PROMOTER_ON_RATE', 1, root_seed=6)
+        self.assertEqual(len(master_tracking_dict['proteins_nuc']), 2)
+        self.assertEqual(master_tracking_dict['proteins_nuc'][0].shape[1], 10)
+
+        expected_tracking_dict, list_of_plotting_keys = initialize_runsim_dict(self.list_of_key_names, num_of_simulations, self.NUM_OF_TIMESTEPS, 3, 'PROMOTER_ON_RATE', 1, root_seed=6)
+        expected_tracking_dict = generate_subset_dict(expected_tracking_dict, 'full_len_transcripts_nuc', 0, 27, 10, ">=", sampling_rate=3)
+        for key in expected_tracking_dict:
+            for i in range(2):
+                self.assertTrue((master_tracking_dict[key][i] == expected_tracking_dict[key][i]).all())
+
+        # the simulation stops right after the minute it fails the filter at
+        record = Record(*PlotCompilation.generate_plotting_keys(self.list_of_key_names)[1:], sampling_rate=3)
+        sim = Simulation(record, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', 1, root_seed=6, list_of_filters=[('full_len_transcripts_nuc', 0, 9, 1000, ">=")])
+        sim.run()
+        self.assertFalse(sim.accepted)
+        self.assertEqual(sim.current_timestep, 10)
+
+    # Sections with common random numbers differ by the param value only, so paired differences are precise
+    def test_common_random_numbers(self):
+        list_of_key_names = ['proteins_cyt', 'total proteins_cyt']
+        list_of_vals_of_param = [0.0005, 0.0006]
+        list_of_crn_dicts = [initialize_runsim_dict(list_of_key_names, 8, 120, 1, 'PROB_PROTEIN_DEG_CYT', val_of_param, root_seed=3, per_process_streams=True)[0] for val_of_param in list_of_vals_of_param]
+        key, val_of_param, mean_difference, paired_std_error, independent_std_error = paired_difference_report(list_of_crn_dicts, list_of_key_names, list_of_vals_of_param)[0]
+        self.assertEqual(key, 'proteins_cyt')
+        self.assertTrue(paired_std_error < independent_std_error)
+
+        # the processes do not draw from the stream of the simulation
+        master_tracking_dict = initialize_runsim_dict(list_of_key_names, 8, 120, 1, 'PROB_PROTEIN_DEG_CYT', 0.0005, root_seed=3)[0]
+        self.assertFalse(all((list_of_crn_dicts[0]['proteins_cyt'][i] == master_tracking_dict['proteins_cyt'][i]).all() for i in range(8)))
+        with self.assertRaises(Exception):
+            initialize_runsim_dict(list_of_key_names, 2, 120, 1, root_seed=3, per_process_streams=True, profile=True)
+
+    def test_proportional_allocation(self):
+        self.assertEqual(proportional_allocation(10, [1, 1, 1]), [4, 3, 3])
+        self.assertEqual(proportional_allocation(7, [0.5, 0.25, 0.25]), [3, 2, 2])
+        self.assertEqual(sum(proportional_allocation(31, np.ones(30)/30.)), 31)
+
+    # Every clone runs its share of the simulations, and the variance between clones is removed
+    def test_clone_stratified_ensemble(self):
+        master_tracking_dict, list_of_plotting_keys, population_dict = run_clone_stratified_ensemble(['full_len_transcripts_nuc'], 60, 40, root_seed=4)
+        data = np.array(master_tracking_dict['full_len_transcripts_nuc'], float)
+        self.assertEqual(len(data), 60)
+        mean, std_error, random_std_error = population_dict['full_len_transcripts_nuc']
+        # with equal weights and 2 simulations per clone, the stratified mean is the plain mean
+        self.assertTrue(np.allclose(mean, np.mean(data, axis=0)))
+        self.assertTrue((std_error <= random_std_error + 1e-12).all())
+        with self.assertRaises(Exception):
+            run_clone_stratified_ensemble(['full_len_transcripts_nuc'], 59, 40, root_seed=4)
+
+        # a fixed clone sets the rates of that clone
+        integration_site_effects = IntegrationSiteEffects()
+        integration_site_effects.initialize_constants(np.random.RandomState(0), 7)
+        self.assertEqual(integration_site_effects.RATE_PROMOTER_ON, integration_site_effects.CLONES_RATE_PROMOTER_ON[7])
+
+    def test_confidence_half_width(self):
+        master_tracking_dict = {'proteins_nuc': [np.array([[0, 2], [0, 4]]), np.array([[0, 4], [0, 8]])]}
+        # values 2 and 4: standard error 1, t quantile of 1 degree of freedom
+        self.assertAlmostEqual(confidence_half_width(master_tracking_dict, ('proteins_nuc', 0, 1, 1.)), 12.7062047, places=6)
+        self.assertAlmostEqual(confidence_half_width(master_tracking_dict, ('proteins_nuc', 1, 1, 1.)), 2*12.7062047, places=6)
+        with self.assertRaises(Exception):
+            confidence_half_width(master_tracking_dict, ('proteins_nuc', 0, 1, 1.), SAMPLING_RATE=2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+from mainaux.Simulation import Simulation
+from mainaux.TestHelpers import *
+import unittest
+import numpy as np
+
+class TestSimulation(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        # long enough for the promoter to turn on after a silent phase, and for progeny to be made
+        self.NUM_OF_TIMESTEPS = 600
+        self.ROOT_SEED = 2
+
+    # Fast-forwarding through the silent phase gives the same results as running it timestep by timestep
+    def test_fast_forward_quiescence(self):
+        sim1 = Simulation(full_record(), self.NUM_OF_TIMESTEPS, root_seed=self.ROOT_SEED, fast_forward_quiescence=False)
+        sim1.run()
+        sim2 = Simulation(full_record(), self.NUM_OF_TIMESTEPS, root_seed=self.ROOT_SEED)
+        sim2.run()
+        tracking_dict1 = sim1.record.variable_tracking_dict
+        tracking_dict2 = sim2.record.variable_tracking_dict
+        self.assertEqual(sorted(tracking_dict1.keys()), sorted(tracking_dict2.keys()))
+        for key in tracking_dict1:
+            self.assertTrue((tracking_dict1[key] == tracking_dict2[key]).all(), key)
+        self.assertTrue(tracking_dict1['promoter_activity'][0,0] == 0)
+        self.assertTrue(tracking_dict1['progeny_count'][0,-1] > 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+from mainaux.Splitting import *
+from state.Proteins import Proteins
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import numpy as np
+
+class TestSplitting(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.NUM_OF_TIMESTEPS = 150
+
+    # With a single level, splitting is the fraction of a brute-force ensemble of the same streams
+    def test_single_level(self):
+        result = run_splitting(nuclear_Tat, [1], self.NUM_OF_TIMESTEPS, num_of_trajectories=10, num_of_replications=2, root_seed=3)
+        master_tracking_dict, list_of_plotting_keys = SimHelpers.initialize_runsim_dict(['proteins_nuc'], 20, self.NUM_OF_TIMESTEPS, 1, root_seed=3)
+        list_of_reached = [(sim_data[Proteins.index['Tat']] >= 1).any() for sim_data in master_tracking_dict['proteins_nuc']]
+        self.assertEqual(result['list_of_estimates'], [np.mean(list_of_reached[:10]), np.mean(list_of_reached[10:])])
+        self.assertAlmostEqual(result['probability'], np.mean(list_of_reached))
+
+    # Each estimate is the product of the fractions of its stages, and a run is reproduced by its root seed
+    def test_levels(self):
+        result1 = run_splitting(nuclear_Tat, [1, 3], self.NUM_OF_TIMESTEPS, num_of_trajectories=6, num_of_replications=2, root_seed=4)
+        result2 = run_splitting(nuclear_Tat, [1, 3], self.NUM_OF_TIMESTEPS, num_of_trajectories=6, num_of_replications=2, root_seed=4)
+        self.assertEqual(result1, result2)
+        self.assertTrue(result1['variance'] >= 0)
+        self.assertTrue(result1['num_of_simulated_timesteps'] > 0)
+        self.assertTrue(all(0 <= estimate <= 1 for estimate in result1['list_of_estimates']))
+        with self.assertRaises(Exception):
+            run_splitting(nuclear_Tat, [3, 1], self.NUM_OF_TIMESTEPS, root_seed=4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+from mainaux.StochasticKernels import *
+import unittest
+import numpy as np
+
+class TestStochasticKernels(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.random_state = np.random.RandomState(3)
+
+    # Per-bin probabilities, certain and impossible events, and expected amounts
+    def test_binomial_thinning(self):
+        counts = np.array([0, 10, 10, 10**9])
+        reacted = binomial_thinning(counts, np.array([0.5, 0, 1, 0.25]), self.random_state)
+        self.assertEqual(reacted.dtype.kind, 'i')
+        self.assertEqual(list(reacted[:3]), [0, 0, 10])
+        self.assertTrue(abs(reacted[3] - 0.25*10**9) < 10**6)
+        self.assertTrue(isinstance(binomial_thinning(5, 2., self.random_state), int))
+        self.assertEqual(binomial_thinning(5, 2., self.random_state), 5)
+
+        # the normal approximation only for counts above the threshold
+        reacted = binomial_thinning(np.array([3, 10**6]), 0.5, self.random_state, hybrid_threshold=100)
+        self.assertTrue(0 <= reacted[0] <= 3)
+        self.assertTrue(abs(reacted[1] - 0.5*10**6) < 10**4)
+
+    # Factors bound to the molecules that react are released
+    def test_thin_abundances(self):
+        abundances = np.array([4, 6, 8])
+        reacted, released_factors = thin_abundances(abundances, 1, self.random_state, factors_per_bin=np.array([0, 1, 2]))
+        self.assertEqual(list(abundances), [0, 0, 0])
+        self.assertEqual(list(reacted), [4, 6, 8])
+        self.assertEqual(released_factors, 22)
+        self.assertEqual(thin_abundances(np.array([5]), 0.5, self.random_state)[1], 0)
+
+    # Molecules are moved, not created or destroyed
+    def test_transfer_abundances(self):
+        abundances_from = np.array([100, 100, 100])
+        abundances_to = np.array([1, 1, 1])
+        moved = transfer_abundances(abundances_from, abundances_to, [1, 2], 0.5, self.random_state)
+        self.assertEqual(abundances_from[0], 100)
+        self.assertEqual(abundances_to[0], 1)
+        self.assertEqual(list(abundances_from[1:] + abundances_to[1:]), [101, 101])
+        self.assertEqual(list(abundances_to[1:]), list(moved + 1))
+
+    # The amounts drawn add up to nsample, and each category gets its share on average
+    def test_multivariate_hypergeometric(self):
+        self.assertEqual(list(multivariate_hypergeometric([0, 5, 0], 3, self.random_state)), [0, 3, 0])
+        self.assertEqual(list(multivariate_hypergeometric([2, 3, 4], 9, self.random_state)), [2, 3, 4])
+        samples = np.array([multivariate_hypergeometric([30, 10, 60], 50, self.random_state) for i in range(5000)])
+        self.assertTrue((samples.sum(1) == 50).all())
+        self.assertTrue((samples <= [30, 10, 60]).all())
+        self.assertTrue((np.abs(samples.mean(0) - [15, 5, 30]) < 0.2).all())
+
+    # Each trimer has the composition of 3 molecules drawn without replacement
+    def test_trimer_compositions(self):
+        self.assertEqual(list(trimer_compositions(0, 10, 3, self.random_state)), [3, 0, 0, 0])
+        self.assertEqual(list(trimer_compositions(9, 0, 3, self.random_state)), [0, 0, 0, 3])
+        self.assertEqual(list(trimer_compositions(5, 5, 0, self.random_state)), [0, 0, 0, 0])
+        samples = np.array([trimer_compositions(6, 4, 3, self.random_state) for i in range(20000)])
+        self.assertTrue((samples.sum(1) == 3).all())
+        self.assertTrue((np.dot(samples, np.arange(4)) >= 5).all())
+        # 3 times the hypergeometric probabilities of 0, 1, 2 and 3 good molecules out of 3
+        expected = 3*np.array([4, 36, 60, 20])/120.
+        self.assertTrue((np.abs(samples.mean(0) - expected) < 0.03).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+from mainaux.Telemetry import *
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import tempfile
+import shutil
+
+class TestTelemetry(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + "/telemetry.jsonl"
+        self.NUM_OF_TIMESTEPS = 20
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, True)
+
+    # Workers of a pool share one stream, with lines of every simulation and of the ensemble
+    def test_ensemble_stream(self):
+        telemetry = Telemetry(self.path, interval=0)
+        SimHelpers.initialize_runsim_dict(['proteins_nuc'], 2, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', 1, num_of_workers=2, root_seed=1, telemetry=telemetry)
+        list_of_lines = read_telemetry(self.path)
+
+        for sim_index in range(2):
+            simulation_lines = [line for line in list_of_lines if line['type'] == 'simulation' and line['sim_index'] == sim_index]
+            # one line per timestep and one when the simulation finishes
+            self.assertEqual(len(simulation_lines), self.NUM_OF_TIMESTEPS + 1)
+            self.assertEqual(simulation_lines[-1]['timestep'], self.NUM_OF_TIMESTEPS)
+            self.assertTrue(simulation_lines[-1]['steps_per_sec'] > 0)
+            self.assertEqual(simulation_lines[-1]['eta'], 0)
+
+        ensemble_lines = [line for line in list_of_lines if line['type'] == 'ensemble']
+        self.assertEqual([line['num_finished'] for line in ensemble_lines], [1, 2])
+        self.assertEqual(ensemble_lines[-1]['eta'], 0)
+
+    # Lines are rate-limited to one per interval
+    def test_interval(self):
+        telemetry = Telemetry(self.path, interval=3600)
+        SimHelpers.initialize_runsim_dict(['proteins_nuc'], 1, self.NUM_OF_TIMESTEPS, 1, batch_size=1, root_seed=1, telemetry=telemetry)
+        list_of_lines = read_telemetry(self.path)
+        self.assertEqual([line['type'] for line in list_of_lines], ['simulation', 'ensemble'])
+        self.assertEqual(list_of_lines[0]['sim_index'], [0])
+        self.assertEqual(list_of_lines[0]['progeny_count'], [0])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -310,7 +310,20 @@ class TestTranscription(unittest.TestCase):
                 self.fail('One or more abundances is not an integer.')
             else:
                 self.assertEquals(1,1)
-        
+
+    # Skipping the timesteps before the promoter turns on draws the same random numbers as running them
+    def test_draw_promoter_off_timesteps(self):
+        self.transcribe_proc.random_state = np.random.RandomState(7)
+        num_of_timesteps = self.transcribe_proc.draw_promoter_off_timesteps(5000)
+
+        stepwise_proc = Transcription(State(), random_state=np.random.RandomState(7))
+        stepwise_num_of_timesteps = 0
+        while stepwise_num_of_timesteps < 5000 and stepwise_proc.state.get_state('DNAs').promoter_activity == 0:
+            stepwise_proc.evolve_state(stepwise_num_of_timesteps)
+            stepwise_num_of_timesteps += 1
+        self.assertEqual(num_of_timesteps + 1, stepwise_num_of_timesteps)
+        self.assertEqual(self.transcribe_proc.random_state.rand(), np.random.RandomState(7).rand(num_of_timesteps + 1)[-1])
+
     # Use this method if I want to change any conditions
     # immediately after running a test.
     def tearDown(self):
@@ -133,6 +133,20 @@ class TestTranslation(unittest.TestCase):
             GagProPol_count_in_cyt = self.s1_proteins_cyt[self.index['GagProPol']]
             self.assertEqual(GagProPol_count_in_cyt, 0)  
         
+    # Each bin is translated with one Poisson draw of mean (# of transcripts)*(translation rate),
+    # and Gag/Pro/Pol is split off the full length translation events
+    def test_translation_events_per_bin(self):
+        self.assertEqual(list(self.trans_process.MULTI_SPLICE_PROTEIN_INDEXES[[0, 1, 5, 6, 2]]), [self.index['Vif'], self.index['Tat'], self.index['Nef'], self.index['Vpr'], self.index['Rev']])
+        self.assertEqual(self.trans_process.SINGLE_SPLICE_PROTEIN_INDEXES[7+4], self.index['Env'])
+        self.trans_process.FREQ_TRANSLATION = 0.5
+        self.multi_splice_transcript_cyt[2] = 10**6
+        self.full_len_transcripts_cyt[0] = 10**6
+        self.trans_process.evolve_state(0)
+        self.assertTrue(abs(self.proteins_cyt[self.index['Rev']] - 0.5*10**6) < 10**4)
+        full_len_translated = self.proteins_cyt[self.index['Gag']] + self.proteins_cyt[self.index['GagProPol']]
+        self.assertTrue(abs(full_len_translated - 0.5*10**6) < 10**4)
+        self.assertTrue(self.proteins_cyt[self.index['GagProPol']] < self.proteins_cyt[self.index['Gag']])
+
     # Vary the translation rate of mRNA
     def test_translation_rate(self):
         self.s1_trans_process.FREQ_TRANSLATION = 0
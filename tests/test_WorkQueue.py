@@ -0,0 +1,69 @@
+from mainaux.WorkQueue import *
+import mainaux.SimHelpers as SimHelpers
+import unittest
+import tempfile
+import shutil
+
+class TestWorkQueue(unittest.TestCase):
+
+    # This method is run prior to each test automatically.
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = self.directory + "/queue.sqlite"
+        self.NUM_OF_TIMESTEPS = 30
+        self.list_of_key_names = ['proteins_nuc', 'full_len_transcripts_nuc']
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, True)
+
+    # Sections assembled by the coordinator hold the same data as those of generate_increment_param_plots
+    def test_study(self):
+        work_queue = WorkQueue(self.path)
+        work_queue.add_study('study', self.list_of_key_names, 2, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', [0.5, 1], 7)
+        # queuing a study twice does not duplicate its jobs
+        work_queue.add_study('study', self.list_of_key_names, 2, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', [0.5, 1], 7)
+        self.assertEqual(work_queue.study_status('study'), {'queued': 4})
+
+        self.assertEqual(WorkQueue(self.path).run_worker('worker1'), 4)
+        list_of_master_tracking_dicts = work_queue.wait_for_study('study')
+        for section, val_of_param in enumerate([0.5, 1]):
+            expected_tracking_dict, list_of_plotting_keys = SimHelpers.initialize_runsim_dict(self.list_of_key_names, 2, self.NUM_OF_TIMESTEPS, 1, 'PROMOTER_ON_RATE', val_of_param, root_seed=7 + section)
+            for key in expected_tracking_dict:
+                self.assertEqual(len(list_of_master_tracking_dicts[section][key]), 2)
+                for sim_index in range(2):
+                    self.assertTrue((list_of_master_tracking_dicts[section][key][sim_index] == expected_tracking_dict[key][sim_index]).all())
+
+    # The job of a worker that died is queued again once its lease runs out
+    def test_expired_lease(self):
+        work_queue = WorkQueue(self.path, lease_seconds=0)
+        work_queue.add_study('study', self.list_of_key_names, 1, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', [1], 7)
+        job = work_queue.claim('dead worker')
+        self.assertEqual(work_queue.study_status('study'), {'leased': 1})
+        self.assertFalse(work_queue.is_study_done('study'))
+
+        self.assertEqual(WorkQueue(self.path).run_worker('worker2', poll_interval=0), 1)
+        self.assertTrue(work_queue.is_study_done('study'))
+        self.assertFalse(work_queue.renew(job['job_id'], 'dead worker'))
+
+    # A job whose lease keeps running out is marked as failed after MAX_ATTEMPTS attempts
+    def test_repeatedly_expired_lease(self):
+        work_queue = WorkQueue(self.path, lease_seconds=0)
+        work_queue.add_study('study', self.list_of_key_names, 1, self.NUM_OF_TIMESTEPS, 'PROMOTER_ON_RATE', [1], 7)
+        for attempt in range(MAX_ATTEMPTS):
+            self.assertEqual(work_queue.claim('dead worker')['attempts'], attempt + 1)
+        self.assertEqual(work_queue.claim('dead worker'), None)
+        self.assertEqual(work_queue.study_status('study'), {'failed': 1})
+        with self.assertRaises(Exception):
+            work_queue.is_study_done('study')
+
+    # A job that keeps raising is marked as failed, and the coordinator reports it
+    def test_failed_job(self):
+        work_queue = WorkQueue(self.path)
+        work_queue.add_study('study', self.list_of_key_names, 1, self.NUM_OF_TIMESTEPS, 'NOT_A_PARAM', [1], 7)
+        self.assertEqual(work_queue.run_worker('worker1'), 0)
+        self.assertEqual(work_queue.study_status('study'), {'failed': 1})
+        with self.assertRaises(Exception):
+            work_queue.assemble_study('study')
+
+if __name__ == '__main__':
+    unittest.main()